@@ -0,0 +1,65 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Import time and memory of typical script preambles
+
+Every statement is timed in a fresh interpreter and the median of several runs
+is reported, together with the memory allocated by the imports and the peak
+resident set size of the interpreter. tests/test_lazy_imports.py guards
+against the regressions.
+
+Usage:
+    python benchmarks/import_time.py [--runs 7]
+"""
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = [
+    "import pytrinamic.connections",
+    "from pytrinamic.connections import SerialTmclInterface",
+    "from pytrinamic.connections import ConnectionManager; ConnectionManager('--interface serial_tmcl --port COM4')",
+    "from pytrinamic.connections import KvaserTmclInterface",
+    "from pytrinamic.modules import TMCM1240",
+    "from pytrinamic.modules import get_module_class; get_module_class('TMCM-1240')",
+    "from pytrinamic.ic import TMC5160",
+    "from pytrinamic.evalboards import TMC5160_eval",
+]
+
+_TIMER = "import time; _t = time.perf_counter()\n{}\nprint((time.perf_counter() - _t) * 1000)"
+_MEMORY = ("import resource, tracemalloc; tracemalloc.start()\n{}\n"
+           "print(tracemalloc.get_traced_memory()[0] / 1024, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)")
+
+
+def measure(statement, runs):
+    times = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", _TIMER.format(statement)],
+                                capture_output=True, text=True, check=True).stdout
+        times.append(float(output))
+    output = subprocess.run([sys.executable, "-c", _MEMORY.format(statement)],
+                            capture_output=True, text=True, check=True).stdout
+    allocated_kib, max_rss_kib = (float(value) for value in output.split())
+    return statistics.median(times), allocated_kib, max_rss_kib
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=7, help="runs per statement (default: %(default)s)")
+    args = parser.parse_args()
+
+    print(f"{'time':>8s}    {'allocated':>9s}    {'max RSS':>9s}")
+    for statement in STATEMENTS:
+        time_ms, allocated_kib, max_rss_kib = measure(statement, args.runs)
+        print(f"{time_ms:8.1f} ms {allocated_kib:8.0f} KiB {max_rss_kib:8.0f} KiB  {statement}")
+
+
+if __name__ == "__main__":
+    main()
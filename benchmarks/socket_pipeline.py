@@ -0,0 +1,109 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Throughput of stop-and-wait vs. pipelined requests on the SocketTmclInterface
+
+A local TCP responder stands in for an Ethernet-to-serial gateway. It answers
+every 9 byte TMCL request with a successful reply after a fixed delay, which
+emulates the network round trip time without serializing the requests.
+
+Usage:
+    python benchmarks/socket_pipeline.py [--rtt-ms 2] [--parameters 20] [--rounds 50]
+"""
+
+import argparse
+import heapq
+import socket
+import struct
+import threading
+import time
+
+import pytrinamic
+from pytrinamic.connections import SocketTmclInterface
+from pytrinamic.tmcl import TMCLCommand, TMCLStatus
+
+pytrinamic.show_info()
+
+
+class DelayedReplyServer:
+    """Answers every TMCL request with a TMCLStatus.SUCCESS reply after rtt_s seconds."""
+
+    def __init__(self, rtt_s):
+        self._rtt_s = rtt_s
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(1)
+        self.port = self._server.getsockname()[1]
+        self._queue = []
+        self._condition = threading.Condition()
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def _serve(self):
+        connection, _ = self._server.accept()
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        threading.Thread(target=self._write_replies, args=(connection,), daemon=True).start()
+        buffer = b""
+        while True:
+            data = connection.recv(4096)
+            if not data:
+                break
+            buffer += data
+            while len(buffer) >= 9:
+                frame, buffer = buffer[:9], buffer[9:]
+                module, command, _, _, value = struct.unpack(">BBBBI", frame[:8])
+                reply = struct.pack(">BBBBI", 2, module, TMCLStatus.SUCCESS, command, value)
+                reply += bytes([sum(reply) & 0xFF])
+                with self._condition:
+                    heapq.heappush(self._queue, (time.perf_counter() + self._rtt_s, reply))
+                    self._condition.notify()
+
+    def _write_replies(self, connection):
+        while True:
+            with self._condition:
+                while not self._queue:
+                    self._condition.wait()
+                due, reply = self._queue[0]
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    self._condition.wait(delay)
+                    continue
+                heapq.heappop(self._queue)
+            connection.sendall(reply)
+
+
+def run(interface, parameters, rounds, pipelined):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        if pipelined:
+            futures = [interface.submit(TMCLCommand.GAP, ap, 0, 0) for ap in range(parameters)]
+            [future.result() for future in futures]
+        else:
+            [interface.get_axis_parameter(ap, 0) for ap in range(parameters)]
+    return rounds * parameters / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="emulated round trip time (default: %(default)s)")
+    parser.add_argument("--parameters", type=int, default=20, help="axis parameters per poll (default: %(default)s)")
+    parser.add_argument("--rounds", type=int, default=50, help="number of polls (default: %(default)s)")
+    args = parser.parse_args()
+
+    server = DelayedReplyServer(args.rtt_ms / 1000)
+    with SocketTmclInterface(f"127.0.0.1:{server.port}", pipeline_depth=args.parameters) as interface:
+        sequential = run(interface, args.parameters, args.rounds, pipelined=False)
+        pipelined = run(interface, args.parameters, args.rounds, pipelined=True)
+
+    print(f"RTT {args.rtt_ms} ms, {args.parameters} parameters per poll, {args.rounds} polls")
+    print(f"  stop-and-wait: {sequential:10.1f} requests/s")
+    print(f"  pipelined:     {pipelined:10.1f} requests/s ({pipelined / sequential:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""pytest-benchmark entry point of benchmarks/transports.py
+
+Usage:
+    python -m pytest benchmarks/test_transports.py --benchmark-json=results.json
+
+Skipped if pytest-benchmark is not installed.
+"""
+
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+from pytrinamic.tools import TmclModuleEmulator
+
+import transports
+
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="The benchmark transports require pseudo terminals")
+
+
+@pytest.fixture(params=list(transports.TMCL_TRANSPORTS))
+def tmcl_interface(request):
+    modules = [TmclModuleEmulator(module_id) for module_id in (1, 2, 3, 4)]
+    with transports.TMCL_TRANSPORTS[request.param](modules) as interface:
+        yield interface
+
+
+@pytest.mark.parametrize("operation", ["get_axis_parameter", "set_axis_parameter", "send_prepared", "send_many_16", "send_many_4_modules"])
+def test_tmcl(benchmark, tmcl_interface, operation):
+    function, requests_per_call = transports.tmcl_operations(tmcl_interface)[operation]
+    benchmark.extra_info["requests_per_call"] = requests_per_call
+    benchmark(function)
+
+
+@pytest.mark.parametrize("operation", ["read_register", "write_register"])
+def test_uart_ic(benchmark, operation):
+    with transports.uart_ic_transport() as interface:
+        function, requests_per_call = transports.uart_ic_operations(interface)[operation]
+        benchmark.extra_info["requests_per_call"] = requests_per_call
+        benchmark(function)
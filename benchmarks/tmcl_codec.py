@@ -0,0 +1,102 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Encode/decode throughput of TMCLRequest and TMCLReply
+
+Compares the current implementation in pytrinamic.tmcl against the previous
+one (kept below as _LegacyRequest/_LegacyReply for reference).
+
+Usage:
+    python benchmarks/tmcl_codec.py [--number 200000]
+"""
+
+import argparse
+import struct
+import timeit
+
+from pytrinamic.tmcl import TMCLRequest, TMCLReply
+
+_PACKAGE_STRUCTURE = ">BBBBIB"
+
+
+def _legacy_checksum(data):
+    checksum = 0
+    for d in data:
+        checksum += d
+    checksum &= 0xFF
+    return checksum
+
+
+class _LegacyRequest:
+    def __init__(self, address, command, command_type, motor_bank, value, checksum=None):
+        self.moduleAddress = address & 0xFF
+        self.command = command & 0xFF
+        self.commandType = command_type & 0xFF
+        self.motorBank = motor_bank & 0xFF
+        self.value = value & 0xFFFFFFFF
+        self.checksum = checksum if checksum else 0
+        if checksum is None:
+            self.checksum = _legacy_checksum(self.to_buffer()[:-1])
+
+    def to_buffer(self):
+        return struct.pack(_PACKAGE_STRUCTURE, self.moduleAddress, self.command,
+                           self.commandType, self.motorBank, self.value, self.checksum)
+
+
+class _LegacyReply:
+    def __init__(self, reply_address, module_address, status, command, value, checksum=None):
+        self.reply_address = reply_address & 0xFF
+        self.module_address = module_address & 0xFF
+        self.status = status & 0xFF
+        self.command = command & 0xFF
+        self.value = value & 0xFFFFFFFF
+        self.checksum = checksum if checksum else 0
+        if checksum is None:
+            self.checksum = _legacy_checksum(self.to_buffer()[:-1])
+
+    @staticmethod
+    def from_buffer(data):
+        return _LegacyReply(*struct.unpack(_PACKAGE_STRUCTURE, data))
+
+    def is_checksum_correct(self):
+        return _legacy_checksum(self.to_buffer()[:-1]) == self.checksum
+
+    def to_buffer(self):
+        return struct.pack(_PACKAGE_STRUCTURE, self.reply_address, self.module_address,
+                           self.status, self.command, self.value, self.checksum)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--number", type=int, default=200000, help="operations per measurement (default: %(default)s)")
+    args = parser.parse_args()
+
+    reply_frame = TMCLReply(2, 1, 100, 6, 123456).to_buffer()
+    buffer = bytearray(9)
+
+    def legacy_encode():
+        _LegacyRequest(1, 6, 1, 0, 123456).to_buffer()
+
+    def encode():
+        TMCLRequest(1, 6, 1, 0, 123456).pack_into(buffer)
+
+    def legacy_decode():
+        _LegacyReply.from_buffer(reply_frame).is_checksum_correct()
+
+    def decode():
+        TMCLReply.from_buffer(reply_frame).is_checksum_correct()
+
+    for name, before, after in [("encode request", legacy_encode, encode),
+                                ("decode + check reply", legacy_decode, decode)]:
+        before_ops = args.number / min(timeit.repeat(before, number=args.number, repeat=3))
+        after_ops = args.number / min(timeit.repeat(after, number=args.number, repeat=3))
+        print(f"{name:22s} before: {before_ops:12.0f} ops/s  after: {after_ops:12.0f} ops/s  ({after_ops / before_ops:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Latency, throughput and CPU cost of the connection interfaces
+
+Every transport is connected to emulated hardware on the local machine:
+    emulator    EmulatorTmclInterface, the in-process baseline
+    serial      SerialTmclInterface over a pseudo terminal pair
+    socket      SocketTmclInterface against a local TmclEmulatorServer
+    udp         UdpTmclInterface against a local TmclEmulatorUdpServer
+    can         CanTmclInterface over the python-can "virtual" bus
+    uart_ic     UartIcInterface over a pseudo terminal pair
+The device side runs in the same process (TmclModuleEmulator), so the numbers
+show the cost of the host side stack plus the local transport, not of real
+hardware or cables.
+
+For every operation the round trip latency percentiles, the sustained
+requests/s and the CPU time per request are reported. "client" CPU time is
+the time of the calling thread only, "process" includes the emulated devices.
+Results are printed as JSON and can be compared between versions:
+
+    python benchmarks/transports.py --output before.json
+    python benchmarks/transports.py --output after.json
+    python benchmarks/transports.py --compare before.json after.json
+
+The pseudo terminal transports require a POSIX system. The same measurements
+can be run with pytest-benchmark, see benchmarks/test_transports.py.
+"""
+
+import argparse
+import json
+import os
+import platform
+import select
+import struct
+import threading
+import time
+from contextlib import contextmanager
+
+import pytrinamic
+from pytrinamic.version import __version__
+from pytrinamic.tmcl import TMCLCommand
+from pytrinamic.tools import TmclModuleEmulator, TmclEmulatorServer, TmclEmulatorUdpServer
+
+# Axis parameters read by the batch operations
+BATCH_PARAMETERS = list(range(16))
+
+
+class _PtyResponder:
+    """
+    Answers the frames written to the slave side of a pseudo terminal pair.
+    [handle] maps one request of [frame_size] bytes to the reply bytes.
+    """
+
+    def __init__(self, frame_size, handle):
+        import tty
+
+        self._master, slave = os.openpty()
+        tty.setraw(self._master)
+        tty.setraw(slave)
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self._frame_size = frame_size
+        self._handle = handle
+        self._running = True
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        buffer = b""
+        while self._running:
+            if not select.select([self._master], [], [], 0.1)[0]:
+                continue
+            buffer += os.read(self._master, 4096)
+            while len(buffer) >= self._frame_size:
+                frame, buffer = buffer[:self._frame_size], buffer[self._frame_size:]
+                reply = self._handle(frame)
+                if reply:
+                    os.write(self._master, reply)
+
+    def close(self):
+        self._running = False
+        self._thread.join()
+        os.close(self._master)
+        os.close(self._slave)
+
+
+@contextmanager
+def emulator_transport(modules):
+    from pytrinamic.connections import EmulatorTmclInterface
+
+    with EmulatorTmclInterface(modules=modules) as interface:
+        yield interface
+
+
+@contextmanager
+def serial_transport(modules):
+    from pytrinamic.connections import SerialTmclInterface
+
+    by_id = {module.module_id: module for module in modules}
+    responder = _PtyResponder(9, lambda frame: by_id[frame[0]].handle_frame(frame) if frame[0] in by_id else None)
+    try:
+        with SerialTmclInterface(responder.port, 115200, timeout_s=2) as interface:
+            yield interface
+    finally:
+        responder.close()
+
+
+@contextmanager
+def socket_transport(modules):
+    from pytrinamic.connections import SocketTmclInterface
+
+    with TmclEmulatorServer(modules) as server:
+        with SocketTmclInterface(server.address, timeout_s=2) as interface:
+            yield interface
+
+
+@contextmanager
+def udp_transport(modules):
+    from pytrinamic.connections import UdpTmclInterface
+
+    with TmclEmulatorUdpServer(modules) as server:
+        with UdpTmclInterface(server.address, timeout_s=2) as interface:
+            yield interface
+
+
+@contextmanager
+def can_transport(modules):
+    import can
+    from pytrinamic.connections.can_tmcl_interface import CanTmclInterface
+
+    class VirtualCanTmclInterface(CanTmclInterface):
+        def __init__(self, port, datarate=1000000, host_id=2, module_id=1, timeout_s=5):
+            CanTmclInterface.__init__(self, port, datarate, host_id, module_id, timeout_s)
+            self._connection = can.interface.Bus(bustype="virtual", channel=port)
+
+    channel = "pytrinamic-benchmark-{}".format(os.getpid())
+    by_id = {module.module_id: module for module in modules}
+    device_bus = can.interface.Bus(bustype="virtual", channel=channel)
+    running = True
+
+    def serve():
+        while running:
+            message = device_bus.recv(0.1)
+            if message is None or message.arbitration_id not in by_id:
+                continue
+            reply = by_id[message.arbitration_id].handle_frame(bytes([message.arbitration_id]) + bytes(message.data))
+            device_bus.send(can.Message(arbitration_id=reply[0], data=reply[1:], is_extended_id=False))
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        with VirtualCanTmclInterface(channel, timeout_s=2) as interface:
+            yield interface
+    finally:
+        running = False
+        thread.join()
+        device_bus.shutdown()
+
+
+@contextmanager
+def uart_ic_transport():
+    from pytrinamic.connections import UartIcInterface
+
+    registers = {}
+
+    def handle(frame):
+        # Bit 7 of the address selects a write access
+        address, value = struct.unpack(">BI", frame)
+        if address & 0x80:
+            registers[address & 0x7F] = value
+        return struct.pack(">BI", address, registers.get(address & 0x7F, 0))
+
+    responder = _PtyResponder(5, handle)
+    try:
+        with UartIcInterface(responder.port, 115200, timeout_s=2) as interface:
+            yield interface
+    finally:
+        responder.close()
+
+
+TMCL_TRANSPORTS = {
+    "emulator": emulator_transport,
+    "serial": serial_transport,
+    "socket": socket_transport,
+    "udp": udp_transport,
+    "can": can_transport,
+}
+
+
+def tmcl_operations(interface):
+    """
+    Return the benchmarked operations of a TMCL interface as
+    {name: (function, requests per call)}.
+    """
+    poll = interface.prepare(TMCLCommand.GAP, 1, 0)
+    many = [(TMCLCommand.GAP, parameter, 0, 0) for parameter in BATCH_PARAMETERS]
+    modules = [interface.prepare(TMCLCommand.GAP, 1, 0, module_id=module_id).request for module_id in (1, 2, 3, 4)]
+    return {
+        "get_axis_parameter": (lambda: interface.get_axis_parameter(1, 0), 1),
+        "set_axis_parameter": (lambda: interface.set_axis_parameter(4, 0, 51200), 1),
+        "send_prepared": (lambda: interface.send_prepared(poll), 1),
+        "send_many_16": (lambda: interface.send_many(many), len(many)),
+        "send_many_4_modules": (lambda: interface.send_many(modules), len(modules)),
+    }
+
+
+def uart_ic_operations(interface):
+    return {
+        "read_register": (lambda: interface.send(0x6C, 0), 1),
+        "write_register": (lambda: interface.send(0x80 | 0x6C, 0x12345678), 1),
+    }
+
+
+def measure(function, requests_per_call=1, duration_s=1.0, warmup=50):
+    """
+    Call [function] repeatedly for [duration_s] seconds and return the
+    statistics as a dict.
+    """
+    for _ in range(warmup):
+        function()
+
+    latencies = []
+    deadline = time.perf_counter() + duration_s
+    thread_start = time.thread_time()
+    process_start = time.process_time()
+    start = time.perf_counter()
+    while True:
+        call_start = time.perf_counter_ns()
+        function()
+        end = time.perf_counter_ns()
+        latencies.append(end - call_start)
+        if end / 1e9 >= deadline:
+            break
+    elapsed = time.perf_counter() - start
+    requests = len(latencies) * requests_per_call
+
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] / 1000
+
+    return {
+        "calls": len(latencies),
+        "requests": requests,
+        "requests_per_s": requests / elapsed,
+        "latency_us": {
+            "mean": sum(latencies) / len(latencies) / 1000,
+            "p50": percentile(50),
+            "p90": percentile(90),
+            "p99": percentile(99),
+            "max": latencies[-1] / 1000,
+        },
+        "cpu_us_per_request": {
+            "client": (time.thread_time() - thread_start) / requests * 1e6,
+            "process": (time.process_time() - process_start) / requests * 1e6,
+        },
+    }
+
+
+def run(transports, duration_s):
+    results = []
+    for transport in transports:
+        if transport == "uart_ic":
+            context, operations = uart_ic_transport(), uart_ic_operations
+        else:
+            modules = [TmclModuleEmulator(module_id) for module_id in (1, 2, 3, 4)]
+            context, operations = TMCL_TRANSPORTS[transport](modules), tmcl_operations
+
+        with context as interface:
+            for name, (function, requests_per_call) in operations(interface).items():
+                result = {"transport": transport, "operation": name}
+                result.update(measure(function, requests_per_call, duration_s))
+                results.append(result)
+                print("{:10s} {:22s} {:10.0f} requests/s  p50 {:8.1f} us  p99 {:8.1f} us  cpu {:6.1f} us/request".format(
+                    transport, name, result["requests_per_s"], result["latency_us"]["p50"],
+                    result["latency_us"]["p99"], result["cpu_us_per_request"]["client"]))
+
+    return {
+        "meta": {
+            "pytrinamic": __version__,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "duration_s": duration_s,
+        },
+        "results": results,
+    }
+
+
+def compare(before_path, after_path):
+    with open(before_path) as before_file, open(after_path) as after_file:
+        before = {(r["transport"], r["operation"]): r for r in json.load(before_file)["results"]}
+        after = json.load(after_file)["results"]
+
+    print("{:10s} {:22s} {:>14s} {:>14s}".format("transport", "operation", "requests/s", "p50 latency"))
+    for result in after:
+        old = before.get((result["transport"], result["operation"]))
+        if old is None:
+            continue
+        print("{:10s} {:22s} {:13.2f}x {:13.2f}x".format(
+            result["transport"], result["operation"],
+            result["requests_per_s"] / old["requests_per_s"],
+            result["latency_us"]["p50"] / old["latency_us"]["p50"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--transports", nargs="+", default=list(TMCL_TRANSPORTS) + ["uart_ic"],
+                        choices=list(TMCL_TRANSPORTS) + ["uart_ic"], help="transports to measure (default: all)")
+    parser.add_argument("--duration", type=float, default=1.0, help="seconds per operation (default: %(default)s)")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two JSON result files")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    pytrinamic.show_info()
+    report = run(args.transports, args.duration)
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
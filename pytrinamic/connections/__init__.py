@@ -1,11 +1,30 @@
-from .dummy_tmcl_interface import DummyTmclInterface
-from .can_tmcl.pcan_tmcl_interface import PcanTmclInterface
-from .can_tmcl.socketcan_tmcl_interface import SocketcanTmclInterface
-from .can_tmcl.kvaser_tmcl_interface import KvaserTmclInterface
-from .serial_tmcl_interface import SerialTmclInterface
-from .socket_tmcl_interface import SocketTmclInterface
-from .uart_ic_interface import UartIcInterface
-from .usb_tmcl_interface import UsbTmclInterface
-from .can_tmcl.slcan_tmcl_interface import SlcanTmclInterface
-from .can_tmcl.ixxat_tmcl_interface import IxxatTmclInterface
-from .connection_manager import ConnectionManager
+# The interface classes are imported on first access, so e.g. a script only
+# using a serial port does not pay for importing python-can.
+from ..helpers import lazy_attributes
+
+_CLASSES = {
+    "DummyTmclInterface": ".dummy_tmcl_interface",
+    "EmulatorTmclInterface": ".emulator_tmcl_interface",
+    "ReplayTmclInterface": ".replay_tmcl_interface",
+    "PcanTmclInterface": ".can_tmcl.pcan_tmcl_interface",
+    "SocketcanTmclInterface": ".can_tmcl.socketcan_tmcl_interface",
+    "KvaserTmclInterface": ".can_tmcl.kvaser_tmcl_interface",
+    "SerialTmclInterface": ".serial_tmcl_interface",
+    "SocketTmclInterface": ".socket_tmcl_interface",
+    "UdpTmclInterface": ".udp_tmcl_interface",
+    "UartIcInterface": ".uart_ic_interface",
+    "UsbTmclInterface": ".usb_tmcl_interface",
+    "SlcanTmclInterface": ".can_tmcl.slcan_tmcl_interface",
+    "IxxatTmclInterface": ".can_tmcl.ixxat_tmcl_interface",
+    "ConnectionManager": ".connection_manager",
+    "AsyncTmclInterface": ".async_tmcl_interface",
+    "AsyncSocketTmclInterface": ".async_socket_tmcl_interface",
+    "AsyncSerialTmclInterface": ".async_serial_tmcl_interface",
+    "SharedTmclInterface": ".shared_tmcl_interface",
+    "TmclPriority": ".shared_tmcl_interface",
+    "TmclStats": ".tmcl_stats",
+    "AdaptiveTimeout": ".adaptive_timeout",
+}
+
+__all__ = list(_CLASSES)
+__getattr__, __dir__ = lazy_attributes(__name__, _CLASSES)
@@ -0,0 +1,122 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+from ..tmcl import TMCLCommand, TMCLRetry
+
+
+class AdaptiveTimeout:
+    """
+    Receive timeout derived from the measured round trip times and retry
+    policy of a TmclInterface, see TmclInterface.enable_adaptive_timeout().
+
+    The timeout is computed like the TCP retransmission timeout (RFC 6298):
+    the smoothed round trip time plus four times its mean deviation, limited
+    to [min_timeout_s, max_timeout_s]. Until the first reply, max_timeout_s
+    is used. Every timeout doubles the timeout until the next reply arrives,
+    and round trip times of retried requests are not sampled, as they cannot
+    be assigned to one transmission.
+
+    Reads (see TMCLRetry) are sent up to [max_retries] more times after a
+    timeout or a checksum error, idempotent writes like SAP only with
+    [retry_writes] set.
+
+    Counters:
+        samples:            round trip times measured
+        timeouts:           requests that timed out, including retries
+        checksum_errors:    replies with a wrong checksum
+        retries:            requests sent again
+        failures:           requests failed after all retries
+    """
+
+    # Gains of the smoothed round trip time and its deviation, see RFC 6298
+    ALPHA = 1 / 8
+    BETA = 1 / 4
+    K = 4
+
+    MAX_BACKOFF = 64
+
+    def __init__(self, min_timeout_s=0.01, max_timeout_s=5.0, max_retries=2, retry_writes=False):
+        if not 0 < min_timeout_s <= max_timeout_s:
+            raise ValueError("Expected 0 < min_timeout_s <= max_timeout_s")
+        if max_retries < 0:
+            raise ValueError("The number of retries must not be negative")
+
+        self.min_timeout_s = min_timeout_s
+        self.max_timeout_s = max_timeout_s
+        self.max_retries = max_retries
+        self.retry_writes = retry_writes
+
+        self.srtt = None
+        self.rttvar = None
+        self.timeout_s = max_timeout_s
+        self._backoff = 1
+
+        self.samples = 0
+        self.timeouts = 0
+        self.checksum_errors = 0
+        self.retries = 0
+        self.failures = 0
+
+    def sample(self, rtt):
+        """
+        Update the timeout with the round trip time [rtt] in seconds of a
+        request answered at the first attempt.
+        """
+        if self.srtt is None:
+            self.srtt = rtt
+            self.rttvar = rtt / 2
+        else:
+            self.rttvar += self.BETA * (abs(self.srtt - rtt) - self.rttvar)
+            self.srtt += self.ALPHA * (rtt - self.srtt)
+        self.samples += 1
+        self._backoff = 1
+        self._update()
+
+    def timed_out(self):
+        """
+        Count a timeout and back off.
+        """
+        self.timeouts += 1
+        if self.srtt is not None:
+            self._backoff = min(2 * self._backoff, self.MAX_BACKOFF)
+            self._update()
+
+    def _update(self):
+        self.timeout_s = min(self.max_timeout_s,
+                             max(self.min_timeout_s, (self.srtt + self.K * self.rttvar) * self._backoff))
+
+    def is_retryable(self, request):
+        """
+        Return True if the TMCLRequest [request] may be sent again.
+        """
+        retry = TMCLRetry.classify(request)
+        return retry == TMCLRetry.READ or (self.retry_writes and retry == TMCLRetry.WRITE)
+
+    @staticmethod
+    def is_checksum_retryable(request):
+        # The ASCII firmware version reply has no checksum
+        return not (request.command == TMCLCommand.GET_FIRMWARE_VERSION and request.commandType == 0)
+
+    def as_dict(self):
+        return {
+            "timeout_s": self.timeout_s,
+            "srtt_s": self.srtt,
+            "rttvar_s": self.rttvar,
+            "samples": self.samples,
+            "timeouts": self.timeouts,
+            "checksum_errors": self.checksum_errors,
+            "retries": self.retries,
+            "failures": self.failures,
+        }
+
+    def __str__(self):
+        return "timeout {:.2f} ms (srtt {}, rttvar {}), {} timeouts, {} checksum errors, {} retries, {} failures".format(
+            self.timeout_s * 1000,
+            "-" if self.srtt is None else "{:.2f} ms".format(self.srtt * 1000),
+            "-" if self.rttvar is None else "{:.2f} ms".format(self.rttvar * 1000),
+            self.timeouts, self.checksum_errors, self.retries, self.failures)
@@ -0,0 +1,90 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import asyncio
+import logging
+
+from serial import Serial, SerialException
+from .async_tmcl_interface import AsyncTmclInterface
+from .tmcl_frame_reader import TmclFrameReader
+from ..tmcl import TMCLReplyChecksumError
+
+
+class AsyncSerialTmclInterface(AsyncTmclInterface):
+    """
+    asyncio version of the SerialTmclInterface.
+
+    The serial port is opened in non-blocking mode and its file descriptor is
+    watched by the event loop, so no thread blocks on a read. This requires an
+    event loop supporting add_reader(), i.e. a POSIX system. Writes, which
+    block until the driver has taken the data, run in the default executor.
+
+    Replies are read through a TmclFrameReader, which resynchronizes to the
+    reply stream after lost or extra bytes and drops late replies after a
+    timeout.
+    """
+
+    def __init__(self, com_port, datarate=115200, host_id=2, module_id=1, timeout_s=5):
+        if not isinstance(com_port, str):
+            raise TypeError
+
+        AsyncTmclInterface.__init__(self, host_id, module_id)
+        self._baudrate = datarate
+        self._timeout_s = None if timeout_s == 0 else timeout_s
+
+        self.logger = logging.getLogger("{}.{}".format(self.__class__.__name__, com_port))
+
+        self.logger.debug("Opening port (baudrate=%s).", datarate)
+        try:
+            self._serial = Serial(com_port, self._baudrate, timeout=0)
+        except SerialException as e:
+            raise ConnectionError from e
+
+        self._frames = TmclFrameReader(None, host_id, self._serial.reset_input_buffer)
+
+    async def close(self):
+        self.logger.info("Closing port.")
+        self._serial.close()
+
+    async def _send(self, host_id, module_id, data):
+        del host_id, module_id
+        self._frames.sync()
+        for offset in range(0, len(data), 9):
+            self._frames.expect(data, offset)
+        await asyncio.get_running_loop().run_in_executor(None, self._serial.write, data)
+
+    async def _recv(self, host_id, module_id):
+        del host_id, module_id
+        return (await self._read_frames(1))[0]
+
+    async def _send_recv_many(self, requests):
+        """
+        Write all requests at once and read the replies back in bulk.
+        """
+        await self._send(self._host_id, None, b"".join(request.to_buffer() for request in requests))
+        return await self._read_frames(len(requests))
+
+    async def _receive(self):
+        data = self._serial.read(self._serial.in_waiting)
+        while not data:
+            loop = asyncio.get_running_loop()
+            readable = loop.create_future()
+            loop.add_reader(self._serial.fileno(), lambda: readable.done() or readable.set_result(None))
+            try:
+                await readable
+            finally:
+                loop.remove_reader(self._serial.fileno())
+            data = self._serial.read(self._serial.in_waiting or 1)
+        return data
+
+    def _reply_check(self, reply):
+        if not reply.is_checksum_correct():
+            raise TMCLReplyChecksumError(reply)
+
+    def __str__(self):
+        return "Connection: type={} port={} baudrate={}".format(type(self).__name__, self._serial.portstr, self._baudrate)
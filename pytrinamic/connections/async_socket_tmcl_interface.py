@@ -0,0 +1,124 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import asyncio
+import logging
+import re
+import socket
+
+from .async_tmcl_interface import AsyncTmclInterface
+from .tmcl_frame_reader import TmclFrameReader
+from ..tmcl import TMCLReplyChecksumError
+
+
+class AsyncSocketTmclInterface(AsyncTmclInterface):
+    """
+    asyncio version of the SocketTmclInterface, for use with e.g. an
+    ethernet-to-serial converter.
+
+    The connection is opened on entering an async with-statement block, by
+    calling connect() or on the first request. A connection closed by the
+    peer is opened again on the next request.
+
+    Replies are read through a TmclFrameReader, which resynchronizes to the
+    reply stream after lost or extra bytes and drops late replies after a
+    timeout.
+    """
+
+    def __init__(self, ip_and_port, host_id=2, module_id=1, timeout_s=5):
+        if not isinstance(ip_and_port, str):
+            raise TypeError
+
+        match = re.match(r'^"?((?:[0-9]{1,3}\.){3}[0-9]{1,3}):([0-9]{1,5})"?$', ip_and_port)
+        if match is None:
+            raise ValueError("Invalid ip:port combination")
+
+        AsyncTmclInterface.__init__(self, host_id, module_id)
+        self._socket_ip = match.group(1)
+        self._socket_port = int(match.group(2))
+        self._timeout_s = None if timeout_s == 0 else timeout_s
+        self._socket = None
+        self._frames = TmclFrameReader(None, host_id, self._discard_input)
+
+        self.logger = logging.getLogger("{}.{}".format(self.__class__.__name__, ip_and_port))
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def connect(self):
+        """
+        Open the socket connection, if it is not open already.
+        """
+        if self._socket is not None:
+            return
+        connection = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        connection.setblocking(False)
+        try:
+            await asyncio.wait_for(
+                asyncio.get_running_loop().sock_connect(connection, (self._socket_ip, self._socket_port)), self._timeout_s
+            )
+        except (OSError, asyncio.TimeoutError) as e:
+            connection.close()
+            raise ConnectionError("Failed to connect to Socket connection") from e
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._socket = connection
+        self._frames.reset()
+
+    async def close(self):
+        if self._socket is None:
+            return
+        self.logger.info("Closing socket.")
+        self._socket.close()
+        self._socket = None
+
+    async def _send(self, host_id, module_id, data):
+        del host_id, module_id
+        await self.connect()
+        self._frames.sync()
+        for offset in range(0, len(data), 9):
+            self._frames.expect(data, offset)
+        await asyncio.get_running_loop().sock_sendall(self._socket, data)
+
+    async def _recv(self, host_id, module_id):
+        del host_id, module_id
+        return (await self._read_frames(1))[0]
+
+    async def _send_recv_many(self, requests):
+        """
+        Write all requests at once and read the replies back in bulk.
+        """
+        await self._send(self._host_id, None, b"".join(request.to_buffer() for request in requests))
+        return await self._read_frames(len(requests))
+
+    async def _receive(self):
+        data = await asyncio.get_running_loop().sock_recv(self._socket, 4096)
+        if not data:
+            # Reconnect on the next request
+            self._socket.close()
+            self._socket = None
+            raise ConnectionError("Socket connection closed by peer")
+        return data
+
+    def _discard_input(self):
+        """
+        Drop the bytes received but not read yet, e.g. replies arriving after
+        a timeout.
+        """
+        try:
+            while self._socket.recv(4096):
+                pass
+        except OSError:
+            pass
+
+    def _reply_check(self, reply):
+        if not reply.is_checksum_correct():
+            raise TMCLReplyChecksumError(reply)
+
+    def __str__(self):
+        return "Connection: type={} ip={} port={}".format(type(self).__name__, self._socket_ip, self._socket_port)
@@ -0,0 +1,375 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import asyncio
+import logging
+from abc import ABC
+from ..tmcl import TMCL, TMCLRequest, TMCLPreparedRequest, TMCLCommand, TMCLReply, TMCLReplyError, TMCLReplyChecksumError, TMCLReplyStatusError, TMCLTimeoutError
+from ..helpers import to_signed_32
+
+
+class AsyncTmclInterface(ABC):
+    """
+    This class is the asyncio counterpart of TmclInterface.
+
+    All functions sending TMCL commands are coroutines. A single event loop can
+    drive many instances (e.g. one per gateway or serial port) concurrently.
+    Requests on one instance are serialized by a lock, so concurrent tasks
+    sharing one bus get matching replies.
+
+    A subclass is required to override the following coroutines:
+        _send(self, host_id, module_id, data)
+        _recv(self, host_id, module_id)
+        close(self)
+
+    A subclass may override the following coroutine to provide a faster path
+    for send_many():
+        _send_recv_many(self, requests)
+
+    Stream transports read their replies with _read_frames(), through a
+    TmclFrameReader in self._frames. They override the coroutine
+    _receive(self), returning the next received bytes, and set
+    self._timeout_s.
+    """
+
+    def __init__(self, host_id=2, default_module_id=1):
+        """
+        Parameters:
+            host_id:
+                Type: int, optional, default value: 2
+                The ID of the TMCL host.
+            default_module_id:
+                Type: int, optional, default value: 1
+                The default module ID to use when no ID is given to any of the
+                interface functions.
+        """
+        self.logger = logging.getLogger("AsyncTmclInterfaceAbstractBaseClassObject")  # Will be overwritten in derived classes
+
+        TMCL.validate_host_id(host_id)
+        TMCL.validate_module_id(default_module_id)
+
+        self._host_id = host_id
+        self._module_id = default_module_id
+        # Created on first use, so it belongs to the running event loop
+        self._lock = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exit_type, value, traceback):
+        """
+        Close the connection at the end of an async with-statement block.
+        """
+        del exit_type, value, traceback
+        await self.close()
+
+    async def close(self):
+        raise NotImplementedError("The async TMCL interface requires an implementation of the close() function")
+
+    async def _send(self, host_id, module_id, data):
+        """
+        Send the bytearray [data] representing a TMCL command. The length of
+        [data] is 9.
+        """
+        raise NotImplementedError("The async TMCL interface requires an implementation of the send() function")
+
+    async def _recv(self, host_id, module_id):
+        """
+        Receive a TMCL reply and return it as a bytearray of length 9.
+        """
+        raise NotImplementedError("The async TMCL interface requires an implementation of the receive() function")
+
+    async def _receive(self):
+        """
+        Wait for bytes from the transport and return them, for
+        _read_frames().
+        """
+        raise NotImplementedError("Reading frames requires an implementation of the receive() function")
+
+    async def _read_frames(self, count):
+        """
+        Read the replies of the next [count] requests registered with
+        self._frames.expect(). Returns a list of bytearrays of length 9.
+
+        The frame reader resynchronizes to the reply stream after lost or
+        extra bytes. After a timeout, the bytes of the partial reply are
+        dropped and late replies are discarded before the next request.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if self._timeout_s is None else loop.time() + self._timeout_s
+        frames = []
+        try:
+            while len(frames) < count:
+                frame = self._frames.pop_frame()
+                if frame is not None:
+                    frames.append(frame)
+                    continue
+                timeout = None if deadline is None else max(deadline - loop.time(), 0)
+                self._frames.feed(await asyncio.wait_for(self._receive(), timeout))
+        except asyncio.TimeoutError:
+            self._frames.abort()
+            raise TMCLTimeoutError("TMCL datagram timed out") from None
+        except asyncio.CancelledError:
+            # The replies may still arrive, they are dropped before the next request
+            self._frames.abort()
+            raise
+        except Exception:
+            self._frames.reset()
+            raise
+        return frames
+
+    def _reply_check(self, reply):
+        """
+        Interface specific check of the reply. Per default no check is
+        implemented.
+        """
+        pass
+
+    def _get_lock(self):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    def _process_reply(self, request, data):
+        reply = TMCLReply.from_buffer(data)
+
+        self.logger.debug("Rx: %s", reply)
+
+        self._reply_check(reply)
+
+        # Status codes below 100 indicate an error response.
+        # Ignore status when receiving the ascii firmware version.
+        if reply.status < 100 and request.command != TMCLCommand.GET_FIRMWARE_VERSION:
+            raise TMCLReplyStatusError(reply)
+
+        return reply
+
+    async def send_request(self, request):
+        """
+        Send a TMCL_Request and wait for the TMCL_Reply.
+        """
+        self.logger.debug("Tx: %s", request)
+
+        async with self._get_lock():
+            await self._send(self._host_id, request.moduleAddress, request.to_buffer())
+            data = await self._recv(self._host_id, request.moduleAddress)
+
+        return self._process_reply(request, data)
+
+    async def send(self, opcode, op_type, motor, value, module_id=None):
+        """
+        Send a TMCL datagram and wait for the reply.
+        """
+        if any(not isinstance(arg, int) for arg in [opcode, op_type, motor, value]):
+            raise TypeError("Expected integer values!")
+
+        # If no module ID is given, use the default one
+        if not module_id:
+            module_id = self._module_id
+
+        return await self.send_request(TMCLRequest(module_id, opcode, op_type, motor, value))
+
+    def prepare(self, opcode, op_type, motor, value=0, module_id=None):
+        """
+        Validate and encode a TMCL datagram once, for sending it repeatedly
+        with send_prepared(). See TmclInterface.prepare().
+        """
+        if any(not isinstance(arg, int) for arg in [opcode, op_type, motor, value]):
+            raise TypeError("Expected integer values!")
+
+        # If no module ID is given, use the default one
+        if not module_id:
+            module_id = self._module_id
+
+        return TMCLPreparedRequest(TMCLRequest(module_id, opcode, op_type, motor, value))
+
+    async def send_prepared(self, prepared):
+        """
+        Send a TMCLPreparedRequest created by prepare() and wait for the
+        TMCL_Reply.
+        """
+        request = prepared.request
+        self.logger.debug("Tx: %s", request)
+
+        async with self._get_lock():
+            await self._send(self._host_id, request.moduleAddress, prepared.frame)
+            data = await self._recv(self._host_id, request.moduleAddress)
+
+        return self._process_reply(request, data)
+
+    async def _send_recv_many(self, requests):
+        """
+        Send all TMCLRequests in [requests] and return the received replies as
+        a list of bytearrays of length 9. Called with the lock held.
+        """
+        frames = []
+        for request in requests:
+            await self._send(self._host_id, request.moduleAddress, request.to_buffer())
+            frames.append(await self._recv(self._host_id, request.moduleAddress))
+        return frames
+
+    async def send_many(self, requests, module_id=None, raise_on_error=True):
+        """
+        Send a batch of TMCL requests and wait for all replies.
+
+        See TmclInterface.send_many() for the parameters.
+        """
+        # If no module ID is given, use the default one
+        if not module_id:
+            module_id = self._module_id
+
+        batch = []
+        for request in requests:
+            if not isinstance(request, TMCLRequest):
+                if len(request) != 4 or any(not isinstance(arg, int) for arg in request):
+                    raise TypeError("Expected TMCLRequest objects or tuples of four integer values!")
+                request = TMCLRequest(module_id, *request)
+            self.logger.debug("Tx: %s", request)
+            batch.append(request)
+
+        if not batch:
+            return []
+
+        async with self._get_lock():
+            frames = await self._send_recv_many(batch)
+
+        replies = []
+        error = None
+        for request, data in zip(batch, frames):
+            try:
+                replies.append(self._process_reply(request, data))
+            except TMCLReplyError as e:
+                replies.append(e.reply)
+                error = error or e
+
+        if error and raise_on_error:
+            raise error
+
+        return replies
+
+    async def get_version_string(self, module_id=None):
+        """
+        Request the ASCII version string.
+        """
+        try:
+            reply = await self.send(TMCLCommand.GET_FIRMWARE_VERSION, 0, 0, 0, module_id)
+        except (TMCLReplyStatusError, TMCLReplyChecksumError) as exc:
+            return exc.reply.version_string()
+        else:
+            return reply.version_string()
+
+    # General parameter access functions
+    async def get_parameter(self, p_command, p_type, p_axis, p_value, module_id=None, signed=False):
+        value = (await self.send(p_command, p_type, p_axis, p_value, module_id)).value
+        return to_signed_32(value) if signed else value
+
+    async def set_parameter(self, p_command, p_type, p_axis, p_value, module_id=None):
+        return await self.send(p_command, p_type, p_axis, p_value, module_id)
+
+    # Axis parameter access functions
+    async def get_axis_parameter(self, command_type, axis, module_id=None, signed=False):
+        value = (await self.send(TMCLCommand.GAP, command_type, axis, 0, module_id)).value
+        return to_signed_32(value) if signed else value
+
+    async def get_axis_parameters(self, command_types, axis, module_id=None, signed=False):
+        replies = await self.send_many([(TMCLCommand.GAP, command_type, axis, 0) for command_type in command_types], module_id)
+        return [to_signed_32(reply.value) if signed else reply.value for reply in replies]
+
+    async def set_axis_parameter(self, command_type, axis, value, module_id=None):
+        return await self.send(TMCLCommand.SAP, command_type, axis, value, module_id)
+
+    async def store_axis_parameter(self, command_type, axis, module_id=None):
+        return await self.send(TMCLCommand.STAP, command_type, axis, 0, module_id)
+
+    async def set_and_store_axis_parameter(self, command_type, axis, value, module_id=None):
+        await self.send(TMCLCommand.SAP, command_type, axis, value, module_id)
+        await self.send(TMCLCommand.STAP, command_type, axis, 0, module_id)
+
+    # Global parameter access functions
+    async def get_global_parameter(self, command_type, bank, module_id=None, signed=False):
+        value = (await self.send(TMCLCommand.GGP, command_type, bank, 0, module_id)).value
+        return to_signed_32(value) if signed else value
+
+    async def get_global_parameters(self, command_types, bank, module_id=None, signed=False):
+        replies = await self.send_many([(TMCLCommand.GGP, command_type, bank, 0) for command_type in command_types], module_id)
+        return [to_signed_32(reply.value) if signed else reply.value for reply in replies]
+
+    async def set_global_parameter(self, command_type, bank, value, module_id=None):
+        return await self.send(TMCLCommand.SGP, command_type, bank, value, module_id)
+
+    async def store_global_parameter(self, command_type, bank, module_id=None):
+        return await self.send(TMCLCommand.STGP, command_type, bank, 0, module_id)
+
+    async def set_and_store_global_parameter(self, command_type, bank, value, module_id=None):
+        await self.send(TMCLCommand.SGP, command_type, bank, value, module_id)
+        await self.send(TMCLCommand.STGP, command_type, bank, 0, module_id)
+
+    # Register access functions
+    async def write_mc(self, register_address, value, module_id=None):
+        return await self.write_register(register_address, TMCLCommand.WRITE_MC, 0, value, module_id)
+
+    async def read_mc(self, register_address, module_id=None, signed=False):
+        return await self.read_register(register_address, TMCLCommand.READ_MC, 0, module_id, signed)
+
+    async def write_mc_by_id(self, ic_id, register_address, value, module_id=None):
+        return await self.write_register(register_address, TMCLCommand.WRITE_MC, ic_id, value, module_id)
+
+    async def read_mc_by_id(self, ic_id, register_address, module_id=None, signed=False):
+        return await self.read_register(register_address, TMCLCommand.READ_MC, ic_id, module_id, signed)
+
+    async def write_drv(self, register_address, value, module_id=None):
+        return await self.write_register(register_address, TMCLCommand.WRITE_DRV, 1, value, module_id)
+
+    async def read_drv(self, register_address, module_id=None, signed=False):
+        return await self.read_register(register_address, TMCLCommand.READ_DRV, 1, module_id, signed)
+
+    async def read_register(self, register_address, command, channel, module_id=None, signed=False):
+        tmcl_motor = (channel & 0x0F) | ((register_address & 0x0F00) >> 4)
+        tmcl_type = register_address & 0xFF
+        value = (await self.send(command, tmcl_type, tmcl_motor, 0, module_id)).value
+        return to_signed_32(value) if signed else value
+
+    async def write_register(self, register_address, command, channel, value, module_id=None):
+        tmcl_motor = (channel & 0x0F) | ((register_address & 0x0F00) >> 4)
+        tmcl_type = register_address & 0xFF
+        return await self.send(command, tmcl_type, tmcl_motor, value, module_id)
+
+    # Motion control functions
+    async def rotate(self, motor, velocity, module_id=None):
+        return await self.send(TMCLCommand.ROR, 0, motor, velocity, module_id)
+
+    async def stop(self, motor, module_id=None):
+        return await self.send(TMCLCommand.MST, 0, motor, 0, module_id)
+
+    async def move(self, move_type, motor, position, module_id=None):
+        return await self.send(TMCLCommand.MVP, move_type, motor, position, module_id)
+
+    async def move_to(self, motor, position, module_id=None):
+        return (await self.move(0, motor, position, module_id)).value
+
+    async def move_by(self, motor, distance, module_id=None):
+        return (await self.move(1, motor, distance, module_id)).value
+
+    async def reference_search(self, command_type, motor, module_id=None):
+        return (await self.send(TMCLCommand.RFS, command_type, motor, 0, module_id)).value
+
+    # IO pin functions
+    async def get_analog_input(self, x, module_id=None):
+        return (await self.send(TMCLCommand.GIO, x, 1, 0, module_id)).value
+
+    async def get_digital_input(self, x, module_id=None):
+        return (await self.send(TMCLCommand.GIO, x, 0, 0, module_id)).value
+
+    async def get_digital_output(self, x, module_id=None):
+        return (await self.send(TMCLCommand.GIO, x, 2, 0, module_id)).value
+
+    async def set_digital_output(self, x, module_id=None):
+        await self.send(TMCLCommand.SIO, x, 2, 1, module_id)
+
+    async def clear_digital_output(self, x, module_id=None):
+        await self.send(TMCLCommand.SIO, x, 2, 0, module_id)
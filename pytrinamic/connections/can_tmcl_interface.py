@@ -7,12 +7,73 @@
 ################################################################################
 
 import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
 import can
 from ..connections.tmcl_interface import TmclInterface
+from ..tmcl import TMCLReply, TMCLTimeoutError
+
+
+class CanTmclTimeoutError(TMCLTimeoutError, ConnectionError):
+    """
+    No reply was received within the timeout. A ConnectionError as well, for
+    compatibility with code written before TMCLTimeoutError.
+    """
+    pass
+
+
+class _ReplyFrame(bytearray):
+    """
+    A received reply frame with the timestamp of its CAN message.
+    """
+    timestamp = None
+
+
+class _ReplyListener(can.Listener):
+    """
+    Hands the messages received by the Notifier thread to the interface.
+    """
+
+    def __init__(self, interface):
+        self._interface = interface
+
+    def on_message_received(self, msg):
+        self._interface._on_message(msg)
+
+    def on_error(self, exc):
+        self._interface._on_reader_error(exc)
 
 
 class CanTmclInterface(TmclInterface):
-    """Generic CAN interface class for the CAN adapters."""
+    """
+    Generic CAN interface class for the CAN adapters.
+
+    Every reply carries the address of the answering module in its first data
+    byte. Replies are routed by this address to the request waiting for them,
+    so requests to different modules can be in flight at the same time, e.g.
+    from one thread per module:
+        modules = [TMCM1240(interface, module_id) for module_id in range(1, 13)]
+        threads = [threading.Thread(target=poll, args=(module,)) for module in modules]
+    Requests to the same module are sent one after another. No background
+    thread is needed: one of the waiting threads reads the bus and hands over
+    the replies for the others.
+
+    Alternatively, start_reader() receives in a background thread (a
+    python-can Notifier), which completes a future per request as soon as the
+    reply arrives. In this mode replies nobody waits for, e.g. sent by a TMCL
+    program running on a module, are kept and can be fetched with
+    unsolicited_replies() or handled by a callback. Handing each reply over
+    from the reader thread costs some latency, so a single thread polling is
+    faster without it.
+
+    Every TMCLReply carries the timestamp of its CAN message, which is the
+    hardware receive time on adapters supporting it.
+
+    Modules configured to answer with different reply IDs can be received
+    with set_reply_ids().
+    """
 
     def __init__(self, channel, datarate, host_id, default_module_id, timeout_s):
 
@@ -25,6 +86,21 @@ class CanTmclInterface(TmclInterface):
         else:
             self._timeout_s = timeout_s
 
+        self._reply_ids = {host_id}
+        # Received replies by module address, for the modules with a request
+        # in flight. Guarded by _condition.
+        self._replies = {}
+        self._condition = threading.Condition()
+        # True while a thread is reading the bus
+        self._reading = False
+        self._module_locks = {}
+        # Reader mode: the Notifier and the Future of each module with a
+        # request in flight, guarded by _condition
+        self._notifier = None
+        self._waiters = {}
+        self._unsolicited = deque(maxlen=1000)
+        self._on_unsolicited = None
+
         self.logger = logging.getLogger(f"{self.__class__.__name__}.{self._channel}")
 
     def __enter__(self):
@@ -40,8 +116,116 @@ class CanTmclInterface(TmclInterface):
     def close(self):
         self.logger.info("Shutdown.")
 
+        self.stop_reader()
         self._connection.shutdown()
 
+    def start_reader(self, on_unsolicited=None, max_unsolicited=1000):
+        """
+        Receive the replies in a background thread instead of the threads
+        waiting for them.
+
+        Parameters:
+            on_unsolicited:
+                Type: function, optional, default value: None
+                Called with the TMCLReply of every reply no request waits for.
+                It runs on the reader thread, so it must not block.
+            max_unsolicited:
+                Type: int, optional, default value: 1000
+                The number of unsolicited replies kept for
+                unsolicited_replies(). Older ones are dropped.
+        """
+        if self._notifier is not None:
+            return
+        with self._condition:
+            self._unsolicited = deque(self._unsolicited, maxlen=max_unsolicited)
+            self._on_unsolicited = on_unsolicited
+        self._notifier = can.Notifier(self._connection, [_ReplyListener(self)], timeout=0.1)
+
+    def stop_reader(self):
+        """
+        Stop the background thread started by start_reader(). Requests still
+        waiting for a reply fail with ConnectionError.
+        """
+        notifier, self._notifier = self._notifier, None
+        if notifier is None:
+            return
+        notifier.stop()
+        self._fail_waiters(ConnectionError("The CAN reader was stopped"))
+
+    def unsolicited_replies(self):
+        """
+        Return and forget the TMCLReplys received while no request was waiting
+        for them, oldest first.
+        """
+        with self._condition:
+            replies = list(self._unsolicited)
+            self._unsolicited.clear()
+        return replies
+
+    def _on_message(self, msg):
+        """
+        Complete the future of the request waiting for the received CAN
+        message. Runs on the Notifier thread.
+        """
+        frame = self._frame(msg)
+        if frame is None:
+            return
+        with self._condition:
+            future = self._waiters.get(frame[1])
+            if future is not None and not future.done():
+                future.set_result(frame)
+                return
+        self._keep_unsolicited(frame)
+
+    def _on_reader_error(self, exc):
+        self.logger.error("The CAN reader failed: %s", exc)
+        self._fail_waiters(ConnectionError(
+            f"Failed to receive a TMCL message from {self.__class__.__name__} (channel {str(self._channel)})"))
+
+    def _fail_waiters(self, error):
+        with self._condition:
+            waiters = list(self._waiters.values())
+        for future in waiters:
+            if not future.done():
+                future.set_exception(error)
+
+    def _keep_unsolicited(self, frame):
+        reply = TMCLReply.from_buffer(frame)
+        reply.timestamp = frame.timestamp
+        self.logger.debug("Unsolicited reply: %s", reply)
+        with self._condition:
+            self._unsolicited.append(reply)
+            callback = self._on_unsolicited
+        if callback is not None:
+            callback(reply)
+
+    def set_reply_ids(self, reply_ids):
+        """
+        Receive the replies sent with any of the CAN IDs in [reply_ids], for
+        modules configured with different reply IDs. By default only replies
+        with the host ID are received.
+        """
+        reply_ids = set(reply_ids)
+        self._connection.set_filters([{"can_id": reply_id, "can_mask": 0x7FF, "extended": False} for reply_id in sorted(reply_ids)])
+        self._reply_ids = reply_ids
+
+    def _module_lock(self, module_id):
+        lock = self._module_locks.get(module_id)
+        if lock is None:
+            lock = self._module_locks.setdefault(module_id, threading.Lock())
+        return lock
+
+    def send_request(self, request):
+        # Requests of several threads may be in flight, so the shared transmit
+        # buffer is not used
+        self.logger.debug("Tx: %s", request)
+
+        return self._transfer(request, request.to_buffer())
+
+    def _transfer(self, request, data):
+        with self._module_lock(request.moduleAddress):
+            return TmclInterface._transfer(self, request, data)
+
     def _send(self, host_id, module_id, data):
         """
         Send the bytearray parameter [data].
@@ -52,6 +236,13 @@ class CanTmclInterface(TmclInterface):
 
         msg = can.Message(arbitration_id=module_id, is_extended_id=False, data=data[1:])
 
+        with self._condition:
+            # Replies of the module arriving before were not waited for
+            if self._notifier is not None:
+                self._waiters[module_id] = Future()
+            else:
+                self._replies[module_id] = deque()
+
         try:
             self._connection.send(msg)
         except can.CanError as e:
@@ -65,24 +256,163 @@ class CanTmclInterface(TmclInterface):
 
         This is a required override function for using the tmcl_interface class.
         """
-        del module_id
+        del host_id
 
         try:
-            msg = self._connection.recv(timeout=self._timeout_s)
-        except can.CanError as e:
-            raise ConnectionError(
-                f"Failed to receive a TMCL message from {self.__class__.__name__} (channel {str(self._channel)})"
-            ) from e
+            return self._receive((module_id,))[1]
+        finally:
+            with self._condition:
+                self._replies.pop(module_id, None)
+                self._waiters.pop(module_id, None)
+
+    def _receive(self, module_ids):
+        """
+        Wait for the next reply of one of the modules [module_ids], which
+        have a request in flight. Returns the module address and the reply as
+        a bytearray.
 
-        if not msg:
-            raise ConnectionError(f"Recv timed out ({self.__class__.__name__}, on channel {str(self._channel)})")
+        If no other thread reads the bus, this thread reads it and routes the
+        replies for other modules to their waiting threads.
+        """
+        if self._notifier is not None:
+            return self._receive_from_reader(module_ids)
+
+        deadline = None if self._timeout_s is None else time.monotonic() + self._timeout_s
+        with self._condition:
+            while True:
+                for module_id in module_ids:
+                    replies = self._replies.get(module_id)
+                    if replies:
+                        return module_id, replies.popleft()
+
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise CanTmclTimeoutError(f"Recv timed out ({self.__class__.__name__}, on channel {str(self._channel)})")
+
+                if self._reading:
+                    self._condition.wait(remaining)
+                    continue
+
+                self._reading = True
+                self._condition.release()
+                try:
+                    msg = self._connection.recv(timeout=remaining)
+                except can.CanError as e:
+                    raise ConnectionError(
+                        f"Failed to receive a TMCL message from {self.__class__.__name__} (channel {str(self._channel)})"
+                    ) from e
+                finally:
+                    self._condition.acquire()
+                    self._reading = False
+                    # Hand over reading the bus to a waiting thread
+                    self._condition.notify_all()
+
+                if msg is not None:
+                    self._route(msg)
+
+    def _receive_from_reader(self, module_ids):
+        """
+        _receive() in reader mode: wait for the future of one of the modules.
+        """
+        with self._condition:
+            futures = {self._waiters[module_id]: module_id for module_id in module_ids}
+        done, _ = wait(futures, self._timeout_s, FIRST_COMPLETED)
+        if not done:
+            raise CanTmclTimeoutError(f"Recv timed out ({self.__class__.__name__}, on channel {str(self._channel)})")
+        future = done.pop()
+        return futures[future], future.result()
 
-        if msg.arbitration_id != host_id:
+    def _frame(self, msg):
+        """
+        Return the received CAN message as reply frame, or None if it is no
+        TMCL reply.
+        """
+        if msg.arbitration_id not in self._reply_ids:
             # The filter shouldn't let wrong messages through.
             # This is just a sanity check
-            self.logger.warning("Received a CAN Frame with unexpected ID (received: %d; expected: %d)", msg.arbitration_id, host_id)
+            self.logger.warning("Received a CAN Frame with unexpected ID (received: %d; expected: %s)",
+                                msg.arbitration_id, sorted(self._reply_ids))
+            return None
+        if len(msg.data) != 8:
+            self.logger.warning("Received a CAN Frame with %d instead of 8 data bytes", len(msg.data))
+            return None
+
+        frame = _ReplyFrame(9)
+        frame[0] = msg.arbitration_id
+        frame[1:] = msg.data
+        frame.timestamp = msg.timestamp
+        return frame
+
+    def _route(self, msg):
+        """
+        Queue the received CAN message for the request waiting for it. Called
+        with _condition held.
+        """
+        frame = self._frame(msg)
+        if frame is None:
+            return
+
+        replies = self._replies.get(frame[1])
+        if replies is None:
+            self._condition.release()
+            try:
+                self._keep_unsolicited(frame)
+            finally:
+                self._condition.acquire()
+            return
+        replies.append(frame)
+
+    def _process_reply(self, request, data):
+        reply = TmclInterface._process_reply(self, request, data)
+        reply.timestamp = getattr(data, "timestamp", None)
+        return reply
+
+    def _send_recv_many(self, requests):
+        """
+        Send a batch of requests with requests to different modules in flight
+        at the same time.
+
+        The CAN receive buffers of the modules are small, so each module only
+        gets its next request after it answered the previous one. Replies are
+        assigned to the requests by the module address they carry.
+        """
+        pending = {}
+        for index, request in enumerate(requests):
+            pending.setdefault(request.moduleAddress, deque()).append(index)
+
+        # Locked in a fixed order, so concurrent batches do not deadlock
+        locks = [self._module_lock(module_id) for module_id in sorted(pending)]
+        for lock in locks:
+            lock.acquire()
+        try:
+            for module_id, indices in pending.items():
+                self._send(self._host_id, module_id, requests[indices[0]].to_buffer())
+
+            frames = [None] * len(requests)
+            waiting = tuple(pending)
+            while waiting:
+                module_id, data = self._receive(waiting)
+                indices = pending[module_id]
+                frames[indices.popleft()] = data
+                if indices:
+                    self._send(self._host_id, module_id, requests[indices[0]].to_buffer())
+                else:
+                    waiting = tuple(module_id for module_id, indices in pending.items() if indices)
+
+            return frames
+        finally:
+            with self._condition:
+                for module_id in pending:
+                    self._replies.pop(module_id, None)
+                    self._waiters.pop(module_id, None)
+            for lock in locks:
+                lock.release()
+
+    def set_timeout(self, timeout):
+        self._timeout_s = timeout if timeout != 0 else None
 
-        return bytearray([msg.arbitration_id]) + msg.data
+    def get_timeout(self):
+        return self._timeout_s
 
     @staticmethod
     def supports_tmcl():
@@ -7,23 +7,36 @@
 ################################################################################
 
 import sys
+import inspect
 import logging
 import argparse
+from collections.abc import Sequence
 
-from ..connections import DummyTmclInterface
-from ..connections import PcanTmclInterface
-from ..connections import SocketcanTmclInterface
-from ..connections import KvaserTmclInterface
-from ..connections import SerialTmclInterface
-from ..connections import UartIcInterface
-from ..connections import UsbTmclInterface
-from ..connections import SlcanTmclInterface
-from ..connections import IxxatTmclInterface
-from ..connections import SocketTmclInterface
+from .. import connections
 
 logger = logging.getLogger(__name__)
 
 
+class _InterfaceTable(Sequence):
+    """
+    The ConnectionManager.INTERFACES tuples (string representation, class,
+    default datarate). The class of an entry is imported when the entry is
+    read, so only the interfaces used get imported.
+    """
+
+    def __init__(self, entries):
+        self._entries = entries
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self._entries)))]
+        name, class_name, default_datarate = self._entries[index]
+        return name, ConnectionManager.get_interface_class(class_name), default_datarate
+
+    def __len__(self):
+        return len(self._entries)
+
+
 class ConnectionManager:
     """
     This class provides a centralized way of extracting connection-specific
@@ -87,6 +100,18 @@ class ConnectionManager:
 
             Default value: 5.0
 
+        --adaptive-timeout
+            Derive the rx timeout of a TMCL connection from the measured
+            round trip times, with the --timeout value as upper limit, and
+            retry reads after a lost reply. See
+            TmclInterface.enable_adaptive_timeout().
+
+        --pipeline
+            Write the whole batch of a send_many() call at once instead of
+            request by request. Only for interfaces supporting it, like
+            serial_tmcl and usb_tmcl, on full-duplex links to a single module.
+            On RS485 busses the replies of the modules would collide.
+
         --host-id <host-id>
             The host id to use with a TMCL connection.
 
@@ -99,19 +124,26 @@ class ConnectionManager:
     """
 
     # All available interfaces
-    # The tuples consist of (string representation, class type, default datarate)
-    INTERFACES = [
-        ("dummy_tmcl", DummyTmclInterface, 0),
-        ("kvaser_tmcl", KvaserTmclInterface, 1000000),
-        ("pcan_tmcl", PcanTmclInterface, 1000000),
-        ("slcan_tmcl", SlcanTmclInterface, 1000000),
-        ("socketcan_tmcl", SocketcanTmclInterface, 1000000),
-        ("serial_tmcl", SerialTmclInterface, 9600),
-        ("uart_ic", UartIcInterface, 9600),
-        ("usb_tmcl", UsbTmclInterface, 115200),
-        ("ixxat_tmcl", IxxatTmclInterface, 1000000),
-        ("socket_serial_tmcl", SocketTmclInterface, 1000000),
+    # The tuples consist of (string representation, class name, default datarate)
+    # The class names are resolved with get_interface_class() when used, so
+    # only the selected interface gets imported.
+    _INTERFACES = [
+        ("dummy_tmcl", "DummyTmclInterface", 0),
+        ("emulator_tmcl", "EmulatorTmclInterface", 0),
+        ("replay_tmcl", "ReplayTmclInterface", 0),
+        ("kvaser_tmcl", "KvaserTmclInterface", 1000000),
+        ("pcan_tmcl", "PcanTmclInterface", 1000000),
+        ("slcan_tmcl", "SlcanTmclInterface", 1000000),
+        ("socketcan_tmcl", "SocketcanTmclInterface", 1000000),
+        ("serial_tmcl", "SerialTmclInterface", 9600),
+        ("uart_ic", "UartIcInterface", 9600),
+        ("usb_tmcl", "UsbTmclInterface", 115200),
+        ("ixxat_tmcl", "IxxatTmclInterface", 1000000),
+        ("socket_serial_tmcl", "SocketTmclInterface", 1000000),
+        ("udp_tmcl", "UdpTmclInterface", 0),
     ]
+    # The same with the classes: (string representation, class, default datarate)
+    INTERFACES = _InterfaceTable(_INTERFACES)
 
     def __init__(self, arg_list=None, connection_type="any"):
         # Attributes
@@ -135,7 +167,7 @@ class ConnectionManager:
         args = arg_parser.parse_known_args(arg_list)[0]
 
         # Argument storage - default parameters are set here
-        self.__interface = UsbTmclInterface
+        self.__interface = None
         self.__port = "any"
         self.__no_port = []
         self.__data_rate = 115200
@@ -146,14 +178,17 @@ class ConnectionManager:
 
         # ## Interpret given arguments
         # Interface
-        for actual_interface in self.INTERFACES:
-            if connection_type == "tmcl" and not (actual_interface[1].supports_tmcl()):
+        for actual_interface in self._INTERFACES:
+            if args.interface[0] != actual_interface[0]:
+                continue
+
+            interface = self.get_interface_class(actual_interface[1])
+            if connection_type == "tmcl" and not interface.supports_tmcl():
                 continue
 
-            if args.interface[0] == actual_interface[0]:
-                self.__interface = actual_interface[1]
-                self.__data_rate = actual_interface[2]
-                break
+            self.__interface = interface
+            self.__data_rate = actual_interface[2]
+            break
         else:
             # The for loop never hit the break statement -> invalid interface
             raise ValueError("Invalid interface: {0:s}".format(args.interface[0]))
@@ -180,6 +215,12 @@ class ConnectionManager:
 
         # Timeout
         self.__timeout_s = args.timeout_s
+        self.__adaptive_timeout = args.adaptive_timeout
+
+        # Pipelining
+        self.__pipeline = args.pipeline
+        if self.__pipeline and "pipeline" not in inspect.signature(self.__interface).parameters:
+            raise ValueError("The interface {0:s} does not support pipelining".format(args.interface[0]))
 
         # Host ID
         try:
@@ -199,7 +240,9 @@ class ConnectionManager:
             "Port: %s; "
             "Blacklist: %s; "
             "Data rate: %s; "
-            "Timeout: %s;"
+            "Timeout: %s; "
+            "Adaptive timeout: %s; "
+            "Pipeline: %s; "
             "Host ID: %s; "
             "Module ID: %s]",
             self.__interface.__qualname__,
@@ -207,6 +250,8 @@ class ConnectionManager:
             self.__no_port,
             self.__data_rate,
             self.__timeout_s,
+            self.__adaptive_timeout,
+            self.__pipeline,
             self.__host_id,
             self.__module_id,
         )
@@ -268,13 +313,17 @@ class ConnectionManager:
         try:
             if self.__interface.supports_tmcl():
                 # Open the connection to a TMCL interface
+                options = {"pipeline": True} if self.__pipeline else {}
                 self.__connection = self.__interface(
                     port,
                     self.__data_rate,
                     self.__host_id,
                     self.__module_id,
                     timeout_s=self.__timeout_s,
+                    **options
                 )
+                if self.__adaptive_timeout:
+                    self.__connection.enable_adaptive_timeout()
             else:
                 # Open the connection to a direct IC interface
                 self.__connection = self.__interface(
@@ -359,7 +408,7 @@ class ConnectionManager:
             nargs=1,
             type=str,
             choices=[
-                actual_interface[0] for actual_interface in ConnectionManager.INTERFACES
+                actual_interface[0] for actual_interface in ConnectionManager._INTERFACES
             ],
             default=["usb_tmcl"],
             help="Connection interface (default: %(default)s)",
@@ -399,6 +448,18 @@ class ConnectionManager:
             help="Connection rx timeout in seconds (default: %(default)s)",
             metavar="SECONDS",
         )
+        group.add_argument(
+            "--adaptive-timeout",
+            dest="adaptive_timeout",
+            action="store_true",
+            help="Derive the rx timeout from the measured round trip times and retry lost reads",
+        )
+        group.add_argument(
+            "--pipeline",
+            dest="pipeline",
+            action="store_true",
+            help="Write batches of requests at once, only on full-duplex links to a single module",
+        )
 
         group = arg_parser.add_argument_group("ConnectionManager TMCL options")
 
@@ -425,7 +486,15 @@ class ConnectionManager:
 
     @staticmethod
     def list_supported_interfaces():
-        return [x[0] for x in ConnectionManager.INTERFACES]
+        return [x[0] for x in ConnectionManager._INTERFACES]
+
+    @staticmethod
+    def get_interface_class(class_name):
+        """
+        Import and return the interface class with the given name, e.g.
+        "SerialTmclInterface".
+        """
+        return getattr(connections, class_name)
 
 
 if __name__ == "__main__":
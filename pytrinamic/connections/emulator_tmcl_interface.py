@@ -0,0 +1,120 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import logging
+import time
+from collections import deque
+
+from ..connections.tmcl_interface import TmclInterface
+from ..tmcl import TMCLReplyChecksumError, TMCLTimeoutError
+from ..tools.tmcl_emulator import TmclModuleEmulator
+
+
+class EmulatorTmclInterface(TmclInterface):
+    """
+    In-process TMCL connection to one or more emulated modules, see
+    pytrinamic.tools.tmcl_emulator. Unlike DummyTmclInterface, the emulated
+    modules keep their parameters and registers and simulate the motion.
+
+    Without [modules], one TmclModuleEmulator with the given module ID is
+    created. [latency_s] delays every reply, e.g. to emulate the round trip
+    time of a real bus. A reply delayed beyond the timeout is lost.
+    """
+
+    def __init__(self, port="emulator", datarate=0, host_id=2, module_id=1, timeout_s=5, modules=None, latency_s=0):
+        if not isinstance(port, str):
+            raise TypeError
+
+        TmclInterface.__init__(self, host_id, module_id)
+
+        self.logger = logging.getLogger("{}.{}".format(self.__class__.__name__, port))
+
+        if modules is None:
+            modules = [TmclModuleEmulator(module_id, host_id)]
+        elif isinstance(modules, TmclModuleEmulator):
+            modules = [modules]
+        self.modules = {module.module_id: module for module in modules}
+        self._latency_s = latency_s
+        self._timeout_s = timeout_s if timeout_s != 0 else None
+        self._replies = deque()
+
+        self.logger.debug("Emulating modules %s.", list(self.modules))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        """
+        Close the connection at the end of a with-statement block.
+        """
+        del exit_type, value, traceback
+        self.close()
+
+    def close(self):
+        self._replies.clear()
+
+    def _send(self, host_id, module_id, data):
+        """
+        Send the bytearray parameter [data].
+
+        This is a required override function for using the tmcl_interface
+        class.
+        """
+        del host_id, module_id
+        # Drop replies that were never read, e.g. after send_boot()
+        self._replies.clear()
+        module = self.modules.get(data[0])
+        self._replies.append(module.handle_frame(data) if module else None)
+
+    def _recv(self, host_id, module_id):
+        """
+        Read 9 bytes and return them as a bytearray.
+
+        This is a required override function for using the tmcl_interface
+        class.
+        """
+        del host_id, module_id
+        reply = self._replies.popleft() if self._replies else None
+        if self._latency_s:
+            if self._timeout_s is not None and self._latency_s > self._timeout_s:
+                time.sleep(self._timeout_s)
+                reply = None
+            else:
+                time.sleep(self._latency_s)
+
+        if reply is None:
+            raise TMCLTimeoutError("TMCL datagram timed out")
+
+        return reply
+
+    def _reply_check(self, reply):
+        if not reply.is_checksum_correct():
+            raise TMCLReplyChecksumError(reply)
+
+    def set_timeout(self, timeout):
+        self._timeout_s = timeout if timeout != 0 else None
+
+    def get_timeout(self):
+        return self._timeout_s
+
+    @staticmethod
+    def supports_tmcl():
+        return True
+
+    @staticmethod
+    def list():
+        """
+        Return a list of available connection ports as a list of strings.
+
+        This function is required for using this interface with the
+        connection manager.
+        """
+        return ["emulator"]
+
+    def __str__(self):
+        return "Connection: type=emulator_tmcl_interface modules={}".format(list(self.modules))
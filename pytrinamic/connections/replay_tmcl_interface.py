@@ -0,0 +1,125 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import logging
+from collections import deque
+
+from ..connections.tmcl_interface import TmclInterface
+from ..tmcl import TMCLReplyChecksumError, TMCLTimeoutError
+from ..tools.tmcl_recorder import iter_capture
+
+
+class ReplayTmclInterface(TmclInterface):
+    """
+    TMCL connection answering the requests with the replies of a capture file
+    recorded with pytrinamic.tools.tmcl_recorder.TmclRecorder, e.g. for
+    running a script against the data of a field capture:
+        python script.py --interface replay_tmcl --port capture.tmcl
+
+    Every request is answered with the next recorded reply to an identical
+    request frame, so the replies of each request come in recorded order,
+    independent of the order of the other requests. When the recorded replies
+    of a request are used up, the last one is repeated if [repeat] is set,
+    otherwise TMCLTimeoutError is raised, as for requests that were never
+    recorded.
+    """
+
+    def __init__(self, port, datarate=0, host_id=2, module_id=1, timeout_s=5, repeat=False):
+        if not isinstance(port, str):
+            raise TypeError
+
+        TmclInterface.__init__(self, host_id, module_id)
+
+        self.logger = logging.getLogger("{}.{}".format(self.__class__.__name__, port))
+
+        self._repeat = repeat
+        self._recorded = {}
+        try:
+            for request, reply, _ in iter_capture(port):
+                self._recorded.setdefault(request, deque()).append(reply)
+        except OSError as e:
+            raise ConnectionError("Failed to read the capture file " + port) from e
+        self._last = {}
+        self._replies = deque()
+
+        self.logger.debug("Loaded %d distinct requests.", len(self._recorded))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        """
+        Close the connection at the end of a with-statement block.
+        """
+        del exit_type, value, traceback
+        self.close()
+
+    def close(self):
+        self._replies.clear()
+
+    def remaining(self):
+        """
+        Return the number of recorded replies not used yet.
+        """
+        return sum(len(replies) for replies in self._recorded.values())
+
+    def _send(self, host_id, module_id, data):
+        """
+        Send the bytearray parameter [data].
+
+        This is a required override function for using the tmcl_interface
+        class.
+        """
+        del host_id, module_id
+        frame = bytes(data)
+        replies = self._recorded.get(frame)
+        if replies:
+            reply = replies.popleft()
+            self._last[frame] = reply
+        elif self._repeat:
+            reply = self._last.get(frame)
+        else:
+            reply = None
+        if reply is None:
+            self.logger.warning("No recorded reply to %s", frame.hex())
+        self._replies.append(reply)
+
+    def _recv(self, host_id, module_id):
+        """
+        Read 9 bytes and return them as a bytearray.
+
+        This is a required override function for using the tmcl_interface
+        class.
+        """
+        del host_id, module_id
+        reply = self._replies.popleft() if self._replies else None
+        if reply is None:
+            raise TMCLTimeoutError("TMCL datagram timed out")
+
+        return bytearray(reply)
+
+    def _reply_check(self, reply):
+        if not reply.is_checksum_correct():
+            raise TMCLReplyChecksumError(reply)
+
+    @staticmethod
+    def supports_tmcl():
+        return True
+
+    @staticmethod
+    def list():
+        """
+        Return a list of available connection ports as a list of strings.
+
+        This function is required for using this interface with the
+        connection manager. Capture files have to be given as port.
+        """
+        return []
+
+    def __str__(self):
+        return "Connection: type=replay_tmcl_interface requests={}".format(len(self._recorded))
@@ -11,19 +11,30 @@ import logging
 from serial import Serial, SerialException
 import serial.tools.list_ports
 from ..connections.tmcl_interface import TmclInterface
+from ..connections.tmcl_frame_reader import TmclFrameReader
 from ..tmcl import TMCLReplyChecksumError
 
 
 class SerialTmclInterface(TmclInterface):
     """
     Opens a serial TMCL connection
+
+    send_many() sends a batch request by request, which works on any link,
+    including half-duplex RS485 busses shared by several modules. On a
+    full-duplex link to a single module that buffers requests while it is
+    busy, like USB or RS232, pass pipeline=True to write the whole batch at
+    once and read all replies in one go.
+
+    Replies are read through a TmclFrameReader, which resynchronizes to the
+    reply stream after lost or extra bytes.
     """
-    def __init__(self, com_port, datarate=115200, host_id=2, module_id=1, timeout_s=5):
+    def __init__(self, com_port, datarate=115200, host_id=2, module_id=1, timeout_s=5, pipeline=False):
         if not isinstance(com_port, str):
             raise TypeError
 
         TmclInterface.__init__(self, host_id, module_id)
         self._baudrate = datarate
+        self._pipeline = pipeline
         if timeout_s == 0:
             timeout_s = None
 
@@ -35,6 +46,9 @@ class SerialTmclInterface(TmclInterface):
         except SerialException as e:
             raise ConnectionError from e
 
+        self._frames = TmclFrameReader(self._serial.readinto, host_id, self._serial.reset_input_buffer,
+                                       short_read_timeout=True)
+
     def __enter__(self):
         return self
 
@@ -58,6 +72,8 @@ class SerialTmclInterface(TmclInterface):
         """
         del host_id, module_id
 
+        self._frames.sync()
+        self._frames.expect(data)
         self._serial.write(data)
 
     def _recv(self, host_id, module_id):
@@ -69,12 +85,26 @@ class SerialTmclInterface(TmclInterface):
         """
         del host_id, module_id
 
-        data = self._serial.read(9)
+        return self._frames.read_frame()
+
+    def _send_recv_many(self, requests):
+        """
+        With pipelining, write all requests with a single write() and read the
+        replies back in bulk.
+        """
+        if not self._pipeline:
+            return TmclInterface._send_recv_many(self, requests)
+
+        data = self._encode_many(requests)
+        self._frames.sync()
+        for offset in range(0, len(data), 9):
+            self._frames.expect(data, offset)
+        self._serial.write(data)
 
-        if len(data) != 9:
-            raise RuntimeError("TMCL datagram timed out")
+        return self._frames.read_frames(len(requests))
 
-        return data
+    def _expect_late_replies(self, count):
+        self._frames.expect_late(count)
 
     def _reply_check(self, reply):
         if not reply.is_checksum_correct():
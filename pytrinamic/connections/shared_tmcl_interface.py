@@ -0,0 +1,437 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from .tmcl_interface import TmclInterface
+from ..tmcl import TMCLCommand, TMCLRequest, TMCLReplyError, TMCLRetry
+
+
+class TmclPriority:
+    """
+    Priority classes of the SharedTmclInterface dispatcher, the most urgent
+    first.
+    """
+    EMERGENCY                   = 0
+    CONTROL                     = 1
+    NORMAL                      = 2
+    BULK                        = 3
+
+
+_CONTROL_COMMANDS = frozenset([
+    TMCLCommand.ROR, TMCLCommand.ROL, TMCLCommand.MVP, TMCLCommand.SAP, TMCLCommand.SGP, TMCLCommand.RFS,
+    TMCLCommand.SIO, TMCLCommand.WRITE_MC, TMCLCommand.WRITE_DRV,
+])
+
+
+def classify_request(request):
+    """
+    Default priority of a TMCLRequest: motor stops are emergencies, motion
+    commands and writes are control traffic, RAMDebug sample downloads are
+    bulk traffic and everything else (e.g. telemetry polls) is normal.
+    """
+    if request.command in (TMCLCommand.MST, TMCLCommand.STOP):
+        return TmclPriority.EMERGENCY
+    if request.command in _CONTROL_COMMANDS:
+        return TmclPriority.CONTROL
+    if request.command == TMCLCommand.RAMDEBUG:
+        return TmclPriority.BULK
+    return TmclPriority.NORMAL
+
+
+class _TokenBucket:
+    """
+    Rate limit of [rate] jobs per second, allowing bursts of [capacity] jobs.
+    """
+
+    def __init__(self, rate, capacity):
+        if rate <= 0:
+            raise ValueError("The rate limit must be positive")
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._timestamp = time.monotonic()
+
+    def take(self, count):
+        """
+        Take up to [count] tokens. Returns the number of tokens taken.
+        """
+        now = time.monotonic()
+        self._tokens = min(self._capacity, self._tokens + (now - self._timestamp) * self._rate)
+        self._timestamp = now
+        taken = min(count, int(self._tokens))
+        self._tokens -= taken
+        return taken
+
+    def delay(self):
+        """
+        Return the time in seconds until the next token is available.
+        """
+        return max(0.0, (1 - self._tokens) / self._rate)
+
+
+class SharedTmclInterface(TmclInterface):
+    """
+    Thread-safe wrapper sharing one TMCL interface between several threads.
+
+    The wrapped interface is owned by a dispatcher thread. Requests from any
+    thread are put into a queue and answered through futures, so the
+    send/receive pairs of different threads never interleave on the bus.
+    Each request is transferred on its own. On full-duplex links, pass
+    batch_requests=True to transfer the requests queued while the bus is busy
+    together, with the _send_recv_many() path of the wrapped interface (e.g.
+    one write for several requests on a USB or RS232 port, or one request per
+    module in flight on CAN). If such a batch fails, e.g. by a timeout, its
+    requests that are safe to repeat (see TMCLRetry) are retried one by one,
+    the others fail with the error of the batch.
+
+    Queued requests are scheduled by TmclPriority class, in FIFO order within
+    a class. The class of a request is determined by classify_request() (or
+    the given classifier), so e.g. stop() overtakes a RAMDebug sample download
+    running in another thread. A thread can raise or lower the class of its
+    requests with the priority() context manager:
+        with bus.priority(TmclPriority.EMERGENCY):
+            module.set_axis_parameter(module.AP.MaxCurrent, 0, 0)
+    Optionally, classes can be rate limited, e.g. rate_limits={TmclPriority.BULK: 200}
+    leaves bus time for polling other modules during a sample download.
+
+    All blocking functions of TmclInterface (send(), get_axis_parameter(), ...)
+    can be called from any thread. submit()/submit_request() return a
+    concurrent.futures.Future instead of blocking.
+
+    Example, sharing one RS485 port between a telemetry and a motion thread:
+        bus = SharedTmclInterface(SerialTmclInterface("COM4"))
+        module = TMCM1240(bus)
+    """
+
+    def __init__(self, interface, max_batch=32, classifier=classify_request, rate_limits=None, batch_requests=False):
+        """
+        Parameters:
+            interface:
+                Type: TmclInterface
+                The interface to share. It is only accessed by the dispatcher
+                thread from now on and closed by close().
+            max_batch:
+                Type: int, optional, default value: 32
+                The maximum number of queued requests transferred together.
+            classifier:
+                Type: function, optional, default value: classify_request
+                Returns the TmclPriority class of a TMCLRequest.
+            rate_limits:
+                Type: dict, optional, default value: None
+                Maximum number of requests per second, by TmclPriority class.
+            batch_requests:
+                Type: bool, optional, default value: False
+                Transfer the queued requests of several threads together.
+                Only for full-duplex links, on half-duplex busses like RS485
+                the requests would collide.
+        """
+        TmclInterface.__init__(self, interface._host_id, interface._module_id)
+
+        if max_batch < 1:
+            raise ValueError("The batch size must be at least 1")
+
+        self.logger = logging.getLogger("{}.{}".format(self.__class__.__name__, interface.__class__.__name__))
+
+        self._interface = interface
+        self._max_batch = max_batch
+        self._batch_requests = batch_requests
+        self._classifier = classifier
+        self._buckets = {priority: _TokenBucket(rate, min(max_batch, max(1, int(rate))))
+                         for priority, rate in (rate_limits or {}).items()}
+        self._queues = {priority: deque() for priority in sorted(self._priorities())}
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._shutdown = False
+        self._thread = threading.Thread(target=self._dispatch, name=self.logger.name, daemon=True)
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        """
+        Close the connection at the end of a with-statement block.
+        """
+        del exit_type, value, traceback
+        self.close()
+
+    def close(self):
+        """
+        Answer all queued requests, stop the dispatcher thread and close the
+        wrapped interface.
+        """
+        with self._condition:
+            if self._shutdown:
+                return
+            self._shutdown = True
+            self._condition.notify()
+        if threading.current_thread() is not self._thread:
+            self._thread.join()
+        self._interface.close()
+
+    @staticmethod
+    def _priorities():
+        return [value for name, value in vars(TmclPriority).items() if not name.startswith("_")]
+
+    @contextmanager
+    def priority(self, priority):
+        """
+        Context manager overriding the TmclPriority class of all requests of
+        the current thread.
+        """
+        if priority not in self._queues:
+            raise ValueError("Unknown priority class: " + str(priority))
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _priority_of(self, request, priority):
+        if priority is None:
+            priority = getattr(self._local, "priority", None)
+        if priority is None:
+            priority = self._classifier(request)
+        return priority
+
+    def _enqueue(self, job, priority):
+        # Jobs submitted from the dispatcher thread itself (e.g. by a future's
+        # done callback) run immediately, waiting for the queue would deadlock
+        if threading.current_thread() is self._thread:
+            self._run([job])
+            return job[0]
+
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit requests after close()")
+            self._queues[priority].append(job)
+            self._condition.notify()
+        return job[0]
+
+    def submit_request(self, request, priority=None):
+        """
+        Queue a TMCL_Request without waiting for its reply. If no TmclPriority
+        class is given, the class is determined by the classifier.
+
+        Returns a Future which resolves to the TMCL_Reply or raises the
+        TMCLReplyError of a bad reply.
+        """
+        self.logger.debug("Tx: %s", request)
+
+        return self._enqueue((Future(), request, None), self._priority_of(request, priority))
+
+    def submit_prepared(self, prepared, priority=None):
+        """
+        Queue a TMCLPreparedRequest created by prepare() without waiting for
+        its reply. Returns a Future, see submit_request().
+        """
+        self.logger.debug("Tx: %s", prepared.request)
+
+        return self._enqueue((Future(), prepared.request, prepared.frame), self._priority_of(prepared.request, priority))
+
+    def submit(self, opcode, op_type, motor, value, module_id=None, priority=None):
+        """
+        Non-blocking counterpart of send(). Returns a Future.
+        """
+        if any(not isinstance(arg, int) for arg in [opcode, op_type, motor, value]):
+            raise TypeError("Expected integer values!")
+
+        # If no module ID is given, use the default one
+        if not module_id:
+            module_id = self._module_id
+
+        return self.submit_request(TMCLRequest(module_id, opcode, op_type, motor, value), priority)
+
+    def call(self, function, *args, priority=None):
+        """
+        Run function(interface, *args) on the dispatcher thread with exclusive
+        access to the wrapped interface, e.g. for interface specific settings.
+        Without a TmclPriority class, the class of the current thread or
+        TmclPriority.NORMAL is used.
+
+        Returns a Future which resolves to the return value of the function.
+        """
+        if priority is None:
+            priority = getattr(self._local, "priority", None)
+        if priority is None:
+            priority = TmclPriority.NORMAL
+        return self._enqueue((Future(), function, args), priority)
+
+    def send_request(self, request):
+        return self.submit_request(request).result()
+
+    def send_prepared(self, prepared):
+        return self.submit_prepared(prepared).result()
+
+    def _transfer(self, request, data):
+        # The caller may reuse [data], so queue a copy of it
+        return self._enqueue((Future(), request, bytes(data)), self._priority_of(request, None)).result()
+
+    def _send_recv_many(self, requests):
+        # Keep a batch of send_many() together on the bus, scheduled by its
+        # most urgent request
+        priority = min(self._priority_of(request, None) for request in requests)
+        return self.call(lambda interface: interface._send_recv_many(requests), priority=priority).result()
+
+    def _transfer_many(self, requests):
+        priority = min(self._priority_of(request, None) for request in requests)
+        return self.call(lambda interface: interface._transfer_many(requests), priority=priority).result()
+
+    def _reply_check(self, reply):
+        self._interface._reply_check(reply)
+
+    def send_boot(self, module_id=None):
+        self.call(lambda interface: interface.send_boot(module_id)).result()
+
+    def set_timeout(self, timeout):
+        self.call(lambda interface: interface.set_timeout(timeout)).result()
+
+    def get_timeout(self):
+        return self.call(lambda interface: interface.get_timeout()).result()
+
+    # The statistics are collected by the wrapped interface, so they include
+    # the requests of all threads
+    def enable_stats(self):
+        self.call(lambda interface: interface.enable_stats()).result()
+
+    def disable_stats(self):
+        self.call(lambda interface: interface.disable_stats()).result()
+
+    def stats(self):
+        return self._interface.stats()
+
+    def reset_stats(self):
+        self._interface.reset_stats()
+
+    def set_tap(self, tap):
+        self.call(lambda interface: interface.set_tap(tap)).result()
+
+    # The wrapped interface retries, so a retry does not pass the queue again
+    def enable_adaptive_timeout(self, *args, **kwargs):
+        return self.call(lambda interface: interface.enable_adaptive_timeout(*args, **kwargs)).result()
+
+    def disable_adaptive_timeout(self):
+        self.call(lambda interface: interface.disable_adaptive_timeout()).result()
+
+    def adaptive_timeout(self):
+        return self._interface.adaptive_timeout()
+
+    def pending(self):
+        """
+        Return the number of jobs waiting for the dispatcher thread.
+        """
+        with self._condition:
+            return sum(len(jobs) for jobs in self._queues.values())
+
+    def _dispatch(self):
+        while True:
+            with self._condition:
+                while True:
+                    jobs, delay = self._take_jobs()
+                    if jobs or (self._shutdown and delay is None):
+                        break
+                    self._condition.wait(delay)
+
+            if not jobs:
+                return
+
+            self._run(jobs)
+
+    def _take_jobs(self):
+        """
+        Take the next batch of jobs from the most urgent class that has jobs
+        and is not rate limited. Called with the condition held.
+
+        Returns the jobs and, if no jobs can be taken, the time in seconds until
+        a rate limited class can continue (or None).
+        """
+        delay = None
+        for priority, jobs in self._queues.items():
+            if not jobs:
+                continue
+            count = min(len(jobs), self._max_batch)
+            bucket = self._buckets.get(priority)
+            if bucket:
+                count = bucket.take(count)
+                if count == 0:
+                    delay = bucket.delay() if delay is None else min(delay, bucket.delay())
+                    continue
+            return [jobs.popleft() for _ in range(count)], None
+        return [], delay
+
+    def _run(self, jobs):
+        """
+        Execute [jobs] in order. With batch_requests, consecutive requests are
+        transferred as one batch. Function calls run on their own.
+        """
+        batch = []
+        for future, target, argument in jobs:
+            if not future.set_running_or_notify_cancel():
+                continue
+            if isinstance(target, TMCLRequest):
+                if not self._batch_requests:
+                    self._run_request(future, target, argument)
+                    continue
+                batch.append((future, target, argument))
+                continue
+
+            self._run_batch(batch)
+            batch = []
+            try:
+                future.set_result(target(self._interface, *argument))
+            except Exception as e:
+                future.set_exception(e)
+
+        self._run_batch(batch)
+
+    def _run_request(self, future, request, frame):
+        try:
+            future.set_result(self._interface._transfer(request, frame or request.to_buffer()))
+        except Exception as e:
+            future.set_exception(e)
+
+    def _run_batch(self, batch):
+        if len(batch) == 1:
+            self._run_request(*batch[0])
+            return
+
+        if not batch:
+            return
+
+        try:
+            results = self._interface._transfer_many([request for _, request, _ in batch])
+        except Exception as e:
+            # Which requests were executed is unknown, so only the safe ones
+            # are sent again, each on its own
+            self.logger.warning("Batch of %d requests failed, retrying one by one: %s", len(batch), e)
+            for future, request, frame in batch:
+                if TMCLRetry.is_retryable(request):
+                    self._run_request(future, request, frame)
+                else:
+                    future.set_exception(e)
+            return
+
+        for (future, _, _), result in zip(batch, results):
+            if isinstance(result, TMCLReplyError):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    @staticmethod
+    def supports_tmcl():
+        return True
+
+    def __str__(self):
+        return "Connection: type=shared_tmcl_interface interface={}".format(self._interface)
@@ -9,21 +9,72 @@ Adapting it to follow the structure of serial_tmcl_interface.py and socketcan_tm
 
 import logging
 
-import numpy as np
 from .tmcl_interface import TmclInterface
-from ..tmcl import TMCLReplyChecksumError
+from .tmcl_frame_reader import TmclFrameReader
+from ..tmcl import TMCLRequest, TMCLReplyChecksumError, TMCLReplyError, TMCLRetry
+from collections import deque
+from concurrent.futures import Future
 import re
 import socket
+import time
+
+
+class PipelinedReply(Future):
+    """
+    Future for a TMCL request sent through SocketTmclInterface.submit_request().
+
+    Replies are matched to requests in FIFO order. Calling result() or
+    exception() on a pending reply reads from the socket until this reply (and
+    every reply queued before it) has arrived, so no background thread is
+    needed. If the replies have not arrived within [timeout] seconds,
+    concurrent.futures.TimeoutError is raised and the request stays in flight.
+    """
+
+    def __init__(self, interface, request):
+        super().__init__()
+        self.request = request
+        self._interface = interface
+
+    def result(self, timeout=None):
+        self._interface._receive_until(self, timeout)
+        return super().result(None if timeout is None else 0)
+
+    def exception(self, timeout=None):
+        self._interface._receive_until(self, timeout)
+        return super().exception(None if timeout is None else 0)
 
 
 class SocketTmclInterface(TmclInterface):
     """
     This class implements a TMCL connection over a Socket, for use with e.g. an ethernet-to-serial converter further down the line.
+
+    Besides the blocking send()/send_request() calls, requests can be
+    pipelined: submit()/submit_request() write the request immediately and
+    return a PipelinedReply future. Up to pipeline_depth requests are kept in
+    flight, so polling many parameters costs roughly one network round trip
+    instead of one per request. Replies are matched to requests in FIFO order,
+    which requires a gateway that answers requests in the order received.
+
+    Replies are read through a TmclFrameReader, which resynchronizes to the
+    reply stream after lost or extra bytes.
+
+    A broken connection (e.g. a restarted gateway) is reconnected on the next
+    request, retrying with exponential backoff for up to reconnect_timeout_s
+    seconds. A blocking request interrupted by the connection loss is sent
+    again on the new connection if that is safe (see TMCLRetry): reads and
+    idempotent writes like SAP are, motion commands like ROR and absolute MVP
+    only with retry_motion=True. Otherwise ConnectionError is raised, as the
+    request may or may not have been executed. Pipelined requests in flight
+    fail with ConnectionError.
     """
 
     _CHANNELS = []
     _socket = None
 
+    # Delays between reconnection attempts, doubled up to the maximum
+    RECONNECT_DELAY_S = 0.005
+    RECONNECT_MAX_DELAY_S = 1.0
+
     # mod from socketcan_tmcl_interface.py and serial_tmcl_interface.py
     def __init__(
         self,
@@ -32,12 +83,15 @@ class SocketTmclInterface(TmclInterface):
         host_id: int = 2,
         module_id: int = 1,
         timeout_s: int = 5,
+        pipeline_depth: int = 16,
+        reconnect_timeout_s: float = 10,
+        retry_motion: bool = False,
     ):
         if not isinstance(ip_and_port, str):
             raise TypeError
 
         match = re.match(
-            '^"?((?:[0-9]{1,3}\.){3}[0-9]{1,3}):([0-9]{1,5})"?$', ip_and_port
+            r'^"?((?:[0-9]{1,3}\.){3}[0-9]{1,3}):([0-9]{1,5})"?$', ip_and_port
         )
         if match is None:
             raise ValueError("Invalid ip:port combination")
@@ -49,6 +103,17 @@ class SocketTmclInterface(TmclInterface):
 
         if timeout_s == 0:
             timeout_s = None
+        self._timeout_s = timeout_s
+        self._reconnect_timeout_s = reconnect_timeout_s
+        self._retry_motion = retry_motion
+        self._closed = False
+        self.reconnects = 0
+
+        if pipeline_depth < 1:
+            raise ValueError("The pipeline depth must be at least 1")
+        self._pipeline_depth = pipeline_depth
+        self._in_flight = deque()
+        self._frames = TmclFrameReader(self._read_into, host_id, self._discard_input)
 
         self.logger = logging.getLogger(
             "{}.{}".format(self.__class__.__name__, ip_and_port)
@@ -57,22 +122,79 @@ class SocketTmclInterface(TmclInterface):
         self.logger.debug(
             f"Opening {self._socket_ip=} {self._socket_port=} for TMCL control"
         )
-        self._check_socket()  # connect to the socket
-        self.set_timeout(timeout_s)
+        try:
+            self._connect()
+        except OSError as e:
+            raise ConnectionError("Failed to connect to Socket connection") from e
+
+    def _connect(self):
+        connection = socket.create_connection((self._socket_ip, self._socket_port), self._timeout_s)
+        # Send every request immediately instead of waiting for more data
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        # Detect a silently dropped connection within seconds instead of hours
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        for option, value in (("TCP_KEEPIDLE", 1), ("TCP_KEEPINTVL", 1), ("TCP_KEEPCNT", 3)):
+            if hasattr(socket, option):
+                connection.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        self._socket = connection
 
     def _check_socket(self):
         """
-        Check if the socket is still open. If not, try to reconnect. Not sure it is necessary here, but it helped in the past.
+        Reconnect if the connection was lost, retrying with exponential backoff
+        for up to reconnect_timeout_s seconds. Raises ConnectionError after
+        close().
         """
-        if self._socket is None:
+        if self._closed:
+            raise ConnectionError("Socket connection closed")
+        if self._socket is not None:
+            return
+
+        deadline = time.monotonic() + self._reconnect_timeout_s
+        delay = self.RECONNECT_DELAY_S
+        while True:
             try:
-                self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                self._socket.connect((self._socket_ip, self._socket_port))
-            except socket.error as e:
-                self._connection = None
-                raise ConnectionError(
-                    "Failed to (re-)connect to Socket connection"
-                ) from e
+                self._connect()
+                break
+            except OSError as e:
+                if time.monotonic() + delay > deadline:
+                    raise ConnectionError("Failed to reconnect to Socket connection") from e
+                self.logger.debug("Reconnecting failed, retrying in %.3f s: %s", delay, e)
+                time.sleep(delay)
+                delay = min(2 * delay, self.RECONNECT_MAX_DELAY_S)
+
+        self.reconnects += 1
+        self.logger.info("Reconnected.")
+
+    def _disconnect(self, error):
+        """
+        Drop the broken connection, the next request reconnects. Pipelined
+        requests in flight fail with [error].
+        """
+        self.logger.warning("Connection lost: %s", error)
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        self._frames.reset()
+        while self._in_flight:
+            self._in_flight.popleft().set_exception(ConnectionError("Socket connection lost"))
+
+    def _retry_after_disconnect(self, requests, transfer):
+        """
+        Run [transfer] for the TMCLRequests [requests]. If the connection is
+        lost, reconnect and run it once more if all requests can be retried.
+        """
+        try:
+            return transfer()
+        except OSError as e:
+            if self._closed:
+                raise
+            # Includes ConnectionError and timeouts of sendall()
+            self._disconnect(e)
+            if not all(TMCLRetry.is_retryable(request, self._retry_motion) for request in requests):
+                raise ConnectionError("Socket connection lost, the request may or may not have been executed") from e
+
+        self.logger.info("Retrying %d requests after reconnecting.", len(requests))
+        return transfer()
 
     def __enter__(self):
         return self
@@ -86,7 +208,15 @@ class SocketTmclInterface(TmclInterface):
 
     def close(self):
         # self.logger.info("Closing Socket Connection")
-        self._socket.close()
+        for future in self._in_flight:
+            future.set_exception(ConnectionError("Socket connection closed"))
+        self._in_flight.clear()
+        self._frames.reset()
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+        # Do not reconnect after close()
+        self._closed = True
 
     def _send(self, host_id, module_id, data):
         """
@@ -97,8 +227,8 @@ class SocketTmclInterface(TmclInterface):
         """
         del host_id, module_id
         self._check_socket()
-        # print('Sending data:')
-        # print(" ".join("{:02x}".format(x) for x in data))
+        self._frames.sync(len(self._in_flight))
+        self._frames.expect(data)
         self._socket.sendall(data)
 
     def _recv(self, host_id, module_id):
@@ -109,26 +239,182 @@ class SocketTmclInterface(TmclInterface):
         class.
         """
         del host_id, module_id
-        self._check_socket()
+        if self._socket is None:
+            # The request was sent on a connection lost since
+            raise ConnectionError("Socket connection lost")
+        return self._frames.read_frame()
+
+    def _read_into(self, view):
         try:
-            data = self._socket.recvmsg(9)[0]
+            count = self._socket.recv_into(view)
         except socket.timeout:
-            if ('data' in locals()):
-                print(f'Data received: {type(data)=}' )            
-                print(" ".join("{:02x}".format(x) for x in data))
-            raise RuntimeError("TMCL datagram timed out")
+            return 0
+        if count == 0:
+            raise ConnectionError("Socket connection closed by peer")
+        return count
+
+    def _discard_input(self):
+        """
+        Drop the bytes received but not read yet, e.g. replies arriving after
+        a timeout.
+        """
+        timeout = self._socket.gettimeout()
+        self._socket.setblocking(False)
+        try:
+            while self._socket.recv(4096):
+                pass
+        except OSError:
+            pass
+        finally:
+            self._socket.settimeout(timeout)
+
+    def _send_recv_many(self, requests):
+        """
+        Write all requests with a single sendall() and read the replies back in
+        bulk.
+        """
+        self.flush()
+        data = self._encode_many(requests)
+
+        def transfer():
+            self._check_socket()
+            self._frames.sync()
+            for offset in range(0, len(data), 9):
+                self._frames.expect(data, offset)
+            self._socket.sendall(data)
+            return self._frames.read_frames(len(requests))
 
-        return data
+        return self._retry_after_disconnect(requests, transfer)
+
+    def _expect_late_replies(self, count):
+        self._frames.expect_late(count)
 
     def _reply_check(self, reply):
         if not reply.is_checksum_correct():
             raise TMCLReplyChecksumError(reply)
 
+    def _transfer(self, request, data):
+        """
+        Blocking request/reply transfer. Pipelined requests that are still in
+        flight are completed first.
+        """
+        self.flush()
+        return self._retry_after_disconnect([request], lambda: TmclInterface._transfer(self, request, data))
+
+    def submit_request(self, request):
+        """
+        Send a TMCL_Request without waiting for its reply.
+
+        Returns a PipelinedReply future which resolves to the TMCL_Reply. If
+        pipeline_depth requests are already in flight, the oldest reply is
+        received first.
+        """
+        while len(self._in_flight) >= self._pipeline_depth:
+            self._receive_oldest()
+
+        self.logger.debug("Tx: %s", request)
+
+        future = PipelinedReply(self, request)
+        try:
+            self._send(self._host_id, request.moduleAddress, request.to_buffer())
+        except OSError as e:
+            if not self._closed:
+                self._disconnect(e)
+            raise
+        self._in_flight.append(future)
+
+        return future
+
+    def submit(self, opcode, op_type, motor, value, module_id=None):
+        """
+        Pipelined counterpart of send(). Returns a PipelinedReply future.
+        """
+        if any(not isinstance(arg, int) for arg in [opcode, op_type, motor, value]):
+            raise TypeError("Expected integer values!")
+
+        # If no module ID is given, use the default one
+        if not module_id:
+            module_id = self._module_id
+
+        return self.submit_request(TMCLRequest(module_id, opcode, op_type, motor, value))
+
+    def flush(self):
+        """
+        Receive the replies of all pipelined requests still in flight.
+        """
+        while self._in_flight:
+            self._receive_oldest()
+
+    def in_flight(self):
+        """
+        Return the number of pipelined requests still waiting for a reply.
+        """
+        return len(self._in_flight)
+
+    def _receive_until(self, future, timeout=None):
+        """
+        Receive the replies up to the one of [future]. With a [timeout] in
+        seconds, give up when the next reply has not fully arrived in time.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not future.done() and self._in_flight:
+            if deadline is not None and not self._prefetch(deadline):
+                return
+            self._receive_oldest()
+
+    def _prefetch(self, deadline):
+        """
+        Wait until the oldest pipelined reply is buffered, at most until
+        [deadline]. Returns False if it has not arrived in time.
+        """
+        def read_into(view):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return 0
+            self._socket.settimeout(remaining)
+            try:
+                return self._read_into(view)
+            finally:
+                self._socket.settimeout(self._timeout_s)
+
+        try:
+            return self._frames.prefetch(read_into)
+        except OSError as e:
+            # Fails the requests in flight
+            self._disconnect(e)
+            return False
+
+    def _receive_oldest(self):
+        future = self._in_flight.popleft()
+        request = future.request
+        try:
+            data = self._recv(self._host_id, request.moduleAddress)
+        except OSError as e:
+            self._disconnect(e)
+            future.set_exception(ConnectionError("Socket connection lost"))
+            return
+        except Exception as e:
+            # The reply stream is out of step now, fail every pending request
+            self._frames.reset()
+            future.set_exception(e)
+            while self._in_flight:
+                self._in_flight.popleft().set_exception(e)
+            return
+
+        try:
+            future.set_result(self._process_reply(request, data))
+        except TMCLReplyError as e:
+            future.set_exception(e)
+
     def set_timeout(self, timeout):
-        self._socket.settimeout(timeout) if timeout != 0 else None
+        if timeout == 0:
+            return
+        self._timeout_s = timeout
+        if self._socket is not None:
+            self._socket.settimeout(timeout)
 
     def get_timeout(self):
-        return self._socket.gettimeout()
+        return self._timeout_s
 
     @staticmethod
     def supports_tmcl():
@@ -145,7 +431,7 @@ class SocketTmclInterface(TmclInterface):
         return cls._CHANNELS
 
     def __str__(self):
-        print(
+        return (
             "Connection: type=socket_tmcl_interface ip="
             + self._socket_ip
             + " port="
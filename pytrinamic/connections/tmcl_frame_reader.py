@@ -0,0 +1,355 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import logging
+from collections import deque
+
+from ..tmcl import TMCLCommand, TMCLTimeoutError
+
+logger = logging.getLogger(__name__)
+
+FRAME_SIZE = 9
+
+
+class TmclFrameReader:
+    """
+    Cuts the byte stream of a serial port or stream socket into 9 byte TMCL
+    reply frames.
+
+    The bytes are read into a preallocated receive buffer, by as many reads
+    as needed until a whole frame has arrived. Only the bytes of the expected
+    replies are read, so replies of pipelined requests stay in the transport
+    until they are needed.
+
+    Every reply is expected to start with the host address and the module
+    address of its request and to echo its command (see expect()). If it does
+    not, the stream is out of step, e.g. after a lost or extra byte on the
+    wire, and the frame window is slid forward to the next byte that can
+    start the reply. A valid frame echoing another command, e.g. the late
+    reply to a request that timed out, is skipped as a whole. A frame
+    with the right addresses but a wrong checksum is only skipped if a valid
+    frame follows in the buffered bytes, otherwise it is returned, so the
+    caller sees the checksum error. After a timeout the bytes of the partial
+    reply are dropped, and sync() drops replies arriving late before the next
+    request is sent. sync() also forgets requests whose replies were never
+    read, like the unanswered boot command. The reply to a request sent
+    again after a timeout cannot be told apart from a late reply to its
+    first transmission, so sync() also waits for the replies announced by
+    expect_late() and drops them.
+    """
+
+    def __init__(self, read_into, host_id, discard_input=None, short_read_timeout=False, size=1024):
+        """
+        Parameters:
+            read_into:
+                Type: function
+                read_into(view) reads up to len(view) bytes into the
+                memoryview [view] and returns their number, 0 on a timeout.
+                None for transports passing the received bytes to feed(),
+                like asyncio ones.
+            host_id:
+                Type: int
+                The host address every reply starts with.
+            discard_input:
+                Type: function, optional, default value: None
+                Discards all bytes received by the transport but not read yet.
+            short_read_timeout:
+                Type: bool, optional, default value: False
+                Set if read_into() only returns fewer bytes than requested on
+                a timeout, like Serial.readinto().
+            size:
+                Type: int, optional, default value: 1024
+                The initial size of the receive buffer in bytes. It grows
+                for larger batches.
+        """
+        self.resyncs = 0
+        self.discarded = 0
+
+        self._read_into = read_into
+        self._host_id = host_id
+        self._discard_input = discard_input
+        self._short_read_timeout = short_read_timeout
+        self._buffer = bytearray(size)
+        self._view = memoryview(self._buffer)
+        self._start = 0
+        self._end = 0
+        self._expected = deque()
+        self._stale = False
+        self._skipped = 0
+        self._late = 0
+
+    def sync(self, in_flight=0):
+        """
+        Prepare for sending a request while the [in_flight] requests sent
+        before it still wait for their replies. Drops the expected replies of
+        older requests that were never read, e.g. of send_boot(), which is not
+        answered, and late replies after a timeout.
+        """
+        while len(self._expected) > in_flight:
+            self._expected.popleft()
+        if self._late:
+            self._drop_late()
+        if self._stale:
+            self._stale = False
+            if self._discard_input:
+                self._discard_input()
+
+    def expect_late(self, count):
+        """
+        Announce that up to [count] replies to transmissions given up on may
+        still arrive, e.g. the late reply to the first transmission of a
+        request that was answered after sending it again. They would be taken
+        for the replies to the next requests, so sync() waits for them for up
+        to one read timeout and drops them.
+        """
+        self._late += count
+
+    def expect(self, data, offset=0):
+        """
+        Register the request frame at [offset] of [data] as sent, in the
+        order of the replies.
+        """
+        # The ASCII firmware version reply carries no module address
+        if data[offset + 1] == TMCLCommand.GET_FIRMWARE_VERSION and data[offset + 2] == 0:
+            self._expected.append(None)
+        else:
+            self._expected.append((data[offset], data[offset + 1]))
+
+    def reset(self):
+        """
+        Drop all buffered bytes and expected replies.
+        """
+        self._start = self._end = 0
+        self._skipped = 0
+        self._late = 0
+        self._expected.clear()
+
+    def abort(self):
+        """
+        Give up on the replies after a timeout. Drops the bytes of the
+        partial reply, sync() drops replies arriving late.
+        """
+        self.reset()
+        self._stale = True
+
+    def _drop_late(self):
+        """
+        Read and drop the late replies announced by expect_late(), until
+        they have arrived or a read times out.
+        """
+        dropped = self._end - self._start
+        missing = FRAME_SIZE * self._late - dropped
+        self._start = self._end = 0
+        self._late = 0
+        while missing > 0:
+            count = min(missing, len(self._buffer))
+            try:
+                received = self._read_into(self._view[:count])
+            except Exception:
+                self.reset()
+                raise
+            dropped += received
+            missing -= received
+            if received == 0 or (received < count and self._short_read_timeout):
+                break
+
+        if dropped:
+            self.discarded += dropped
+            logger.debug("Dropped %d bytes of late replies", dropped)
+        # Also drop the rest of a partial late reply
+        self._stale = True
+
+    def feed(self, data):
+        """
+        Append the received bytes [data] to the buffered ones, for reading
+        them with pop_frame().
+        """
+        self._reserve(len(data))
+        self._buffer[self._end:self._end + len(data)] = data
+        self._end += len(data)
+
+    def pop_frame(self):
+        """
+        Return the reply of the next expected request from the buffered
+        bytes, as a bytearray of length 9. Returns None if more bytes have to
+        be fed first.
+        """
+        expected = self._expected[0] if self._expected else None
+        if not self._skip_to_reply(expected):
+            return None
+        self._count_resync()
+        if self._expected:
+            self._expected.popleft()
+        return self._take_frame()
+
+    def read_frames(self, count):
+        """
+        Read the replies of the next [count] expected requests. Returns a
+        list of bytearrays of length 9.
+        """
+        self._fill(FRAME_SIZE * count)
+        return [self.read_frame() for _ in range(count)]
+
+    def read_frame(self):
+        """
+        Read the reply of the next expected request. Returns a bytearray of
+        length 9.
+        """
+        expected = self._expected.popleft() if self._expected else None
+        self._fill(FRAME_SIZE)
+        buffer = self._buffer
+        start = self._start
+        # Fast path for the usual, aligned reply
+        if buffer[start] != self._host_id or expected is not None and (
+                buffer[start + 1] != expected[0] or buffer[start + 3] != expected[1]
+                or sum(buffer[start:start + 8]) & 0xFF != buffer[start + 8]):
+            self._resync(expected)
+
+        return self._take_frame()
+
+    def _take_frame(self):
+        start = self._start
+        self._start += FRAME_SIZE
+        frame = self._buffer[start:self._start]
+        if self._start == self._end:
+            self._start = self._end = 0
+        return frame
+
+    def _resync(self, expected):
+        """
+        Slide the frame window to the reply.
+        """
+        while not self._skip_to_reply(expected):
+            self._fill(FRAME_SIZE)
+        self._count_resync()
+
+    def _skip_to_reply(self, expected):
+        """
+        Skip the buffered bytes before the reply. Returns True if the whole
+        reply is buffered, False if more bytes are needed.
+        """
+        while self._end - self._start >= FRAME_SIZE:
+            skip = self._misalignment(expected)
+            if not skip:
+                return True
+            self._start += skip
+            self._skipped += skip
+        return False
+
+    def _count_resync(self):
+        if self._skipped:
+            self.resyncs += 1
+            self.discarded += self._skipped
+            logger.warning("Reply stream out of step, skipped %d bytes", self._skipped)
+            self._skipped = 0
+
+    def _misalignment(self, expected):
+        """
+        Return the number of bytes to skip to the next possible start of the
+        reply, 0 if the frame at the start of the buffer is the reply.
+        """
+        buffer = self._buffer
+        start = self._start
+        end = self._end
+        if self._starts_frame(start, end, expected):
+            if expected is None or self._checksum_correct(start):
+                return 0
+            # A bad checksum is just reported, unless a valid frame follows
+            for position in range(start + 1, end - FRAME_SIZE + 1):
+                if self._starts_frame(position, end, expected) and self._checksum_correct(position):
+                    return position - start
+            return 0
+
+        if buffer[start] == self._host_id and buffer[start + 1] == expected[0] and self._checksum_correct(start):
+            # The reply to another request
+            return FRAME_SIZE
+
+        for position in range(start + 1, end):
+            if self._starts_frame(position, end, expected):
+                return position - start
+        return end - start
+
+    def _starts_frame(self, position, end, expected):
+        """
+        Return True if the reply can start at [position]. The bytes missing
+        before [end] are assumed to match.
+        """
+        buffer = self._buffer
+        if buffer[position] != self._host_id:
+            return False
+        if expected is None:
+            return True
+        return ((position + 1 >= end or buffer[position + 1] == expected[0])
+                and (position + 3 >= end or buffer[position + 3] == expected[1]))
+
+    def _checksum_correct(self, position):
+        buffer = self._buffer
+        return sum(buffer[position:position + FRAME_SIZE - 1]) & 0xFF == buffer[position + FRAME_SIZE - 1]
+
+    def prefetch(self, read_into):
+        """
+        Read the bytes of the next reply that have arrived, using [read_into]
+        instead of the read function of the reader, e.g. one with a shorter
+        timeout. Returns True once a whole frame is buffered, False if
+        read_into() timed out before. Unlike read_frame(), a timeout keeps
+        the bytes read so far and the expected replies.
+        """
+        missing = FRAME_SIZE - (self._end - self._start)
+        if missing <= 0:
+            return True
+
+        self._reserve(missing)
+        while missing > 0:
+            try:
+                received = read_into(self._view[self._end:self._end + missing])
+            except Exception:
+                self.reset()
+                raise
+            if received == 0:
+                return False
+            self._end += received
+            missing -= received
+        return True
+
+    def _reserve(self, missing):
+        """
+        Make room for [missing] more bytes after the buffered ones.
+        """
+        if self._end + missing > len(self._buffer):
+            count = self._end - self._start + missing
+            # Move the buffered bytes to the front, grow the buffer if needed
+            buffered = self._buffer[self._start:self._end]
+            if count > len(self._buffer):
+                self._view.release()
+                self._buffer = bytearray(max(count, 2 * len(self._buffer)))
+                self._view = memoryview(self._buffer)
+            self._buffer[:len(buffered)] = buffered
+            self._start = 0
+            self._end = len(buffered)
+
+    def _fill(self, count):
+        """
+        Read until at least [count] bytes are buffered.
+        """
+        missing = count - (self._end - self._start)
+        if missing <= 0:
+            return
+
+        self._reserve(missing)
+        while missing > 0:
+            try:
+                received = self._read_into(self._view[self._end:self._end + missing])
+            except Exception:
+                self.reset()
+                raise
+            self._end += received
+            missing -= received
+            if received == 0 or (missing > 0 and self._short_read_timeout):
+                # The rest of the reply is lost, start over with the next one
+                self.abort()
+                raise TMCLTimeoutError("TMCL datagram timed out")
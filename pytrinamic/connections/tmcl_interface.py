@@ -7,8 +7,11 @@
 ################################################################################
 
 import logging
+import time
 from abc import ABC
-from ..tmcl import TMCL, TMCLRequest, TMCLCommand, TMCLReply, TMCLReplyChecksumError, TMCLReplyStatusError
+from ..tmcl import TMCL, TMCLRequest, TMCLPreparedRequest, TMCLCommand, TMCLReply, TMCLReplyError, TMCLReplyChecksumError, TMCLReplyStatusError, TMCLTimeoutError
+from .adaptive_timeout import AdaptiveTimeout
+from .tmcl_stats import TmclStats
 from ..helpers import to_signed_32
 
 
@@ -28,7 +31,22 @@ class TmclInterface(ABC):
         _send(self, host_id, module_id, data)
         _recv(self, host_id, module_id)
 
+    A subclass may override the following function to provide a faster path
+    for send_many():
+        _send_recv_many(self, requests)
+
+    A subclass reading replies from a byte stream should override the
+    following function to drop late replies to retried requests:
+        _expect_late_replies(self, count)
+
     A subclass may read the _host_id and _module_id parameters.
+
+    Request statistics (latency histograms, error counters) can be collected
+    with enable_stats() and queried with stats().
+
+    Interfaces supporting set_timeout() can derive the receive timeout from
+    the measured round trip times and retry lost reads, see
+    enable_adaptive_timeout().
     """
 
     def __init__(self, host_id=2, default_module_id=1):
@@ -52,12 +70,29 @@ class TmclInterface(ABC):
 
         self._host_id = host_id
         self._module_id = default_module_id
+        # Reused for every request sent by send_request()
+        self._tx_buffer = bytearray(9)
+        # TmclStats while enabled with enable_stats()
+        self._stats = None
+        # Function called with every request and raw reply, see set_tap()
+        self._tap = None
+        # Encoding time of the request in _tx_buffer, recorded in the stats
+        self._encode_ns = 0
+        # AdaptiveTimeout while enabled with enable_adaptive_timeout()
+        self._adaptive = None
+        # The timeout last set by the adaptive timeout and the fixed timeout
+        # to restore when it is disabled
+        self._adaptive_timeout_s = None
+        self._fixed_timeout_s = None
 
     def _send(self, host_id, module_id, data):
         """
         Send the bytearray [data] representing a TMCL command. The length of
         [data] is 9. The hostID and moduleID parameters may be used for extended
         addressing options available on the implemented communication interface.
+
+        The buffer behind [data] is reused for the next request, so an
+        implementation must not keep a reference to it after returning.
         """
         raise NotImplementedError("The TMCL interface requires an implementation of the send() function")
 
@@ -88,8 +123,150 @@ class TmclInterface(ABC):
         """
         self.logger.debug("Tx: %s", request)
 
-        self._send(self._host_id, request.moduleAddress, request.to_buffer())
-        reply = TMCLReply.from_buffer(self._recv(self._host_id, request.moduleAddress))
+        if self._stats is not None:
+            start = time.perf_counter_ns()
+            request.pack_into(self._tx_buffer)
+            self._encode_ns = time.perf_counter_ns() - start
+        else:
+            request.pack_into(self._tx_buffer)
+
+        return self._transfer(request, self._tx_buffer)
+
+    def send_prepared(self, prepared):
+        """
+        Send a TMCLPreparedRequest created by prepare() and read back a
+        TMCL_Reply. The cached frame is sent as is, without validating or
+        encoding the request again. This function blocks until the reply has
+        been received.
+        """
+        self.logger.debug("Tx: %s", prepared.request)
+
+        return self._transfer(prepared.request, prepared.frame)
+
+    def _transfer(self, request, data):
+        """
+        Send the encoded [request] given as bytearray [data] and return the
+        checked TMCL_Reply.
+        """
+        if self._adaptive is not None:
+            return self._adaptive_transfer(request, data)
+
+        return self._exchange(request, data)
+
+    def _exchange(self, request, data):
+        """
+        Send [data] once and return the checked TMCL_Reply.
+        """
+        if self._stats is not None:
+            return self._measured_exchange(request, data)
+
+        self._send(self._host_id, request.moduleAddress, data)
+
+        return self._process_reply(request, self._recv(self._host_id, request.moduleAddress))
+
+    def _measured_exchange(self, request, data):
+        """
+        _exchange() recording the request in the statistics.
+        """
+        stats = self._stats
+        encode_ns = self._encode_ns
+        self._encode_ns = 0
+        start = time.perf_counter_ns()
+        try:
+            self._send(self._host_id, request.moduleAddress, data)
+            sent = time.perf_counter_ns()
+            data = self._recv(self._host_id, request.moduleAddress)
+        except Exception as e:
+            end = time.perf_counter_ns()
+            stats.record(request, encode_ns, end - start, 0, 0, "timeout" if isinstance(e, TMCLTimeoutError) else "other")
+            raise
+        received = time.perf_counter_ns()
+
+        try:
+            reply = self._process_reply(request, data)
+        except TMCLReplyError as e:
+            stats.record(request, encode_ns, sent - start, received - sent, time.perf_counter_ns() - received,
+                         "checksum" if isinstance(e, TMCLReplyChecksumError) else "status")
+            raise
+
+        stats.record(request, encode_ns, sent - start, received - sent, time.perf_counter_ns() - received)
+        return reply
+
+    def _adaptive_transfer(self, request, data):
+        """
+        _exchange() with the adaptive timeout, retrying reads after a timeout
+        or a checksum error.
+        """
+        adaptive = self._adaptive
+        attempt = 0
+        timeouts = 0
+        while True:
+            self._apply_adaptive_timeout(adaptive.timeout_s)
+            start = time.perf_counter()
+            try:
+                reply = self._exchange(request, data)
+            except TMCLReplyStatusError:
+                if attempt == 0:
+                    adaptive.sample(time.perf_counter() - start)
+                raise
+            except (TMCLTimeoutError, TMCLReplyChecksumError) as e:
+                if isinstance(e, TMCLTimeoutError):
+                    adaptive.timed_out()
+                    timeouts += 1
+                else:
+                    adaptive.checksum_errors += 1
+                    if not adaptive.is_checksum_retryable(request):
+                        raise
+                if attempt >= adaptive.max_retries or not adaptive.is_retryable(request):
+                    adaptive.failures += 1
+                    if attempt and timeouts:
+                        self._expect_late_replies(timeouts)
+                    raise
+                attempt += 1
+                adaptive.retries += 1
+                self.logger.warning("Retrying %s after %s", request, type(e).__name__)
+                continue
+
+            # Karn's algorithm: The reply to a retried request may belong to
+            # any of its transmissions, so only first attempts are timed
+            if attempt == 0:
+                adaptive.sample(time.perf_counter() - start)
+            elif timeouts:
+                # The replies to the transmissions that timed out may still
+                # arrive after the one received
+                self._expect_late_replies(timeouts)
+            return reply
+
+    def _expect_late_replies(self, count):
+        """
+        Called when up to [count] replies to transmissions of retried requests
+        that timed out may still arrive. Interfaces matching replies to
+        requests by their order have to drop them before the next request is
+        sent, e.g. with TmclFrameReader.expect_late().
+        """
+        del count
+
+    def _apply_adaptive_timeout(self, timeout_s):
+        """
+        Set the receive timeout, unless it differs by less than 10% from the
+        current one. Changing the timeout of a serial port reconfigures it.
+        """
+        current = self._adaptive_timeout_s
+        if current is None or abs(timeout_s - current) > 0.1 * current:
+            self.set_timeout(timeout_s)
+            self._adaptive_timeout_s = timeout_s
+
+    def _process_reply(self, request, data):
+        """
+        Decode the received bytearray [data] into a TMCLReply and check it
+        against the TMCLRequest it answers.
+
+        Raises TMCLReplyChecksumError or TMCLReplyStatusError for bad replies.
+        """
+        if self._tap is not None:
+            self._tap(request, data)
+
+        reply = TMCLReply.from_buffer(data)
 
         self.logger.debug("Rx: %s", reply)
 
@@ -118,6 +295,308 @@ class TmclInterface(ABC):
 
         return self.send_request(request)
 
+    def prepare(self, opcode, op_type, motor, value=0, module_id=None):
+        """
+        Validate and encode a TMCL datagram once, for sending it repeatedly
+        with send_prepared().
+
+        Example, polling the actual position (axis parameter 1) of axis 0 of
+        module 3:
+            poll = interface.prepare(TMCLCommand.GAP, 1, 0, module_id=3)
+            position = to_signed_32(interface.send_prepared(poll).value)
+
+        The value of a prepared request can be changed with its set_value().
+
+        Returns: A TMCLPreparedRequest.
+        """
+        if any(not isinstance(arg, int) for arg in [opcode, op_type, motor, value]):
+            raise TypeError("Expected integer values!")
+
+        # If no module ID is given, use the default one
+        if not module_id:
+            module_id = self._module_id
+
+        return TMCLPreparedRequest(TMCLRequest(module_id, opcode, op_type, motor, value))
+
+    def _send_recv_many(self, requests):
+        """
+        Send all TMCLRequests in [requests] and return the received replies as
+        a list of bytearrays of length 9, in the order of [requests].
+
+        The default implementation sends the requests one by one. Subclasses
+        may override this to transfer the requests in bulk.
+        """
+        frames = []
+        for request in requests:
+            self._send(self._host_id, request.moduleAddress, request.to_buffer())
+            frames.append(self._recv(self._host_id, request.moduleAddress))
+        return frames
+
+    @staticmethod
+    def _encode_many(requests):
+        """
+        Encode all TMCLRequests in [requests] into one contiguous bytearray.
+        """
+        buffer = bytearray(9 * len(requests))
+        for i, request in enumerate(requests):
+            request.pack_into(buffer, 9 * i)
+        return buffer
+
+    def send_many(self, requests, module_id=None, raise_on_error=True):
+        """
+        Send a batch of TMCL requests and read back all replies. This function
+        blocks until all replies have been received.
+
+        Parameters:
+            requests:
+                A list of TMCLRequest objects or of
+                (opcode, op_type, motor, value) tuples.
+            module_id:
+                The module ID used for the tuples. If not given, the default
+                module ID is used.
+            raise_on_error:
+                If True, the first checksum or status error of the batch is
+                raised after all replies have been read. If False, the replies
+                are returned unchecked and can be inspected with is_valid().
+
+        Returns: A list of TMCLReply objects, in the order of [requests].
+        """
+        # If no module ID is given, use the default one
+        if not module_id:
+            module_id = self._module_id
+
+        batch = []
+        for request in requests:
+            if not isinstance(request, TMCLRequest):
+                if len(request) != 4 or any(not isinstance(arg, int) for arg in request):
+                    raise TypeError("Expected TMCLRequest objects or tuples of four integer values!")
+                request = TMCLRequest(module_id, *request)
+            self.logger.debug("Tx: %s", request)
+            batch.append(request)
+
+        if not batch:
+            return []
+
+        replies = []
+        error = None
+        for result in self._transfer_many(batch):
+            if isinstance(result, TMCLReplyError):
+                replies.append(result.reply)
+                error = error or result
+            else:
+                replies.append(result)
+
+        if error and raise_on_error:
+            raise error
+
+        return replies
+
+    def _transfer_many(self, requests):
+        """
+        Transfer the TMCLRequests [requests] with _send_recv_many() and return
+        a list with the checked TMCL_Reply or the TMCLReplyError of every
+        request, in the order of [requests].
+        """
+        if self._adaptive is not None:
+            return self._adaptive_transfer_many(requests)
+
+        return self._exchange_many(requests)
+
+    def _exchange_many(self, requests):
+        """
+        _transfer_many() without retries.
+        """
+        stats = self._stats
+        if stats is None:
+            results = []
+            for request, data in zip(requests, self._send_recv_many(requests)):
+                try:
+                    results.append(self._process_reply(request, data))
+                except TMCLReplyError as e:
+                    results.append(e)
+            return results
+
+        start = time.perf_counter_ns()
+        try:
+            frames = self._send_recv_many(requests)
+        except Exception as e:
+            error = "timeout" if isinstance(e, TMCLTimeoutError) else "other"
+            stats.record_batch(requests, time.perf_counter_ns() - start, [0] * len(requests), [error] * len(requests))
+            raise
+        transfer_ns = time.perf_counter_ns() - start
+
+        results = []
+        decode_ns = []
+        errors = []
+        for request, data in zip(requests, frames):
+            start = time.perf_counter_ns()
+            try:
+                results.append(self._process_reply(request, data))
+                errors.append(None)
+            except TMCLReplyError as e:
+                results.append(e)
+                errors.append("checksum" if isinstance(e, TMCLReplyChecksumError) else "status")
+            decode_ns.append(time.perf_counter_ns() - start)
+        stats.record_batch(requests, transfer_ns, decode_ns, errors)
+        return results
+
+    def _adaptive_transfer_many(self, requests):
+        """
+        _exchange_many() with the adaptive timeout. A batch of reads is sent
+        again after a timeout, reads with a bad checksum are sent again one
+        by one. The round trip times of batches are not sampled.
+        """
+        adaptive = self._adaptive
+        retryable = all(adaptive.is_retryable(request) for request in requests)
+        attempt = 0
+        while True:
+            # The timeout is for the whole batch on some transports
+            self._apply_adaptive_timeout(min(adaptive.max_timeout_s, adaptive.timeout_s * len(requests)))
+            try:
+                results = self._exchange_many(requests)
+                break
+            except TMCLTimeoutError:
+                adaptive.timed_out()
+                if attempt >= adaptive.max_retries or not retryable:
+                    adaptive.failures += 1
+                    if attempt:
+                        self._expect_late_replies(len(requests))
+                    raise
+                attempt += 1
+                adaptive.retries += 1
+                self.logger.warning("Retrying batch of %d requests after a timeout", len(requests))
+                # Late replies to the batch would be taken for those of the
+                # retry, so they are dropped before sending it
+                self._expect_late_replies(len(requests))
+
+        for i, (request, result) in enumerate(zip(requests, results)):
+            if not isinstance(result, TMCLReplyChecksumError):
+                continue
+            adaptive.checksum_errors += 1
+            if not (adaptive.is_retryable(request) and adaptive.is_checksum_retryable(request)):
+                continue
+            adaptive.retries += 1
+            try:
+                results[i] = self._transfer(request, request.to_buffer())
+            except TMCLReplyError as e:
+                results[i] = e
+        return results
+
+    def set_timeout(self, timeout):
+        """
+        Set the receive timeout in seconds. 0 waits forever.
+        """
+        raise NotImplementedError("The TMCL interface does not support setting the timeout")
+
+    def get_timeout(self):
+        """
+        Return the receive timeout in seconds.
+        """
+        raise NotImplementedError("The TMCL interface does not support reading the timeout")
+
+    def enable_adaptive_timeout(self, min_timeout_s=0.01, max_timeout_s=None, max_retries=2, retry_writes=False):
+        """
+        Derive the receive timeout from the measured round trip times instead
+        of using a fixed one, and retry reads after a timeout or a checksum
+        error, see AdaptiveTimeout. Lost replies are then detected within a
+        few round trip times instead of the worst case timeout.
+
+        Requires an interface supporting set_timeout().
+
+        Parameters:
+            min_timeout_s:
+                Type: float, optional, default value: 0.01
+                The lower limit of the timeout.
+            max_timeout_s:
+                Type: float, optional, default value: None
+                The upper limit of the timeout, also used until the first
+                round trip time is measured. If not given, the current
+                timeout of the interface is used.
+            max_retries:
+                Type: int, optional, default value: 2
+                How often a request is sent again.
+            retry_writes:
+                Type: bool, optional, default value: False
+                Also retry idempotent writes, like SAP. Motion commands are
+                never retried.
+
+        Returns: The AdaptiveTimeout holding the estimate and the counters.
+        """
+        fixed_timeout_s = self._fixed_timeout_s if self._adaptive is not None else self.get_timeout()
+        if max_timeout_s is None:
+            max_timeout_s = fixed_timeout_s
+            if not max_timeout_s:
+                raise ValueError("An interface without timeout requires max_timeout_s")
+
+        adaptive = AdaptiveTimeout(min_timeout_s, max_timeout_s, max_retries, retry_writes)
+        self._fixed_timeout_s = fixed_timeout_s
+        self._adaptive_timeout_s = None
+        self._adaptive = adaptive
+        return adaptive
+
+    def disable_adaptive_timeout(self):
+        """
+        Return to the fixed timeout set before enable_adaptive_timeout().
+        """
+        if self._adaptive is None:
+            return
+        self._adaptive = None
+        self._adaptive_timeout_s = None
+        self.set_timeout(self._fixed_timeout_s or 0)
+
+    def adaptive_timeout(self):
+        """
+        Return the AdaptiveTimeout, or None if it is not enabled.
+
+        Example, checking the link quality:
+            print(interface.adaptive_timeout())
+        """
+        return self._adaptive
+
+    def set_tap(self, tap):
+        """
+        Call tap(request, data) with the TMCLRequest and the raw reply frame
+        of every received reply, before the reply is checked. The frame buffer
+        may be reused after the call. None removes the tap.
+
+        Used by pytrinamic.tools.tmcl_recorder.TmclRecorder.
+        """
+        self._tap = tap
+
+    def enable_stats(self):
+        """
+        Start collecting request statistics, see TmclStats. Collecting is
+        cheap (a few microseconds per request), but off by default.
+        """
+        if self._stats is None:
+            self._stats = TmclStats()
+
+    def disable_stats(self):
+        """
+        Stop collecting request statistics and discard them.
+        """
+        self._stats = None
+
+    def stats(self):
+        """
+        Return a snapshot of the request statistics as TmclStats, or None if
+        they are not enabled.
+
+        Example, finding the polled parameters taking most of the bus time:
+            interface.enable_stats()
+            ...
+            print(interface.stats())
+        """
+        stats = self._stats
+        return stats.copy() if stats is not None else None
+
+    def reset_stats(self):
+        """
+        Clear the request statistics collected so far.
+        """
+        if self._stats is not None:
+            self._stats.reset()
+
     def send_boot(self, module_id=None):
         """
         Send the command for entering bootloader mode. This TMCL command does
@@ -160,6 +639,28 @@ class TmclInterface(ABC):
         value = self.send(TMCLCommand.GAP, command_type, axis, 0, module_id).value
         return to_signed_32(value) if signed else value
 
+    def get_axis_parameters(self, command_types, axis, module_id=None, signed=False, raise_on_error=True):
+        """
+        Read several axis parameters of one axis with a single send_many() batch.
+
+        If [raise_on_error] is False, parameters the module rejects are
+        returned as None instead of raising TMCLReplyStatusError. Bad
+        checksums always raise TMCLReplyChecksumError.
+
+        Returns: A list of values, in the order of [command_types].
+        """
+        replies = self.send_many([(TMCLCommand.GAP, command_type, axis, 0) for command_type in command_types],
+                                 module_id, raise_on_error)
+        values = []
+        for reply in replies:
+            if not reply.is_checksum_correct():
+                raise TMCLReplyChecksumError(reply)
+            if not reply.is_valid():
+                values.append(None)
+            else:
+                values.append(to_signed_32(reply.value) if signed else reply.value)
+        return values
+
     def set_axis_parameter(self, command_type, axis, value, module_id=None):
         return self.send(TMCLCommand.SAP, command_type, axis, value, module_id)
 
@@ -175,6 +676,15 @@ class TmclInterface(ABC):
         value = self.send(TMCLCommand.GGP, command_type, bank, 0, module_id).value
         return to_signed_32(value) if signed else value
 
+    def get_global_parameters(self, command_types, bank, module_id=None, signed=False):
+        """
+        Read several global parameters of one bank with a single send_many() batch.
+
+        Returns: A list of values, in the order of [command_types].
+        """
+        replies = self.send_many([(TMCLCommand.GGP, command_type, bank, 0) for command_type in command_types], module_id)
+        return [to_signed_32(reply.value) if signed else reply.value for reply in replies]
+
     def set_global_parameter(self, command_type, bank, value, module_id=None):
         return self.send(TMCLCommand.SGP, command_type, bank, value, module_id)
 
@@ -215,6 +725,23 @@ class TmclInterface(ABC):
         tmcl_type = register_address & 0xFF
         return self.send(command, tmcl_type, tmcl_motor, value, module_id)
 
+    def read_registers(self, register_addresses, command, channel, module_id=None, signed=False):
+        """
+        Read several registers of one channel with a single send_many() batch.
+
+        Returns: A list of values, in the order of [register_addresses].
+        """
+        requests = [(command, register_address & 0xFF, (channel & 0x0F) | ((register_address & 0x0F00) >> 4), 0)
+                    for register_address in register_addresses]
+        replies = self.send_many(requests, module_id)
+        return [to_signed_32(reply.value) if signed else reply.value for reply in replies]
+
+    def read_mc_registers(self, register_addresses, module_id=None, signed=False):
+        return self.read_registers(register_addresses, TMCLCommand.READ_MC, 0, module_id, signed)
+
+    def read_drv_registers(self, register_addresses, module_id=None, signed=False):
+        return self.read_registers(register_addresses, TMCLCommand.READ_DRV, 1, module_id, signed)
+
     # Motion control functions
     def rotate(self, motor, velocity, module_id=None):
         return self.send(TMCLCommand.ROR, 0, motor, velocity, module_id)
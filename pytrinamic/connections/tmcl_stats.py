@@ -0,0 +1,307 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import threading
+import time
+
+from ..tmcl import TMCLCommand
+
+# Bits of the value kept per bucket, see LatencyHistogram
+_SUB_BUCKET_BITS = 4
+
+_PHASES = ("encode", "write", "wait", "decode")
+_ERRORS = ("status", "checksum", "timeout", "other")
+
+_command_names = None
+
+
+def _command_name(command):
+    global _command_names
+    if _command_names is None:
+        _command_names = {value: name for name, value in vars(TMCLCommand).items()
+                          if not name.startswith("_") and isinstance(value, int)}
+    return _command_names.get(command, str(command))
+
+
+class LatencyHistogram:
+    """
+    Histogram of durations in nanoseconds with log-linear buckets, similar to
+    an HDR histogram: every power of two is split into 16 buckets, so
+    percentiles are accurate to 1/16 of the value. Recording is a constant
+    time operation and the number of buckets only grows with the logarithm of
+    the value range (about 400 buckets for values up to an hour).
+    """
+    __slots__ = ("_counts", "count", "total", "min", "max")
+
+    def __init__(self):
+        self._counts = {}
+        self.count = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def record(self, value):
+        exponent = value.bit_length() - _SUB_BUCKET_BITS - 1
+        index = value if exponent <= 0 else (exponent << _SUB_BUCKET_BITS) + (value >> exponent)
+        counts = self._counts
+        counts[index] = counts.get(index, 0) + 1
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.count += 1
+        self.total += value
+
+    @staticmethod
+    def _upper_bound(index):
+        """
+        Return the highest value counted in the bucket [index].
+        """
+        if index < 2 << _SUB_BUCKET_BITS:
+            return index
+        exponent = (index >> _SUB_BUCKET_BITS) - 1
+        return ((index - (exponent << _SUB_BUCKET_BITS) + 1) << exponent) - 1
+
+    def percentile(self, percentile):
+        """
+        Return the value below or at which [percentile] percent of the
+        recorded values are, in nanoseconds. Returns 0 if nothing was recorded.
+        """
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * percentile // 100))
+        seen = 0
+        for index in sorted(self._counts):
+            seen += self._counts[index]
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def mean(self):
+        return self.total / self.count if self.count else 0
+
+    def merge(self, other):
+        """
+        Add the values recorded by the LatencyHistogram [other].
+        """
+        for index, count in other._counts.items():
+            self._counts[index] = self._counts.get(index, 0) + count
+        if other.count and (not self.count or other.min < self.min):
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+
+    def copy(self):
+        histogram = LatencyHistogram()
+        histogram.merge(self)
+        return histogram
+
+    def summary(self):
+        """
+        Return the count and the mean, min, p50, p90, p99 and max values in
+        microseconds as a dict.
+        """
+        return {
+            "count": self.count,
+            "mean_us": self.mean() / 1000,
+            "min_us": self.min / 1000,
+            "p50_us": self.percentile(50) / 1000,
+            "p90_us": self.percentile(90) / 1000,
+            "p99_us": self.percentile(99) / 1000,
+            "max_us": self.max / 1000,
+        }
+
+
+class TmclStatsEntry:
+    """
+    Counters of the requests of one (command, type) pair or one module. The
+    latency histogram is only kept per (command, type) pair.
+    """
+    __slots__ = ("requests", "errors", "total_ns", "latency")
+
+    def __init__(self, histogram=True):
+        self.requests = 0
+        self.errors = 0
+        self.total_ns = 0
+        self.latency = LatencyHistogram() if histogram else None
+
+    def copy(self):
+        entry = TmclStatsEntry(False)
+        entry.requests = self.requests
+        entry.errors = self.errors
+        entry.total_ns = self.total_ns
+        entry.latency = self.latency.copy() if self.latency else None
+        return entry
+
+    def as_dict(self):
+        result = {"requests": self.requests, "errors": self.errors, "total_ms": self.total_ns / 1e6}
+        if self.latency:
+            result.update(self.latency.summary())
+            del result["count"]
+        return result
+
+
+class TmclStats:
+    """
+    Request statistics of a TmclInterface, see TmclInterface.enable_stats().
+
+    Every request sent with send_request(), send_prepared(), send() (and all
+    accessors built on it) or send_many() is counted with its round trip
+    latency, per (command, type) pair and per module. The latency is split
+    into the phases:
+        encode: packing the request into its 9 byte frame
+        write:  handing the frame to the transport (_send())
+        wait:   waiting for and reading the reply (_recv())
+        decode: decoding and checking the reply
+    To keep the cost per request low, the phases are only summed up (see
+    phase_means()), latency histograms are kept for all requests and per
+    (command, type) pair. Requests of a send_many() batch are transferred
+    together, their share of the batch time is counted as wait time.
+
+    Errors are counted by kind: "status" (status code of the module),
+    "checksum", "timeout" and "other" (e.g. a closed connection).
+
+    The type of a GAP/SAP request is the axis parameter number, so e.g.
+    top() shows which parameters take most of the bus time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """
+        Clear all counters.
+        """
+        with self._lock:
+            self.started = time.time()
+            self.requests = 0
+            self.batches = 0
+            self.errors = dict.fromkeys(_ERRORS, 0)
+            self.latency = LatencyHistogram()
+            self.phases = dict.fromkeys(_PHASES, 0)
+            self.commands = {}
+            self.modules = {}
+
+    def record(self, request, encode_ns, write_ns, wait_ns, decode_ns, error=None):
+        """
+        Count the TMCLRequest [request] with the duration of its phases in
+        nanoseconds. [error] is None or one of "status", "checksum", "timeout"
+        and "other".
+        """
+        latency = encode_ns + write_ns + wait_ns + decode_ns
+        key = (request.command, request.commandType)
+        with self._lock:
+            self.requests += 1
+            self.latency.record(latency)
+            phases = self.phases
+            phases["encode"] += encode_ns
+            phases["write"] += write_ns
+            phases["wait"] += wait_ns
+            phases["decode"] += decode_ns
+
+            command = self.commands.get(key)
+            if command is None:
+                command = self.commands[key] = TmclStatsEntry()
+            command.requests += 1
+            command.total_ns += latency
+            command.latency.record(latency)
+
+            module = self.modules.get(request.moduleAddress)
+            if module is None:
+                module = self.modules[request.moduleAddress] = TmclStatsEntry(False)
+            module.requests += 1
+            module.total_ns += latency
+
+            if error:
+                self.errors[error] += 1
+                command.errors += 1
+                module.errors += 1
+
+    def record_batch(self, requests, transfer_ns, decode_ns, errors):
+        """
+        Count a send_many() batch of TMCLRequests [requests], transferred in
+        [transfer_ns] nanoseconds. [decode_ns] and [errors] give the decode
+        time and error kind (or None) of every request.
+        """
+        with self._lock:
+            self.batches += 1
+        share = transfer_ns // len(requests)
+        for request, decode, error in zip(requests, decode_ns, errors):
+            self.record(request, 0, 0, share, decode, error)
+
+    def copy(self):
+        """
+        Return a snapshot of the statistics.
+        """
+        stats = TmclStats()
+        with self._lock:
+            stats.started = self.started
+            stats.requests = self.requests
+            stats.batches = self.batches
+            stats.errors = dict(self.errors)
+            stats.latency = self.latency.copy()
+            stats.phases = dict(self.phases)
+            stats.commands = {key: entry.copy() for key, entry in self.commands.items()}
+            stats.modules = {key: entry.copy() for key, entry in self.modules.items()}
+        return stats
+
+    def phase_means(self):
+        """
+        Return the mean duration of every phase in nanoseconds as a dict.
+        """
+        with self._lock:
+            return {phase: total / self.requests if self.requests else 0 for phase, total in self.phases.items()}
+
+    def top(self, count=10):
+        """
+        Return the [count] (command, type) pairs with the largest total
+        latency as a list of ((command, type), TmclStatsEntry) tuples.
+        """
+        with self._lock:
+            entries = list(self.commands.items())
+        entries.sort(key=lambda item: item[1].total_ns, reverse=True)
+        return entries[:count]
+
+    def as_dict(self):
+        """
+        Return the statistics as a dict of plain values, e.g. for JSON export.
+        Latencies are given in microseconds.
+        """
+        stats = self.copy()
+        return {
+            "started": stats.started,
+            "requests": stats.requests,
+            "batches": stats.batches,
+            "errors": stats.errors,
+            "latency": stats.latency.summary(),
+            "phases_mean_us": {phase: mean / 1000 for phase, mean in stats.phase_means().items()},
+            "commands": [dict(command=_command_name(command), type=command_type, **entry.as_dict())
+                         for (command, command_type), entry in stats.top(len(stats.commands))],
+            "modules": {module_id: entry.as_dict() for module_id, entry in sorted(stats.modules.items())},
+        }
+
+    def __str__(self):
+        stats = self.copy()
+        latency = stats.latency
+        lines = [
+            "{} requests, {} errors ({}), p50 {:.1f} us, p99 {:.1f} us".format(
+                stats.requests, sum(stats.errors.values()),
+                ", ".join("{} {}".format(count, kind) for kind, count in stats.errors.items()),
+                latency.percentile(50) / 1000, latency.percentile(99) / 1000),
+            "phases (mean us): " + ", ".join("{} {:.1f}".format(phase, mean / 1000)
+                                             for phase, mean in stats.phase_means().items()),
+            "{:24s} {:>5s} {:>9s} {:>7s} {:>10s} {:>10s} {:>10s}".format(
+                "command", "type", "requests", "errors", "total ms", "p50 us", "p99 us"),
+        ]
+        for (command, command_type), entry in stats.top(len(stats.commands)):
+            lines.append("{:24s} {:5d} {:9d} {:7d} {:10.1f} {:10.1f} {:10.1f}".format(
+                _command_name(command), command_type, entry.requests, entry.errors, entry.total_ns / 1e6,
+                entry.latency.percentile(50) / 1000, entry.latency.percentile(99) / 1000))
+        return "\n".join(lines)
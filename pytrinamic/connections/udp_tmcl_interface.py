@@ -0,0 +1,336 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import logging
+import re
+import socket
+import time
+
+from .adaptive_timeout import AdaptiveTimeout
+from .tmcl_interface import TmclInterface
+from ..tmcl import TMCLCommand, TMCLRequest, TMCLReplyChecksumError, TMCLRetry, TMCLTimeoutError
+
+
+class UdpTmclInterface(TmclInterface):
+    """
+    TMCL connection over UDP, for use with e.g. an ethernet-to-serial converter
+    in UDP mode. Unlike SocketTmclInterface, a lost datagram does not stall the
+    following requests behind TCP retransmissions, and no Nagle delay applies.
+
+    A batch of send_many() is packed into datagrams of up to
+    frames_per_datagram requests, which the converter writes to the bus back
+    to back. The converter has to send whole 9 byte reply frames per datagram,
+    several frames per datagram are fine.
+
+    TMCL has no sequence numbers and replies do not echo the type or motor of
+    their request, so a reply is matched to a pending request by the module
+    address and command it carries, and replies may arrive in any order.
+    Replies to requests with the same module address and command could only
+    be told apart by their order, which a lost or late reply breaks. A
+    datagram therefore holds at most one request per module address and
+    command. Batches of such requests, e.g. the GAP requests of
+    get_axis_parameters(), are sent in one datagram per request, each after
+    the replies to the previous one have arrived.
+
+    A request without reply is sent again after a retransmission timeout
+    derived from the measured round trip times (see AdaptiveTimeout), until
+    timeout_s has passed since the first transmission. Only requests that are
+    safe to repeat (see TMCLRetry) are sent again: reads and idempotent writes
+    like SAP, motion commands like ROR and absolute MVP only with
+    retry_motion=True. After a retransmission, replies arriving late for the
+    first transmission are discarded before the next request is sent.
+    """
+
+    _CHANNELS = []
+
+    def __init__(
+        self,
+        ip_and_port: str,
+        datarate: int = 0,
+        host_id: int = 2,
+        module_id: int = 1,
+        timeout_s: float = 5,
+        frames_per_datagram: int = 16,
+        retry_motion: bool = False,
+        min_retransmit_s: float = 0.002,
+    ):
+        """
+        Parameters:
+            ip_and_port:
+                Type: str
+                The address of the converter, e.g. "192.168.0.10:4001".
+            datarate:
+                Type: int, optional, default value: 0
+                Unused, the bus data rate is configured on the converter.
+            timeout_s:
+                Type: float, optional, default value: 5
+                The time to wait for a reply, including retransmissions.
+                0 waits forever.
+            frames_per_datagram:
+                Type: int, optional, default value: 16
+                The maximum number of requests sent in one datagram.
+            retry_motion:
+                Type: bool, optional, default value: False
+                Also send motion commands like ROR again, see TMCLRetry.
+            min_retransmit_s:
+                Type: float, optional, default value: 0.002
+                The lower limit of the retransmission timeout.
+        """
+        if not isinstance(ip_and_port, str):
+            raise TypeError
+
+        match = re.match(r'^"?((?:[0-9]{1,3}\.){3}[0-9]{1,3}):([0-9]{1,5})"?$', ip_and_port)
+        if match is None:
+            raise ValueError("Invalid ip:port combination")
+        if frames_per_datagram < 1:
+            raise ValueError("A datagram has to hold at least one frame")
+
+        del datarate
+        self._ip = match.group(1)
+        self._port = int(match.group(2))
+        self._CHANNELS += [ip_and_port]
+        TmclInterface.__init__(self, host_id, module_id)
+
+        self.logger = logging.getLogger("{}.{}".format(self.__class__.__name__, ip_and_port))
+
+        self._timeout_s = timeout_s if timeout_s != 0 else None
+        self._frames_per_datagram = frames_per_datagram
+        self._retry_motion = retry_motion
+        # The retransmission timeout, also limited by the reply timeout
+        self._rto = AdaptiveTimeout(min_retransmit_s, max(min_retransmit_s, min(timeout_s or 1.0, 1.0)))
+        self._rx_buffer = bytearray(9 * frames_per_datagram + 1024)
+        self._rx_view = memoryview(self._rx_buffer)
+        # Frames sent by _send(), received by _recv()
+        self._outstanding = None
+        # Replies to retransmitted requests may arrive until this time
+        self._late_until = None
+
+        self.retransmits = 0
+        self.unexpected = 0
+
+        self.logger.debug("Opening %s:%d for TMCL control", self._ip, self._port)
+        try:
+            self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            # Only accept datagrams from the converter
+            self._socket.connect((self._ip, self._port))
+        except OSError as e:
+            raise ConnectionError("Failed to open the UDP socket") from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        """
+        Close the connection at the end of a with-statement block.
+        """
+        del exit_type, value, traceback
+        self.close()
+
+    def close(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _send(self, host_id, module_id, data):
+        """
+        Send the bytearray parameter [data].
+
+        This is a required override function for using the tmcl_interface
+        class.
+        """
+        del host_id, module_id
+        frames = [bytes(data)]
+        self._send_frames(frames)
+        self._outstanding = frames
+
+    def _recv(self, host_id, module_id):
+        """
+        Wait for the reply to the request sent by _send() and return it as a
+        bytearray.
+
+        This is a required override function for using the tmcl_interface
+        class.
+        """
+        del host_id, module_id
+        frames, self._outstanding = self._outstanding, None
+        if frames is None:
+            raise TMCLTimeoutError("TMCL datagram timed out")
+        return self._receive(frames)[0]
+
+    def _send_recv_many(self, requests):
+        """
+        Send the requests in datagrams of up to frames_per_datagram frames and
+        collect the replies of each datagram before sending the next one. A
+        request with the same module address and command as one in the
+        current datagram starts the next datagram.
+        """
+        data = self._encode_many(requests)
+        replies = []
+        frames = []
+        keys = set()
+        for offset in range(0, len(data), 9):
+            frame = bytes(data[offset:offset + 9])
+            key = self._request_key(frame)
+            if key in keys or len(frames) == self._frames_per_datagram:
+                self._send_frames(frames)
+                replies += self._receive(frames)
+                frames = []
+                keys.clear()
+            frames.append(frame)
+            keys.add(key)
+        self._send_frames(frames)
+        replies += self._receive(frames)
+        return replies
+
+    def _send_frames(self, frames):
+        if self._socket is None:
+            raise ConnectionError("UDP socket closed")
+        if self._late_until is not None:
+            self._discard_late_replies()
+        self._socket.send(b"".join(frames))
+
+    def _discard_late_replies(self):
+        """
+        Drop the replies to the first transmission of retransmitted requests,
+        which would otherwise be taken for replies to the next requests.
+        """
+        late_until, self._late_until = self._late_until, None
+        while True:
+            wait = late_until - time.monotonic()
+            if wait > 0:
+                self._socket.settimeout(wait)
+            else:
+                self._socket.setblocking(False)
+            try:
+                count = self._socket.recv_into(self._rx_view)
+            except (socket.timeout, BlockingIOError):
+                if wait <= 0:
+                    return
+            except OSError:
+                return
+            else:
+                self.unexpected += count // 9
+
+    @staticmethod
+    def _request_key(frame):
+        # The ASCII firmware version reply carries no module address
+        if frame[1] == TMCLCommand.GET_FIRMWARE_VERSION and frame[2] == 0:
+            return None
+        return frame[0], frame[1]
+
+    def _is_retryable(self, frame):
+        return TMCLRetry.is_retryable(TMCLRequest.from_buffer(frame), self._retry_motion)
+
+    def _receive(self, frames):
+        """
+        Receive the replies to the sent request [frames], retransmitting the
+        unanswered ones. The frames hold at most one request per module
+        address and command. Returns the replies as bytearrays, in the order
+        of [frames].
+        """
+        replies = [None] * len(frames)
+        # The index of the unanswered request for each key
+        pending = {self._request_key(frame): index for index, frame in enumerate(frames)}
+        start = time.monotonic()
+        deadline = start + self._timeout_s if self._timeout_s is not None else None
+        retransmit_at = start + self._rto.timeout_s
+        retransmitted = False
+
+        while pending:
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                self._late_until = now + self._rto.timeout_s
+                raise TMCLTimeoutError("TMCL datagram timed out")
+
+            if retransmit_at is not None and now >= retransmit_at:
+                self._rto.timed_out()
+                resend = [frames[index] for index in sorted(pending.values()) if self._is_retryable(frames[index])]
+                if resend:
+                    self.logger.debug("Retransmitting %d of %d requests", len(resend), len(frames))
+                    self._socket.send(b"".join(resend))
+                    self.retransmits += len(resend)
+                    retransmitted = True
+                    retransmit_at = now + self._rto.timeout_s
+                else:
+                    retransmit_at = None
+                continue
+
+            wake_up = [t for t in (deadline, retransmit_at) if t is not None]
+            self._socket.settimeout(max(min(wake_up) - now, 1e-6) if wake_up else None)
+            try:
+                count = self._socket.recv_into(self._rx_view)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                # E.g. ICMP port unreachable, reported on the next receive
+                raise ConnectionError("UDP connection failed: {}".format(e)) from e
+
+            if count % 9:
+                self.logger.warning("Dropping a datagram of %d bytes, not a multiple of the TMCL frame size", count)
+                continue
+            for offset in range(0, count, 9):
+                frame = self._rx_buffer[offset:offset + 9]
+                index = self._match(frame, pending)
+                if index is None:
+                    self.unexpected += 1
+                    self.logger.debug("Dropping an unexpected reply: %s", frame.hex())
+                    continue
+                replies[index] = frame
+
+        if retransmitted:
+            self._late_until = time.monotonic() + self._rto.timeout_s
+        else:
+            # Karn's algorithm: only time replies to a single transmission
+            self._rto.sample(time.monotonic() - start)
+        return replies
+
+    def _match(self, frame, pending):
+        """
+        Remove the request the reply [frame] belongs to from [pending] and
+        return its index, or None for an unexpected reply.
+        """
+        if frame[0] != self._host_id:
+            return None
+        key = (frame[1], frame[3])
+        if key not in pending and None in pending and all(0x20 <= byte < 0x7F for byte in frame[1:]):
+            # The ASCII firmware version reply
+            key = None
+        return pending.pop(key, None)
+
+    def _reply_check(self, reply):
+        if not reply.is_checksum_correct():
+            raise TMCLReplyChecksumError(reply)
+
+    def set_timeout(self, timeout):
+        self._timeout_s = timeout if timeout != 0 else None
+
+    def get_timeout(self):
+        return self._timeout_s
+
+    def retransmit_timeout(self):
+        """
+        Return the AdaptiveTimeout estimating the retransmission timeout.
+        """
+        return self._rto
+
+    @staticmethod
+    def supports_tmcl():
+        return True
+
+    @classmethod
+    def list(cls):
+        """
+        Return a list of available connection ports as a list of strings.
+
+        This function is required for using this interface with the
+        connection manager.
+        """
+        return cls._CHANNELS
+
+    def __str__(self):
+        return "Connection: type=udp_tmcl_interface ip={} port={}".format(self._ip, self._port)
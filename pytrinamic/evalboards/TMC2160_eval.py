@@ -41,12 +41,15 @@ class TMC2160_eval(TMCLEval):
 
     # Use the driver controller functions for register access
 
-    def write_register(self, register_address, value):
+    def _write_register(self, register_address, value):
         return self._connection.write_drv(register_address, value, self._module_id)
 
     def read_register(self, register_address, signed=False):
         return self._connection.read_drv(register_address, self._module_id, signed)
 
+    def read_registers(self, register_addresses):
+        return self._connection.read_drv_registers(register_addresses, self._module_id)
+
     # Motion control functions
 
     def rotate(self, motor, value):
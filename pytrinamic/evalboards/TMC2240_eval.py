@@ -9,7 +9,6 @@
 from pytrinamic.evalboards import TMCLEval
 from pytrinamic.ic import TMC2240
 from pytrinamic.features import MotorControlModule
-from pytrinamic.helpers import BitField
 
 
 class TMC2240_eval(TMCLEval):
@@ -42,18 +41,14 @@ class TMC2240_eval(TMCLEval):
 
     # Use the motion controller functions for register access
 
-    def write_register(self, register_address, value):
+    def _write_register(self, register_address, value):
         return self._connection.read_drv(register_address, value, self._module_id)
 
     def read_register(self, register_address, signed=False):
         return self._connection.read_drv(register_address, self._module_id, signed)
 
-    def write_register_field(self, field, value):
-        return self.write_register(field[0], BitField.field_set(self.read_register(field[0]),
-                                                                field[1], field[2], value))
-
-    def read_register_field(self, field):
-        return BitField.field_get(self.read_register(field[0]), field[1], field[2])
+    def read_registers(self, register_addresses):
+        return self._connection.read_drv_registers(register_addresses, self._module_id)
 
     # Motion control functions
 
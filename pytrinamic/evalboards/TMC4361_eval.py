@@ -26,12 +26,15 @@ class TMC4361_eval(TMCLEval):
 
     # Use the motion controller channel for register access
 
-    def write_register(self, register_address, value):
+    def _write_register(self, register_address, value):
         return self._connection.write_mc(register_address, value, self._module_id)
 
     def read_register(self, register_address, signed=False):
         return self._connection.read_mc(register_address, self._module_id, signed)
 
+    def read_registers(self, register_addresses):
+        return self._connection.read_mc_registers(register_addresses, self._module_id)
+
     # Motion control functions
 
     def rotate(self, motor, value):
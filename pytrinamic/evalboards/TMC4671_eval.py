@@ -31,12 +31,15 @@ class TMC4671_eval(TMCLEval):
             self.motors[axis].linear_ramp.max_velocity = velocity
         self.connection.move_by(axis, difference, self.module_id)
 
-    def write_register(self, register_address, value):
+    def _write_register(self, register_address, value):
         return self._connection.write_mc(register_address, value, self._module_id)
 
     def read_register(self, register_address, signed=False):
         return self._connection.read_mc(register_address, self._module_id, signed)
 
+    def read_registers(self, register_addresses):
+        return self._connection.read_mc_registers(register_addresses, self._module_id)
+
     class _MotorTypeA(MotorControlModule):
         def __init__(self, eval_board, axis):
             MotorControlModule.__init__(self, eval_board, axis, self.AP)
@@ -48,12 +48,15 @@ class TMC5160_shield(TMCLEval):
         self.ics = [TMC5160()]
 
     # Use the motion controller functions for register access
-    def write_register(self, register_address, value):
+    def _write_register(self, register_address, value):
         return self._connection.write_register(register_address, TMCLCommand.WRITE_MC, self.__channel, value, self._module_id)
 
     def read_register(self, register_address, signed=False):
         return self._connection.read_register(register_address, TMCLCommand.READ_MC, self.__channel, self._module_id, signed)
 
+    def read_registers(self, register_addresses):
+        return self._connection.read_registers(register_addresses, TMCLCommand.READ_MC, self.__channel, self._module_id)
+
     # Motion control functions
 
     def rotate(self, motor, value):
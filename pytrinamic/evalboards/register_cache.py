@@ -0,0 +1,116 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import re
+
+
+class RegisterCache(object):
+    """
+    Shadow copy of the register values of an IC, see
+    TMCLEval.enable_register_cache().
+
+    Holds the last value written to or read from each register address.
+    Volatile registers, which the IC changes on its own (positions,
+    velocities, status and latch registers, counters, ...), are never cached.
+
+    Counters:
+        hits:       register reads answered from the cache
+        misses:     register reads that went to the bus
+    """
+
+    # Register names of values changed by the IC, e.g. XACTUAL, DRV_STATUS_M1
+    # or GSTAT, the electrical angle PHI_E and the integrator sums of the
+    # TMC4671, or the latched home position X_HOME, the actual coil currents
+    # CURRENTA_B and the driver responses COVER_DRV_* and *POLLING_REG of the
+    # TMC4361. Matching a configuration register only costs a read.
+    VOLATILE_NAMES = re.compile(
+        r"ACTUAL|STAT|LATCH|ENC|^MSC|LOST_STEPS|SCALE$|PWM_?AUTO|RESULT|^IOIN|^INP|IFCNT|_READ|ADC|"
+        r"^TSTEP|FAULT|EVENTS|_DATA$|_COUNT|_PHI|^PHI_E$|ISUM|^X_HOME|^CURRENTA|^COVER_DRV|POLLING|"
+        r"SG4_IND|SG_VALUE|OUTPUTS_RAW|^SCALE_PARAM"
+    )
+
+    def __init__(self, volatile=()):
+        """
+        Parameters:
+            volatile:
+                Type: iterable of int, optional, default value: ()
+                The addresses of the registers to always read from the bus.
+        """
+        self.volatile = frozenset(volatile)
+        self._values = dict()
+
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_ics(cls, ics, volatile=()):
+        """
+        Create a cache for the registers of the given ICs. Registers with
+        names matching VOLATILE_NAMES and the addresses in [volatile] are not
+        cached.
+        """
+        addresses = set(volatile)
+        for ic in ics:
+            registers = getattr(ic, "REG", None)
+            if registers is None:
+                continue
+            for name, address in vars(registers).items():
+                if not name.startswith("_") and isinstance(address, int) and cls.VOLATILE_NAMES.search(name):
+                    addresses.add(address)
+        return cls(addresses)
+
+    def is_volatile(self, register_address):
+        return register_address in self.volatile
+
+    def get(self, register_address):
+        """
+        Return the cached value of the register, or None.
+        """
+        value = self._values.get(register_address)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def update(self, register_address, value):
+        """
+        Store the value written to or read from the register. Values of
+        volatile registers are ignored.
+        """
+        if register_address not in self.volatile:
+            self._values[register_address] = value & 0xFFFFFFFF
+
+    def invalidate(self, register_addresses=None):
+        """
+        Forget the values of the given registers, or of all registers.
+        """
+        if register_addresses is None:
+            self._values.clear()
+            return
+        for register_address in register_addresses:
+            self._values.pop(register_address, None)
+
+    def addresses(self):
+        """
+        Return the addresses of the cached registers.
+        """
+        return sorted(self._values)
+
+    def __len__(self):
+        return len(self._values)
+
+    def __str__(self):
+        return "RegisterCache {}".format(
+            {
+                "registers": len(self._values),
+                "volatile": len(self.volatile),
+                "hits": self.hits,
+                "misses": self.misses
+            }
+        )
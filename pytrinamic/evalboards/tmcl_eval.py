@@ -6,7 +6,8 @@
 # proprietary & confidential to Analog Devices, Inc. and its licensors.
 ################################################################################
 
-from pytrinamic.helpers import BitField, to_signed_32
+from pytrinamic.helpers import BitField, field_transaction, to_signed_32
+from pytrinamic.evalboards.register_cache import RegisterCache
 
 
 class TMCLEval(object):
@@ -26,6 +27,9 @@ class TMCLEval(object):
         self.name = ""
         self.desc = ""
         self.motors = []
+        self.ics = []
+        self._register_cache = None
+        self._field_transaction = None
 
     def set_axis_parameter(self, ap_type, axis, value):
         """
@@ -52,12 +56,214 @@ class TMCLEval(object):
         """
         return self._connection.get_axis_parameter(ap_type, axis, self._module_id, signed=signed)
 
+    def get_axis_parameters(self, ap_types, axis, signed=False, raise_on_error=True):
+        """
+        Gets several axis parameters for the given axis of this board with a single send_many() batch.
+
+        Parameters:
+        ap_types: Axis parameter types. These can be retrieved from the APs class of this axis.
+        axis: Axis index for the parameters to get from.
+        signed: Indicates whether the values should be interpreted as signed or not.
+        raise_on_error: If False, None is returned for parameters the board rejects,
+        instead of raising TMCLReplyStatusError.
+
+        Returns: List of axis parameter values, in the order of ap_types.
+        """
+        return self._connection.get_axis_parameters(ap_types, axis, self._module_id, signed, raise_on_error)
+
+    def write_register(self, register_address, value):
+        """
+        Writes the given value to the register. While the register cache is
+        enabled, the value is stored in the cache, or forgotten if the write
+        fails. Boards implement the register access in _write_register().
+
+        Parameters:
+        register_address: Address of the register.
+        value: Value to write to the register.
+        """
+        if self._register_cache is None:
+            return self._write_register(register_address, value)
+        try:
+            result = self._write_register(register_address, value)
+        except Exception:
+            self._register_cache.invalidate([register_address])
+            raise
+        self._register_cache.update(register_address, value)
+        return result
+
     def write_register_field(self, field, value):
-        return self.write_register(field[0], BitField.field_set(self.read_register(field[0]),
+        if self._field_transaction is not None:
+            return self._field_transaction.write_field(field, value)
+        return self.write_register(field[0], BitField.field_set(self._read_register_value(field[0]),
                                                                 field[1], field[2], value))
 
     def read_register_field(self, field):
-        return BitField.field_get(self.read_register(field[0]), field[1], field[2])
+        value = self._read_register_value(field[0])
+        if self._field_transaction is not None:
+            value = self._field_transaction.apply(field[0], value)
+        return BitField.field_get(value, field[1], field[2])
+
+    def field_transaction(self):
+        """
+        Collect the register field writes of a with-statement block and write
+        them at its end, with one read-modify-write per register, or only a
+        write when the fields cover the whole register:
+
+            with eval_board.field_transaction():
+                eval_board.write_register_field(TMC5160.FIELD.TOFF, 3)
+                eval_board.write_register_field(TMC5160.FIELD.TBL, 2)
+                eval_board.write_register_field(TMC5160.FIELD.MRES, 4)
+
+        Field reads inside the block see the pending writes. If the block
+        raises, nothing is written.
+
+        Returns: Context manager yielding the FieldTransaction.
+        """
+        return field_transaction(self, self._read_register_value, self.write_register)
+
+    def _read_register_value(self, register_address):
+        if self._register_cache is None:
+            return self.read_register(register_address)
+        return self._cached_read_register(register_address)
+
+
+    def read_registers(self, register_addresses):
+        """
+        Reads several registers. Boards with TMCL register access override
+        this with a single send_many() batch.
+
+        Parameters:
+        register_addresses: Addresses of the registers to read.
+
+        Returns: List of the register values, in the order of register_addresses.
+        """
+        return [self.read_register(register_address) for register_address in register_addresses]
+
+    def diff_registers(self, registers, fields=()):
+        """
+        Compares register values with the values on the board. Registers not
+        held by the register cache are read with one read_registers() call.
+
+        Parameters:
+        registers: Dictionary mapping register addresses to values.
+        fields: Register fields as (field, value) tuples, applied on top of the
+        given or current register values.
+
+        Returns: Dictionary mapping the address of each differing register to a
+        tuple (current value, given value).
+        """
+        registers = dict(registers)
+        addresses = list(registers)
+        for field, _ in fields:
+            if field[0] not in addresses:
+                addresses.append(field[0])
+
+        current = dict()
+        if self._register_cache is not None:
+            for register_address in addresses:
+                if not self._register_cache.is_volatile(register_address):
+                    value = self._register_cache.get(register_address)
+                    if value is not None:
+                        current[register_address] = value
+        missing = [register_address for register_address in addresses if register_address not in current]
+        for register_address, value in zip(missing, self.read_registers(missing) if missing else []):
+            current[register_address] = value
+            if self._register_cache is not None:
+                self._register_cache.update(register_address, value)
+
+        for field, value in fields:
+            registers[field[0]] = BitField.field_set(registers.get(field[0], current[field[0]]) & 0xFFFFFFFF,
+                                                     field[1], field[2], value)
+
+        diff = dict()
+        for register_address in addresses:
+            value = registers[register_address]
+            if (current[register_address] ^ value) & 0xFFFFFFFF:
+                current_value = to_signed_32(current[register_address]) if value < 0 else current[register_address]
+                diff[register_address] = (current_value, value)
+        return diff
+
+    def apply_registers(self, registers, fields=()):
+        """
+        Brings the registers to the given values, writing only the registers
+        whose values differ from the values on the board, see diff_registers().
+
+        Parameters:
+        registers: Dictionary mapping register addresses to values.
+        fields: Register fields as (field, value) tuples, applied on top of the
+        given or current register values.
+
+        Returns: The differences found, see diff_registers().
+        """
+        diff = self.diff_registers(registers, fields)
+        for register_address, (_, value) in diff.items():
+            self.write_register(register_address, value)
+        return diff
+
+    # Register cache
+
+    def enable_register_cache(self, volatile=()):
+        """
+        Keep a shadow copy of the register values of the ICs on this board.
+        Field reads and writes of cached registers then take the register
+        value from the cache instead of reading it first, so writing a field
+        costs a single register write. Volatile registers (see RegisterCache)
+        are always read from the bus.
+
+        Values written with write_register() are stored in the cache as
+        well. When something else changes the configuration (another host,
+        a reset of the board), call invalidate_registers().
+
+        Parameters:
+            volatile:
+                Type: iterable of int, optional, default value: ()
+                Addresses of further registers to always read from the bus.
+
+        Returns: The RegisterCache.
+        """
+        self._register_cache = RegisterCache.for_ics(self.ics, volatile)
+        return self._register_cache
+
+    def disable_register_cache(self):
+        """
+        Drop the register cache, every field access reads from the bus again.
+        """
+        self._register_cache = None
+
+    def register_cache(self):
+        """
+        Return the RegisterCache, or None if the cache is disabled.
+        """
+        return self._register_cache
+
+    def invalidate_registers(self, register_addresses=None):
+        """
+        Forget the cached values of the given registers, or of all registers.
+        The next field access reads them from the bus.
+        """
+        if self._register_cache is not None:
+            self._register_cache.invalidate(register_addresses)
+
+    def refresh_registers(self, register_addresses=None):
+        """
+        Read the given registers, or all cached registers, from the bus into
+        the cache.
+        """
+        if self._register_cache is None:
+            return
+        if register_addresses is None:
+            register_addresses = self._register_cache.addresses()
+        for register_address in register_addresses:
+            self._register_cache.update(register_address, self.read_register(register_address))
+
+    def _cached_read_register(self, register_address):
+        if self._register_cache.is_volatile(register_address):
+            return self.read_register(register_address)
+        value = self._register_cache.get(register_address)
+        if value is None:
+            value = self.read_register(register_address)
+            self._register_cache.update(register_address, value)
+        return value
 
     def write_axis_field(self, axis, field, value):
         """
@@ -8,3 +8,4 @@ from .motor_control_module import MotorControlModule
 from .pid_module import PIDModule
 from .stallguard2_module import StallGuard2Module
 from .coolstep_module import CoolStepModule
+from .axis_parameter_snapshot import AxisParameterSnapshot
@@ -0,0 +1,128 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+import time
+
+
+def axis_parameter_names(aps):
+    """
+    Return a dictionary mapping the names of the axis parameters defined by
+    the AP class [aps] to their types, in the order of definition. Nested
+    classes like ENUM are skipped.
+    """
+    names = dict()
+    for cls in reversed(aps.__mro__[:-1]):
+        for name, value in vars(cls).items():
+            if not name.startswith("_") and isinstance(value, int) and not isinstance(value, bool):
+                names[name] = value
+    return names
+
+
+class AxisParameterSnapshot(object):
+    """
+    Values of all axis parameters of one axis, read in a single batch. The
+    values can be accessed by the parameter names of the AP class, either as
+    attributes or as items:
+
+        snapshot = module.motors[0].snapshot()
+        snapshot.ActualPosition
+        snapshot["MaxVelocity"]
+
+    Parameters the module rejects (e.g. not supported by its firmware) are
+    left out.
+    """
+
+    def __init__(self, axis, values, timestamp=None):
+        """
+        Parameters:
+        axis: Axis index the values were read from.
+        values: Dictionary mapping parameter names to values.
+        timestamp: Time of the reading, as returned by time.time().
+        """
+        self.axis = axis
+        self.values = values
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    @classmethod
+    def read(cls, parent, axis, aps, signed=True):
+        """
+        Read all axis parameters of the AP class [aps] with one
+        get_axis_parameters() batch of [parent], i.e. a module or evaluation
+        board.
+        """
+        names = axis_parameter_names(aps)
+        values = parent.get_axis_parameters(list(names.values()), axis, signed, raise_on_error=False)
+        return cls(axis, {name: value for name, value in zip(names, values) if value is not None})
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["values"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __getitem__(self, name):
+        return self.values[name]
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def __iter__(self):
+        return iter(self.values)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __eq__(self, other):
+        return isinstance(other, AxisParameterSnapshot) and self.axis == other.axis and self.values == other.values
+
+    def as_dict(self):
+        return dict(self.values)
+
+    def diff(self, other):
+        """
+        Compare this snapshot with an [other], e.g. earlier, one.
+
+        Returns: Dictionary mapping the name of each differing parameter to a
+        tuple (value in other, value in this snapshot). Parameters missing in
+        one of the snapshots are None there.
+        """
+        diff = dict()
+        for name in list(other.values) + [name for name in self.values if name not in other.values]:
+            old, new = other.values.get(name), self.values.get(name)
+            if old != new:
+                diff[name] = (old, new)
+        return diff
+
+    @staticmethod
+    def to_array(snapshots):
+        """
+        Convert snapshots, e.g. of periodic readings, into a numpy structured
+        array with the fields "timestamp", "axis" and one int64 field per
+        parameter. Parameters missing in a snapshot are 0.
+        """
+        import numpy as np
+
+        snapshots = list(snapshots)
+        names = []
+        for snapshot in snapshots:
+            names += [name for name in snapshot.values if name not in names]
+        dtype = [("timestamp", "<f8"), ("axis", "<u1")] + [(name, "<i8") for name in names]
+
+        records = np.zeros(len(snapshots), dtype=dtype)
+        for index, snapshot in enumerate(snapshots):
+            records[index] = (snapshot.timestamp, snapshot.axis) + tuple(snapshot.values.get(name, 0) for name in names)
+        return records
+
+    def __str__(self):
+        return "{} {}".format(
+            "AxisParameterSnapshot",
+            {
+                "axis": self.axis,
+                "values": self.values
+            }
+        )
@@ -7,6 +7,7 @@
 ################################################################################
 
 from ..features.motor_control import MotorControl
+from ..features.axis_parameter_snapshot import AxisParameterSnapshot
 
 
 class MotorControlModule(MotorControl):
@@ -134,6 +135,20 @@ class MotorControlModule(MotorControl):
         """
         return self._parent.get_axis_parameter(self._aps.ErrorFlags)
 
+    def snapshot(self, signed=True):
+        """
+        Reads all axis parameters of the AP class of this axis with a single
+        send_many() batch, e.g. for periodic health dumps. Parameters rejected
+        by the module are left out.
+
+        Parameters:
+        signed: Indicates whether the values should be interpreted as signed or not.
+
+        Returns: AxisParameterSnapshot of the values, see AxisParameterSnapshot.diff()
+        for comparing two snapshots.
+        """
+        return AxisParameterSnapshot.read(self._parent, self._axis, self._aps, signed)
+
     # Properties
     target_position = property(get_target_position, set_target_position)
     actual_position = property(get_actual_position, set_actual_position)
@@ -141,13 +156,15 @@ class MotorControlModule(MotorControl):
     actual_velocity = property(get_actual_velocity)
 
     def __str__(self):
+        values = self._parent.get_axis_parameters([self._aps.TargetPosition, self._aps.ActualPosition,
+                                                   self._aps.TargetVelocity, self._aps.ActualVelocity], self._axis, True)
         return "{} {}".format(
             "MotorControl",
             {
                 "motor": self._axis,
-                "target_position": self.target_position,
-                "actual_position": self.actual_position,
-                "target_velocity": self.target_velocity,
-                "actual_velocity": self.actual_velocity
+                "target_position": values[0],
+                "actual_position": values[1],
+                "target_velocity": values[2],
+                "actual_velocity": values[3]
             }
         )
@@ -59,13 +59,15 @@ class PIDModule(PID):
     position_p = property(get_position_p_parameter, set_position_p_parameter)
 
     def __str__(self):
+        values = self._parent.get_axis_parameters([self._aps.TorqueP, self._aps.TorqueI, self._aps.VelocityP,
+                                                   self._aps.VelocityI, self._aps.PositionP], self._axis)
         return "{} {}".format(
             "PID",
             {
-                "torque_p": self.torque_p,
-                "torque_i": self.torque_i,
-                "velocity_p": self.velocity_p,
-                "velocity_i": self.velocity_i,
-                "position_p": self.position_p,
+                "torque_p": values[0],
+                "torque_i": values[1],
+                "velocity_p": values[2],
+                "velocity_i": values[3],
+                "position_p": values[4],
             }
         )
@@ -0,0 +1,298 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""TMCL gateway sharing one bus between several client processes
+
+The gateway opens one TMCL connection (selected with the ConnectionManager
+options) and accepts TMCL clients on a local TCP and/or Unix socket. Every
+client sends raw 9 byte TMCL requests and receives the 9 byte replies in the
+same order, so a client can simply use SocketTmclInterface:
+
+    python -m pytrinamic.gateway --interface serial_tmcl --port /dev/ttyUSB0 --data-rate 115200 --listen 127.0.0.1:2323
+
+    interface = SocketTmclInterface("127.0.0.1:2323")
+
+Identical read requests of different clients waiting for the bus at the same
+time are sent only once.
+"""
+
+import argparse
+import logging
+import socket
+import socketserver
+import sys
+import threading
+from collections import deque
+
+from .connections.connection_manager import ConnectionManager
+from .connections.shared_tmcl_interface import SharedTmclInterface
+from .tmcl import TMCLRequest, TMCLReplyError, TMCLRetry
+
+logger = logging.getLogger(__name__)
+
+
+class _ClientHandler(socketserver.BaseRequestHandler):
+    """
+    Serves one client connection. The calling thread reads and queues the
+    requests, a second thread writes the replies back in request order.
+    """
+
+    def setup(self):
+        if self.request.family in (socket.AF_INET, socket.AF_INET6):
+            self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._replies = deque()
+        self._condition = threading.Condition()
+        # Sequence number of the last request of this client that changes state
+        self._last_write = 0
+
+    def handle(self):
+        gateway = self.server.gateway
+        logger.info("Client %s connected", self.client_address)
+
+        writer = threading.Thread(target=self._write_replies, daemon=True)
+        writer.start()
+
+        frame = bytearray(9)
+        view = memoryview(frame)
+        try:
+            while True:
+                received = 0
+                while received < 9:
+                    count = self.request.recv_into(view[received:])
+                    if count == 0:
+                        return
+                    received += count
+
+                future, sequence = gateway._submit(bytes(frame), self._last_write)
+                if sequence:
+                    self._last_write = sequence
+                with self._condition:
+                    self._replies.append(future)
+                    self._condition.notify()
+        except (OSError, RuntimeError) as e:
+            # RuntimeError: the gateway was closed
+            logger.debug("Client %s: %s", self.client_address, e)
+        finally:
+            with self._condition:
+                self._replies.append(None)
+                self._condition.notify()
+            writer.join()
+            logger.info("Client %s disconnected", self.client_address)
+
+    def _write_replies(self):
+        while True:
+            with self._condition:
+                while not self._replies:
+                    self._condition.wait()
+                future = self._replies.popleft()
+            if future is None:
+                return
+
+            try:
+                reply = future.result()
+            except TMCLReplyError as e:
+                # Forward bad replies as received, the client checks them itself
+                reply = e.reply
+            except Exception as e:
+                # Without a reply the client would match the following replies
+                # to the wrong requests, so disconnect it instead
+                logger.warning("Request of client %s failed, disconnecting: %s", self.client_address, e)
+                self._disconnect()
+                return
+
+            try:
+                self.request.sendall(reply.to_buffer())
+            except OSError:
+                self._disconnect()
+                return
+
+    def _disconnect(self):
+        try:
+            self.request.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+else:
+    _UnixServer = None
+
+
+class TmclGateway:
+    """
+    Server multiplexing the TMCL requests of many clients onto one interface.
+
+    The interface is wrapped into a SharedTmclInterface, so the gateway can be
+    used from the local process at the same time through the bus attribute.
+    """
+
+    def __init__(self, interface, tcp_address=("127.0.0.1", 2323), unix_path=None, coalesce=True):
+        """
+        Parameters:
+            interface:
+                Type: TmclInterface
+                The interface to share, e.g. returned by ConnectionManager.connect().
+            tcp_address:
+                Type: tuple, optional, default value: ("127.0.0.1", 2323)
+                The (host, port) to listen on. Port 0 picks a free port, None
+                disables the TCP server.
+            unix_path:
+                Type: str, optional, default value: None
+                The path of a Unix socket to listen on.
+            coalesce:
+                Type: bool, optional, default value: True
+                Answer identical read requests waiting for the bus at the same
+                time with one transfer.
+        """
+        if not isinstance(interface, SharedTmclInterface):
+            interface = SharedTmclInterface(interface)
+        self.bus = interface
+        self.coalesced = 0
+
+        self._coalesce = coalesce
+        self._lock = threading.Lock()
+        self._pending_reads = {}
+        self._sequence = 0
+
+        self._servers = []
+        if tcp_address is not None:
+            self._servers.append(_TCPServer(tcp_address, _ClientHandler))
+        if unix_path is not None:
+            if _UnixServer is None:
+                raise ValueError("Unix sockets are not supported on this platform")
+            self._servers.append(_UnixServer(unix_path, _ClientHandler))
+        if not self._servers:
+            raise ValueError("No address to listen on")
+        for server in self._servers:
+            server.gateway = self
+        self._threads = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        del exit_type, value, traceback
+        self.close()
+
+    @property
+    def addresses(self):
+        """
+        The addresses the gateway listens on.
+        """
+        return [server.server_address for server in self._servers]
+
+    def start(self):
+        """
+        Start serving clients in background threads.
+        """
+        for server in self._servers:
+            thread = threading.Thread(target=server.serve_forever, name="TmclGateway", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+            logger.info("Listening on %s", server.server_address)
+
+    def serve_forever(self):
+        """
+        Serve clients until interrupted with Ctrl+C.
+        """
+        self.start()
+        try:
+            for thread in self._threads:
+                while thread.is_alive():
+                    thread.join(0.5)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Stop serving and close the shared interface.
+        """
+        for server in self._servers:
+            if self._threads:
+                server.shutdown()
+            server.server_close()
+        self._threads = []
+        self.bus.close()
+
+    def _submit(self, frame, last_write):
+        """
+        Queue the request [frame] of a client on the bus.
+
+        Returns the Future of the reply and, for requests changing state, the
+        sequence number to pass as [last_write] for the following requests of
+        that client. A read is only coalesced with an identical read queued
+        after the last write of the same client, so clients always read their
+        own writes.
+        """
+        request = TMCLRequest.from_buffer(frame)
+        # Requests without side effects can be answered with the reply of an
+        # identical request of another client
+        if not self._coalesce or TMCLRetry.classify(request) != TMCLRetry.READ:
+            with self._lock:
+                self._sequence += 1
+                return self.bus.submit_request(request), self._sequence
+
+        with self._lock:
+            pending = self._pending_reads.get(frame)
+            # Only reuse requests that are still queued, so the reply is
+            # always read after this request arrived
+            if pending and pending[1] > last_write and not (pending[0].running() or pending[0].done()):
+                self.coalesced += 1
+                return pending[0], 0
+
+            self._sequence += 1
+            future = self.bus.submit_request(request)
+            self._pending_reads[frame] = (future, self._sequence)
+
+        future.add_done_callback(lambda done: self._forget(frame, done))
+        return future, 0
+
+    def _forget(self, frame, future):
+        with self._lock:
+            pending = self._pending_reads.get(frame)
+            if pending and pending[0] is future:
+                del self._pending_reads[frame]
+
+
+def _parse_address(address):
+    host, _, port = address.rpartition(":")
+    try:
+        return host or "127.0.0.1", int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected host:port, got " + address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listen", type=_parse_address, default=("127.0.0.1", 2323), metavar="HOST:PORT",
+                        help="TCP address to listen on (default: 127.0.0.1:2323)")
+    parser.add_argument("--no-tcp", action="store_true", help="do not listen on TCP, requires --unix")
+    parser.add_argument("--unix", metavar="PATH", help="Unix socket to listen on")
+    parser.add_argument("--no-coalesce", action="store_true", help="send every read request to the bus")
+    ConnectionManager.argparse(parser)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s: %(message)s")
+
+    interface = ConnectionManager(sys.argv, connection_type="tmcl").connect()
+    gateway = TmclGateway(interface, None if args.no_tcp else args.listen, args.unix, not args.no_coalesce)
+    gateway.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
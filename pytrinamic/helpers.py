@@ -6,6 +6,12 @@
 # proprietary & confidential to Analog Devices, Inc. and its licensors.
 ################################################################################
 
+import contextlib
+import importlib
+import sys
+import types
+
+
 class BitField:
 
     @staticmethod
@@ -17,11 +23,144 @@ class BitField:
         return (data & (~mask)) | ((value << shift) & mask)
 
 
+class FieldTransaction:
+    """
+    Register field writes collected by a field_transaction() block, e.g. of
+    TMCLEval or TMC4671.
+
+    At commit, the fields are grouped by register address. Each register then
+    gets a single read-modify-write, or only a write when the fields cover all
+    32 bits. Fields are applied in the order they were written, so a later
+    write to the same field wins.
+    """
+
+    def __init__(self, read_register, write_register):
+        """
+        Parameters:
+        read_register: Function reading a register, called with the register address.
+        write_register: Function writing a register, called with the register address and value.
+        """
+        self._read_register = read_register
+        self._write_register = write_register
+        # Register address: list of (mask, shift, value), in insertion order
+        self._fields = dict()
+
+    def write_field(self, field, value):
+        self._fields.setdefault(field[0], []).append((field[1], field[2], value))
+
+    def apply(self, register_address, data):
+        """
+        Return the register value [data] with the pending fields of the
+        register applied.
+        """
+        for mask, shift, value in self._fields.get(register_address, ()):
+            data = BitField.field_set(data, mask, shift, value)
+        return data
+
+    def commit(self):
+        """
+        Write the pending fields. Returns the number of registers written.
+        """
+        fields, self._fields = self._fields, dict()
+        for register_address, writes in fields.items():
+            mask = 0
+            for field_mask, _, _ in writes:
+                mask |= field_mask
+            data = 0 if mask & 0xFFFFFFFF == 0xFFFFFFFF else self._read_register(register_address)
+            for field_mask, shift, value in writes:
+                data = BitField.field_set(data, field_mask, shift, value)
+            self._write_register(register_address, data)
+        return len(fields)
+
+    def discard(self):
+        self._fields.clear()
+
+    def __len__(self):
+        return len(self._fields)
+
+
 def to_signed_32(x):
     m = x & 0xffffffff
     return (m ^ 0x80000000) - 0x80000000
 
 
+@contextlib.contextmanager
+def field_transaction(owner, read_register, write_register):
+    """
+    Collect the field writes of [owner] in a FieldTransaction for the duration
+    of a with-statement block and write them at its end. If the block raises,
+    nothing is written. A nested block joins the outer transaction.
+
+    The owner has to keep the transaction in its _field_transaction attribute
+    and pass its write_register_field() calls to it while it is set.
+    """
+    if owner._field_transaction is not None:
+        yield owner._field_transaction
+        return
+
+    transaction = FieldTransaction(read_register, write_register)
+    owner._field_transaction = transaction
+    try:
+        yield transaction
+    finally:
+        owner._field_transaction = None
+    transaction.commit()
+
+
+def lazy_attributes(package, attributes):
+    """
+    Create module level __getattr__() and __dir__() functions (PEP 562) which
+    import the attributes of a package on first access.
+
+    Parameters:
+    package: Name of the package, i.e. __name__ of its __init__.py.
+    attributes: Dictionary mapping each attribute name to the (relative)
+    name of the submodule defining it.
+
+    Returns: Tuple of the __getattr__ and __dir__ functions for the package.
+    """
+    class LazyPackage(types.ModuleType):
+        def __setattr__(self, name, value):
+            # Importing a submodule binds it to the package under its own
+            # name, e.g. pytrinamic.ic.TMC5160. Bind the class instead, as an
+            # eager "from .TMC5160 import TMC5160" would have done.
+            if isinstance(value, types.ModuleType) and name in attributes and hasattr(value, name):
+                value = getattr(value, name)
+            super().__setattr__(name, value)
+
+    sys.modules[package].__class__ = LazyPackage
+
+    def __getattr__(name):
+        try:
+            module_name = attributes[name]
+        except KeyError:
+            raise AttributeError("module {!r} has no attribute {!r}".format(package, name)) from None
+
+        value = getattr(importlib.import_module(module_name, package), name)
+        # Cache the attribute, later accesses do not go through __getattr__()
+        setattr(sys.modules[package], name, value)
+        return value
+
+    def __dir__():
+        return sorted(set(vars(sys.modules[package])) | set(attributes))
+
+    return __getattr__, __dir__
+
+
+def find_attribute_name(name, attributes):
+    """
+    Find the attribute matching a product name, ignoring case, dashes and
+    underscores. E.g. "TMCM-1240" matches the attribute "TMCM1240".
+
+    Raises ValueError if no attribute matches.
+    """
+    key = name.replace("-", "").replace("_", "").lower()
+    for attribute in attributes:
+        if attribute.replace("_", "").lower() == key:
+            return attribute
+    raise ValueError("Unknown name: " + name)
+
+
 class EEPROM:
     """
     This class provides basic access to an EEPROM.
@@ -8,7 +8,7 @@
 
 import struct
 from ..ic.tmc_ic import TMCIc
-from ..helpers import BitField, to_signed_32
+from ..helpers import BitField, field_transaction, to_signed_32
 
 DATAGRAM_FORMAT = ">BI"
 DATAGRAM_LENGTH = 5
@@ -22,6 +22,7 @@ class TMC4671(TMCIc):
     def __init__(self, connection=None):
         super().__init__("TMC4671", self.__doc__)
         self._connection = connection
+        self._field_transaction = None
 
     # Only used for direct UART access without EvalSystem
     def write_register(self, register_address, value):
@@ -37,11 +38,25 @@ class TMC4671(TMCIc):
         return to_signed_32(value) if signed else value
 
     def write_register_field(self, field, value):
+        if self._field_transaction is not None:
+            return self._field_transaction.write_field(field, value)
         return self.write_register(field[0], BitField.field_set(self.read_register(field[0]),
                                                                 field[1], field[2], value))
 
     def read_register_field(self, field):
-        return BitField.field_get(self.read_register(field[0]), field[1], field[2])
+        value = self.read_register(field[0])
+        if self._field_transaction is not None:
+            value = self._field_transaction.apply(field[0], value)
+        return BitField.field_get(value, field[1], field[2])
+
+    def field_transaction(self):
+        """
+        Collect the register field writes of a with-statement block and write
+        them at its end, with one read-modify-write per register, or only a
+        write when the fields cover the whole register. See
+        TMCLEval.field_transaction().
+        """
+        return field_transaction(self, self.read_register, self.write_register)
 
     class REG:
         """
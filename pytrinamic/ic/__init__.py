@@ -1,25 +1,41 @@
-from .MAX22216 import MAX22216
-from .TMC2100 import TMC2100
-from .TMC2130 import TMC2130
-from .TMC2160 import TMC2160
-from .TMC2208 import TMC2208
-from .TMC2209 import TMC2209
-from .TMC2224 import TMC2224
-from .TMC2225 import TMC2225
-from .TMC2240 import TMC2240
-from .TMC2300 import TMC2300
-from .TMC2590 import TMC2590
-from .TMC2660 import TMC2660
-from .TMC4361 import TMC4361
-from .TMC4671 import TMC4671
-from .TMC5031 import TMC5031
-from .TMC5041 import TMC5041
-from .TMC5062 import TMC5062
-from .TMC5072 import TMC5072
-from .TMC5130 import TMC5130
-from .TMC5160 import TMC5160
-from .TMC5240 import TMC5240
-from .TMC6100 import TMC6100
-from .TMC6200 import TMC6200
-from .TMC6300 import TMC6300
-from .TMC7300 import TMC7300
+# The IC classes are imported on first access, e.g. pytrinamic.ic.TMC5160.
+from ..helpers import lazy_attributes, find_attribute_name
+
+_CLASSES = {
+    "MAX22216": ".MAX22216",
+    "TMC2100": ".TMC2100",
+    "TMC2130": ".TMC2130",
+    "TMC2160": ".TMC2160",
+    "TMC2208": ".TMC2208",
+    "TMC2209": ".TMC2209",
+    "TMC2224": ".TMC2224",
+    "TMC2225": ".TMC2225",
+    "TMC2240": ".TMC2240",
+    "TMC2300": ".TMC2300",
+    "TMC2590": ".TMC2590",
+    "TMC2660": ".TMC2660",
+    "TMC4361": ".TMC4361",
+    "TMC4671": ".TMC4671",
+    "TMC5031": ".TMC5031",
+    "TMC5041": ".TMC5041",
+    "TMC5062": ".TMC5062",
+    "TMC5072": ".TMC5072",
+    "TMC5130": ".TMC5130",
+    "TMC5160": ".TMC5160",
+    "TMC5240": ".TMC5240",
+    "TMC6100": ".TMC6100",
+    "TMC6200": ".TMC6200",
+    "TMC6300": ".TMC6300",
+    "TMC7300": ".TMC7300",
+}
+
+__all__ = list(_CLASSES)
+__getattr__, __dir__ = lazy_attributes(__name__, _CLASSES)
+
+
+def get_ic_class(name):
+    """
+    Return the IC class for a name like "TMC5160". Case, dashes and
+    underscores are ignored. Only the matching class gets imported.
+    """
+    return __getattr__(find_attribute_name(name, _CLASSES))
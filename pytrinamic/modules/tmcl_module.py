@@ -6,6 +6,10 @@
 # proprietary & confidential to Analog Devices, Inc. and its licensors.
 ################################################################################
 
+from ..tmcl import TMCLCommand
+from ..helpers import to_signed_32
+
+
 class TMCLModule(object):
 
     def __init__(self, connection, module_id=1):
@@ -74,6 +78,75 @@ class TMCLModule(object):
         """
         return self.connection.get_axis_parameter(ap_type, axis, self.module_id, signed=signed)
 
+    def get_axis_parameters(self, ap_types, axis, signed=False, raise_on_error=True):
+        """
+        Gets several axis parameters for the given axis of this module with a single send_many() batch.
+
+        Parameters:
+        ap_types: Axis parameter types. These can be retrieved from the APs class of this axis.
+        axis: Axis index for the parameters to get from.
+        signed: Indicates whether the values should be interpreted as signed or not.
+        raise_on_error: If False, None is returned for parameters the module rejects,
+        instead of raising TMCLReplyStatusError.
+
+        Returns: List of axis parameter values, in the order of ap_types.
+        """
+        return self.connection.get_axis_parameters(ap_types, axis, self.module_id, signed, raise_on_error)
+
+    def snapshot(self, signed=True):
+        """
+        Reads all axis parameters of all motors, see MotorControlModule.snapshot().
+
+        Returns: List of AxisParameterSnapshot objects, one per motor.
+        """
+        return [motor.snapshot(signed) for motor in self.motors]
+
+    def diff_axis_parameters(self, axis, parameters):
+        """
+        Compares axis parameter values with the values on the module. The
+        current values are read with a single send_many() batch.
+
+        Parameters:
+        axis: Axis index of the parameters.
+        parameters: Dictionary mapping axis parameter types to values.
+
+        Returns: Dictionary mapping the type of each differing axis parameter to
+        a tuple (current value, given value).
+        """
+        parameters = dict(parameters)
+        ap_types = list(parameters)
+        current = self.connection.get_axis_parameters(ap_types, axis, self.module_id) if ap_types else []
+
+        diff = dict()
+        for ap_type, current_value in zip(ap_types, current):
+            value = parameters[ap_type]
+            if (current_value ^ value) & 0xFFFFFFFF:
+                diff[ap_type] = (to_signed_32(current_value) if value < 0 else current_value, value)
+        return diff
+
+    def apply_axis_parameters(self, axis, parameters, store=False):
+        """
+        Brings the axis parameters of an axis to the given values. Only the
+        parameters whose values differ from the values on the module are set,
+        in a single send_many() batch.
+
+        Parameters:
+        axis: Axis index of the parameters.
+        parameters: Dictionary mapping axis parameter types to values.
+        store: Also store the changed parameters in the EEPROM (STAP). The
+        comparison is done with the values in RAM, which are the stored values
+        after power-up, so unchanged parameters are not stored again.
+
+        Returns: The differences found, see diff_axis_parameters().
+        """
+        diff = self.diff_axis_parameters(axis, parameters)
+        requests = [(TMCLCommand.SAP, ap_type, axis, value) for ap_type, (_, value) in diff.items()]
+        if store:
+            requests += [(TMCLCommand.STAP, ap_type, axis, 0) for ap_type in diff]
+        if requests:
+            self.connection.send_many(requests, self.module_id)
+        return diff
+
     def set_global_parameter(self, gp_type, bank, value):
         """
         Sets the global parameter on this module identified by type to the given value.
@@ -99,6 +172,49 @@ class TMCLModule(object):
         """
         return self.connection.get_global_parameter(gp_type, bank, self.module_id, signed=signed)
 
+    def diff_global_parameters(self, bank, parameters):
+        """
+        Compares global parameter values with the values on the module. The
+        current values are read with a single send_many() batch.
+
+        Parameters:
+        bank: Bank number of the parameters.
+        parameters: Dictionary mapping global parameter types to values.
+
+        Returns: Dictionary mapping the type of each differing global parameter
+        to a tuple (current value, given value).
+        """
+        parameters = dict(parameters)
+        gp_types = list(parameters)
+        current = self.connection.get_global_parameters(gp_types, bank, self.module_id) if gp_types else []
+
+        diff = dict()
+        for gp_type, current_value in zip(gp_types, current):
+            value = parameters[gp_type]
+            if (current_value ^ value) & 0xFFFFFFFF:
+                diff[gp_type] = (to_signed_32(current_value) if value < 0 else current_value, value)
+        return diff
+
+    def apply_global_parameters(self, bank, parameters, store=False):
+        """
+        Brings the global parameters of a bank to the given values, like
+        apply_axis_parameters().
+
+        Parameters:
+        bank: Bank number of the parameters.
+        parameters: Dictionary mapping global parameter types to values.
+        store: Also store the changed parameters in the EEPROM (STGP).
+
+        Returns: The differences found, see diff_global_parameters().
+        """
+        diff = self.diff_global_parameters(bank, parameters)
+        requests = [(TMCLCommand.SGP, gp_type, bank, value) for gp_type, (_, value) in diff.items()]
+        if store:
+            requests += [(TMCLCommand.STGP, gp_type, bank, 0) for gp_type in diff]
+        if requests:
+            self.connection.send_many(requests, self.module_id)
+        return diff
+
     def get_analog_input(self, x):
         """
         Gets the analog input value identified by index x.
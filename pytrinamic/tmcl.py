@@ -9,6 +9,15 @@
 import struct
 
 _PACKAGE_STRUCTURE = ">BBBBIB"
+_PACKAGE_STRUCT = struct.Struct(_PACKAGE_STRUCTURE)
+
+
+def _checksum(byte0, byte1, byte2, byte3, value):
+    """
+    TMCL checksum of a datagram, computed from its fields without encoding it.
+    """
+    return (byte0 + byte1 + byte2 + byte3
+            + (value >> 24) + ((value >> 16) & 0xFF) + ((value >> 8) & 0xFF) + (value & 0xFF)) & 0xFF
 
 
 class TMCL:
@@ -28,11 +37,7 @@ class TMCL:
 
     @staticmethod
     def calculate_checksum(data):
-        checksum = 0
-        for d in data:
-            checksum += d
-        checksum &= 0xFF
-        return checksum
+        return sum(data) & 0xFF
 
 
 class TMCLCommand:
@@ -124,7 +129,77 @@ class TMCLStatus:
     }
 
 
+class TMCLRetry:
+    """
+    Classes of TMCL requests by whether they can be sent again when their
+    reply was lost, see TMCLRetry.classify(). Ordered from unsafe to safe.
+        NEVER:  repeating changes the outcome, e.g. relative moves, program
+                and bootloader commands
+        MOTION: motion commands with an absolute target (ROR, ROL, absolute
+                MVP, ...). Repeating them is idempotent, but a repetition
+                arriving late could restart a motor stopped in the meantime,
+                so they are only retried on request.
+        WRITE:  idempotent writes (SAP, SGP, SIO, WRITE_MC, MST, ...)
+        READ:   requests without side effects (GAP, GGP, GIO, READ_MC, ...)
+    """
+    NEVER                       = 0
+    MOTION                      = 1
+    WRITE                       = 2
+    READ                        = 3
+
+    _COMMANDS = {
+        TMCLCommand.GAP: READ,
+        TMCLCommand.GGP: READ,
+        TMCLCommand.GIO: READ,
+        TMCLCommand.GCO: READ,
+        TMCLCommand.READ_MC: READ,
+        TMCLCommand.READ_DRV: READ,
+        TMCLCommand.READ_TMCL_MEMORY: READ,
+        TMCLCommand.GET_APPLICATION_STATUS: READ,
+        TMCLCommand.GET_FIRMWARE_VERSION: READ,
+        TMCLCommand.SAP: WRITE,
+        TMCLCommand.SGP: WRITE,
+        TMCLCommand.STAP: WRITE,
+        TMCLCommand.STGP: WRITE,
+        TMCLCommand.RSAP: WRITE,
+        TMCLCommand.RSGP: WRITE,
+        TMCLCommand.SIO: WRITE,
+        TMCLCommand.SCO: WRITE,
+        TMCLCommand.WRITE_MC: WRITE,
+        TMCLCommand.WRITE_DRV: WRITE,
+        TMCLCommand.MST: WRITE,
+        TMCLCommand.STOP_APPLICATION: WRITE,
+        TMCLCommand.ROR: MOTION,
+        TMCLCommand.ROL: MOTION,
+    }
+
+    @staticmethod
+    def classify(request):
+        """
+        Return the retry class of the TMCLRequest [request].
+        """
+        command = request.command
+        if command == TMCLCommand.MVP:
+            # Type 1 moves relative to the current position
+            return TMCLRetry.NEVER if request.commandType == 1 else TMCLRetry.MOTION
+        if command == TMCLCommand.RFS:
+            # Type 0 starts, 1 stops and 2 reads the state of the search
+            return {0: TMCLRetry.MOTION, 1: TMCLRetry.WRITE, 2: TMCLRetry.READ}.get(request.commandType, TMCLRetry.NEVER)
+        return TMCLRetry._COMMANDS.get(command, TMCLRetry.NEVER)
+
+    @staticmethod
+    def is_retryable(request, motion=False):
+        """
+        Return True if the TMCLRequest [request] can be sent again after its
+        reply was lost. Motion commands are only retryable with [motion] set.
+        """
+        retry = TMCLRetry.classify(request)
+        return retry >= TMCLRetry.WRITE or (motion and retry == TMCLRetry.MOTION)
+
+
 class TMCLRequest:
+    __slots__ = ("moduleAddress", "command", "commandType", "motorBank", "value", "checksum")
+
     def __init__(self, address, command, command_type, motor_bank, value, checksum=None):
         self.moduleAddress = address     & 0xFF
         self.command       = command     & 0xFF
@@ -137,17 +212,26 @@ class TMCLRequest:
             self.calculate_checksum()
 
     @staticmethod
-    def from_buffer(data):
-        request_struct = struct.unpack(_PACKAGE_STRUCTURE, data)
-        return TMCLRequest(request_struct[0], request_struct[1], request_struct[2], request_struct[3],
-                           request_struct[4], request_struct[5])
+    def from_buffer(data, offset=0):
+        """
+        Decode the 9 bytes at [offset] of [data] without copying them.
+        """
+        return TMCLRequest(*_PACKAGE_STRUCT.unpack_from(data, offset))
 
     def calculate_checksum(self):
-        self.checksum = TMCL.calculate_checksum(self.to_buffer()[:-1])
+        self.checksum = _checksum(self.moduleAddress, self.command, self.commandType, self.motorBank, self.value)
 
     def to_buffer(self):
-        return struct.pack(_PACKAGE_STRUCTURE, self.moduleAddress, self.command,
-                           self.commandType, self.motorBank, self.value, self.checksum)
+        return _PACKAGE_STRUCT.pack(self.moduleAddress, self.command,
+                                    self.commandType, self.motorBank, self.value, self.checksum)
+
+    def pack_into(self, buffer, offset=0):
+        """
+        Encode this request into the writable [buffer] at [offset], e.g. a
+        reused bytearray.
+        """
+        _PACKAGE_STRUCT.pack_into(buffer, offset, self.moduleAddress, self.command,
+                                  self.commandType, self.motorBank, self.value, self.checksum)
 
     def __str__(self):
         return "TMCL_Request: {0:02X},{1:02X},{2:02X},{3:02X},{4:08X},{5:02X}".format(
@@ -160,7 +244,38 @@ class TMCLRequest:
         )
 
 
+class TMCLPreparedRequest:
+    """
+    A TMCL request that is encoded once and sent repeatedly with
+    TmclInterface.send_prepared(), e.g. for polling a position.
+
+    The frame, including its checksum, is computed on construction. Create
+    instances with TmclInterface.prepare().
+    """
+    __slots__ = ("request", "frame")
+
+    def __init__(self, request):
+        self.request = request
+        self.frame = bytearray(request.to_buffer())
+
+    def set_value(self, value):
+        """
+        Change the value of the prepared request, e.g. for streaming velocity
+        set points. Only the value and the checksum of the frame are encoded
+        again.
+        """
+        request = self.request
+        request.value = value & 0xFFFFFFFF
+        request.calculate_checksum()
+        request.pack_into(self.frame)
+
+    def __str__(self):
+        return "Prepared " + str(self.request)
+
+
 class TMCLReply:
+    __slots__ = ("reply_address", "module_address", "status", "command", "value", "checksum", "special", "timestamp")
+
     def __init__(self, reply_address, module_address, status, command, value, checksum=None, special=False):
         self.reply_address  = reply_address  & 0xFF
         self.module_address = module_address & 0xFF
@@ -169,25 +284,35 @@ class TMCLReply:
         self.value          = value          & 0xFFFFFFFF
         self.checksum       = checksum if checksum else 0
         self.special        = special
+        # Receive time in seconds, if the interface provides it
+        self.timestamp      = None
 
         if checksum is None:
             self.calculate_checksum()
 
     @staticmethod
-    def from_buffer(data):
-        reply_struct = struct.unpack(_PACKAGE_STRUCTURE, data)
-        return TMCLReply(reply_struct[0], reply_struct[1], reply_struct[2], reply_struct[3],
-                         reply_struct[4], reply_struct[5])
+    def from_buffer(data, offset=0):
+        """
+        Decode the 9 bytes at [offset] of [data] without copying them.
+        """
+        return TMCLReply(*_PACKAGE_STRUCT.unpack_from(data, offset))
 
     def calculate_checksum(self):
-        self.checksum = TMCL.calculate_checksum(self.to_buffer()[:-1])
+        self.checksum = _checksum(self.reply_address, self.module_address, self.status, self.command, self.value)
 
     def is_checksum_correct(self):
-        return TMCL.calculate_checksum(self.to_buffer()[:-1]) == self.checksum
+        return _checksum(self.reply_address, self.module_address, self.status, self.command, self.value) == self.checksum
 
     def to_buffer(self):
-        return struct.pack(_PACKAGE_STRUCTURE, self.reply_address, self.module_address,
-                           self.status, self.command, self.value, self.checksum)
+        return _PACKAGE_STRUCT.pack(self.reply_address, self.module_address,
+                                    self.status, self.command, self.value, self.checksum)
+
+    def pack_into(self, buffer, offset=0):
+        """
+        Encode this reply into the writable [buffer] at [offset].
+        """
+        _PACKAGE_STRUCT.pack_into(buffer, offset, self.reply_address, self.module_address,
+                                  self.status, self.command, self.value, self.checksum)
 
     def __str__(self):
         return "TMCL_Reply:   {0:02X},{1:02X},{2:02X},{3:02X},{4:08X},{5:02X}".format(
@@ -199,9 +324,6 @@ class TMCLReply:
             self.checksum
         )
 
-    def value(self):
-        return self.value
-
     def is_valid(self):
         return self.status == TMCLStatus.SUCCESS
 
@@ -219,6 +341,13 @@ class TMCLReplyChecksumError(TMCLReplyError):
     pass
 
 
+class TMCLTimeoutError(RuntimeError):
+    """
+    No reply was received within the timeout of the interface.
+    """
+    pass
+
+
 class TMCLReplyStatusError(TMCLReplyError):
 
     def __get_status_code(self):
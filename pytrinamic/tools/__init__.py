@@ -1 +1,4 @@
 from .velocity_ramp_runner import VelocityRampRunner
+from .tmcl_emulator import TmclModuleEmulator, TmclEmulatorServer, TmclEmulatorUdpServer
+from .tmcl_recorder import TmclRecorder, read_capture
+from .profile import Profile, apply_profile
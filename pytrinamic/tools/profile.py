@@ -0,0 +1,268 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Configuration profiles for modules and evaluation boards
+
+A profile holds the desired configuration per module class, keyed by the class
+name, e.g. TMCM1240 or TMC5160_eval. Case, dashes and underscores of the class
+names are ignored. Parameters, registers and fields are given by the names of
+the AP, GP, REG and FIELD classes:
+
+    {
+        "TMCM1240": {
+            "axis_parameters": {"0": {"MaxVelocity": 51200, "MaxCurrent": 128}},
+            "global_parameters": {"0": {"SerialBaudRate": 7}},
+            "store": true
+        },
+        "TMC5160_eval": {
+            "registers": {"GCONF": 4},
+            "fields": {"TOFF": 3, "TBL": 2, "MRES": 4}
+        }
+    }
+
+Axis parameters are keyed by axis, global parameters by bank. The names of the
+global parameters of bank N are taken from the GPN class of the module, or
+from its GP class. With "store", changed axis and global parameters are also
+stored in the EEPROM. The same structure can be written as a TOML file, with
+tables like [TMCM1240.axis_parameters.0].
+
+Applying a profile, with one worker per bus:
+    profile = Profile.load("line.json")
+    apply_profile(modules, profile)
+"""
+
+import concurrent.futures
+import json
+
+
+class _ModuleProfile:
+    """
+    The entry of a profile for one module class, with all names resolved.
+    """
+
+    def __init__(self):
+        self.axis_parameters = dict()
+        self.global_parameters = dict()
+        self.registers = dict()
+        self.fields = []
+        self.store = False
+
+    def apply(self, module):
+        result = dict()
+        if self.axis_parameters:
+            result["axis_parameters"] = {axis: module.apply_axis_parameters(axis, parameters, self.store)
+                                         for axis, parameters in self.axis_parameters.items()}
+        if self.global_parameters:
+            result["global_parameters"] = {bank: module.apply_global_parameters(bank, parameters, self.store)
+                                           for bank, parameters in self.global_parameters.items()}
+        if self.registers or self.fields:
+            result["registers"] = module.apply_registers(self.registers, self.fields)
+        return result
+
+
+class Profile:
+    """
+    Desired configuration of modules and evaluation boards, see the module
+    documentation for the format.
+
+    Names are resolved against the classes of the first module of each class
+    and checked once, before anything is written.
+    """
+
+    SECTIONS = ("axis_parameters", "global_parameters", "registers", "fields", "store")
+
+    def __init__(self, entries):
+        """
+        Parameters:
+            entries:
+                Type: dict
+                The profile entries, keyed by module class name.
+        """
+        if not isinstance(entries, dict):
+            raise ValueError("A profile has to be a mapping of module class names to entries")
+        for class_name, entry in entries.items():
+            if not isinstance(entry, dict):
+                raise ValueError("The profile entry of {} has to be a mapping".format(class_name))
+            unknown = set(entry) - set(self.SECTIONS)
+            if unknown:
+                raise ValueError("Unknown sections in the profile entry of {}: {}".format(class_name, ", ".join(sorted(unknown))))
+        self.entries = entries
+        self._resolved = dict()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Load a profile from a JSON file, or from a TOML file if the name ends
+        with .toml (requires Python 3.11 or newer).
+        """
+        if str(path).endswith(".toml"):
+            try:
+                import tomllib
+            except ImportError:
+                raise RuntimeError("Reading TOML profiles requires Python 3.11 or newer") from None
+            with open(path, "rb") as f:
+                return cls(tomllib.load(f))
+        with open(path, "r", encoding="utf8") as f:
+            return cls(json.load(f))
+
+    def entry_name(self, module):
+        """
+        Return the name of the profile entry for [module], or None.
+        """
+        key = self._key(type(module).__name__)
+        for name in self.entries:
+            if self._key(name) == key:
+                return name
+        return None
+
+    @staticmethod
+    def _key(name):
+        return name.replace("-", "").replace("_", "").lower()
+
+    def resolve(self, module):
+        """
+        Return the resolved profile entry for the class of [module], or None if
+        the profile has no entry for it. Raises ValueError for unknown names
+        and invalid values.
+        """
+        module_class = type(module)
+        if module_class not in self._resolved:
+            name = self.entry_name(module)
+            self._resolved[module_class] = None if name is None else self._resolve(name, self.entries[name], module)
+        return self._resolved[module_class]
+
+    def _resolve(self, name, entry, module):
+        resolved = _ModuleProfile()
+        resolved.store = bool(entry.get("store", False))
+
+        for axis, parameters in self._numbered(name, "axis_parameters", entry).items():
+            if not hasattr(module, "apply_axis_parameters") or not 0 <= axis < len(module.motors):
+                raise ValueError("{} has no axis {}".format(name, axis))
+            ap = module.motors[axis].AP
+            resolved.axis_parameters[axis] = {
+                self._lookup(name, ap, parameter): self._value(name, parameter, value)
+                for parameter, value in parameters.items()
+            }
+
+        for bank, parameters in self._numbered(name, "global_parameters", entry).items():
+            gp = getattr(module, "GP{}".format(bank), None) or getattr(module, "GP", None)
+            if gp is None or not hasattr(module, "apply_global_parameters"):
+                raise ValueError("{} has no global parameters of bank {}".format(name, bank))
+            resolved.global_parameters[bank] = {
+                self._lookup(name, gp, parameter): self._value(name, parameter, value)
+                for parameter, value in parameters.items()
+            }
+
+        registers = entry.get("registers", {})
+        fields = entry.get("fields", {})
+        if registers or fields:
+            if not hasattr(module, "apply_registers"):
+                raise ValueError("{} has no register access".format(name))
+            ics = getattr(module, "ics", [])
+            for register, value in registers.items():
+                address = self._lookup(name, [ic.REG for ic in ics if hasattr(ic, "REG")], register)
+                resolved.registers[address] = self._value(name, register, value)
+            for field_name, value in fields.items():
+                field = self._lookup(name, [ic.FIELD for ic in ics if hasattr(ic, "FIELD")], field_name)
+                if isinstance(field, list):
+                    raise ValueError("{}: {} is a field of several axes, use the field of one axis".format(name, field_name))
+                value = self._value(name, field_name, value)
+                width = field[1] >> field[2]
+                if not -(width + 1) // 2 <= value <= width:
+                    raise ValueError("{}: {} does not fit into the field {}".format(name, value, field_name))
+                resolved.fields.append((field, value))
+        return resolved
+
+    @staticmethod
+    def _numbered(name, section, entry):
+        """
+        Return the axis or bank keyed mapping of a section with int keys.
+        """
+        numbered = dict()
+        for key, parameters in entry.get(section, {}).items():
+            try:
+                number = int(key)
+            except ValueError:
+                raise ValueError("{}: {} has to be keyed by number, not {!r}".format(name, section, key)) from None
+            if not isinstance(parameters, dict):
+                raise ValueError("{}: {} {} has to be a mapping of names to values".format(name, section, key))
+            numbered[number] = parameters
+        return numbered
+
+    @staticmethod
+    def _lookup(name, classes, attribute):
+        if not isinstance(classes, list):
+            classes = [classes]
+        for cls in classes:
+            if not attribute.startswith("_") and hasattr(cls, attribute):
+                return getattr(cls, attribute)
+        raise ValueError("{}: unknown name {}".format(name, attribute))
+
+    @staticmethod
+    def _value(name, attribute, value):
+        if isinstance(value, bool) or not isinstance(value, int):
+            raise ValueError("{}: the value of {} has to be an integer, not {!r}".format(name, attribute, value))
+        if not -0x80000000 <= value <= 0xFFFFFFFF:
+            raise ValueError("{}: the value of {} does not fit into 32 bit".format(name, attribute))
+        return value
+
+
+def _bus(module):
+    # Modules keep their interface in connection, evaluation boards in _connection
+    connection = getattr(module, "connection", None)
+    return connection if connection is not None else getattr(module, "_connection", None)
+
+
+def apply_profile(modules, profile):
+    """
+    Apply a profile to many modules and evaluation boards, writing only the
+    values that differ from the values on each module (see
+    TMCLModule.apply_axis_parameters() and TMCLEval.apply_registers()).
+
+    All names are resolved and checked before anything is written. The
+    modules of each bus, i.e. interface, are configured one after another by
+    one worker thread per bus, so modules on different buses are configured
+    concurrently.
+
+    Parameters:
+        modules:
+            Type: iterable
+            The module and evaluation board instances.
+        profile:
+            Type: Profile or dict
+            The profile, or its entries.
+
+    Returns: A list with one dict of the differences found per module, in the
+    order of [modules].
+    """
+    if not isinstance(profile, Profile):
+        profile = Profile(profile)
+    modules = list(modules)
+
+    resolved = []
+    for module in modules:
+        entry = profile.resolve(module)
+        if entry is None:
+            raise ValueError("The profile has no entry for {}".format(type(module).__name__))
+        resolved.append(entry)
+
+    buses = dict()
+    for index, module in enumerate(modules):
+        buses.setdefault(id(_bus(module)), []).append(index)
+
+    results = [None] * len(modules)
+
+    def configure(indices):
+        for index in indices:
+            results[index] = resolved[index].apply(modules[index])
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(len(buses), 1)) as executor:
+        futures = [executor.submit(configure, indices) for indices in buses.values()]
+    for future in futures:
+        future.result()
+    return results
@@ -0,0 +1,686 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Emulator of TMCL modules for testing and benchmarking without hardware
+
+TmclModuleEmulator models a stepper module: axis and global parameters
+(including STAP/RSAP storage), MC/DRV register banks, IOs, RAMDebug captures and
+the ramp motion of the axes. Use it in-process with EmulatorTmclInterface
+(interface "emulator_tmcl" of the ConnectionManager) or serve it over TCP for
+SocketTmclInterface or over UDP for UdpTmclInterface:
+
+    python -m pytrinamic.tools.tmcl_emulator --listen 127.0.0.1:2323 --modules 1 2 --latency-ms 1
+    python -m pytrinamic.tools.tmcl_emulator --udp --listen 127.0.0.1:2323 --loss 0.01
+
+The axis parameter numbers follow the TMCM stepper modules: 0 TargetPosition,
+1 ActualPosition, 2 TargetVelocity, 3 ActualVelocity, 4 MaxVelocity,
+5 MaxAcceleration and 8 PositionReachedFlag. Velocities are in pps.
+"""
+
+import argparse
+import copy
+import math
+import random
+import socket
+import socketserver
+import threading
+import time
+from collections import deque
+
+from ..helpers import to_signed_32
+from ..tmcl import TMCLCommand, TMCLRequest, TMCLReply, TMCLStatus
+from ..RAMDebug import RAMDebug_Channel, RAMDebug_Command, RAMDebug_Info, RAMDebug_State
+
+
+class _Axis:
+    """
+    Motion state of one emulated axis, advanced lazily in time.
+    """
+    # Integration step of the ramp in seconds
+    STEP = 0.001
+
+    def __init__(self):
+        self.position = 0.0
+        self.velocity = 0.0
+        self.target_position = 0
+        self.target_velocity = 0
+        self.position_mode = False
+        self.max_velocity = 51200
+        self.max_acceleration = 51200
+
+    def position_reached(self):
+        return self.position_mode and self.velocity == 0 and self.position == self.target_position
+
+    def advance(self, dt):
+        while dt > 0:
+            if self.position_mode:
+                dt = self._advance_position(dt)
+            else:
+                dt = self._advance_velocity(dt)
+
+    def _accelerate(self, goal, dt):
+        """
+        Change the velocity towards [goal] for [dt] seconds, keeping the
+        velocity once [goal] is reached.
+        """
+        difference = goal - self.velocity
+        reach = abs(difference) / self.max_acceleration if self.max_acceleration > 0 else 0
+        if reach >= dt:
+            velocity = self.velocity + math.copysign(self.max_acceleration * dt, difference)
+            self.position += (self.velocity + velocity) / 2 * dt
+            self.velocity = velocity
+        else:
+            self.position += (self.velocity + goal) / 2 * reach + goal * (dt - reach)
+            self.velocity = goal
+
+    def _advance_velocity(self, dt):
+        goal = max(-self.max_velocity, min(self.max_velocity, self.target_velocity))
+        self._accelerate(goal, dt)
+        return 0
+
+    def _advance_position(self, dt):
+        distance = self.target_position - self.position
+        if self.velocity == 0 and abs(distance) < 0.5:
+            self.position = self.target_position
+            return 0
+
+        # Fastest velocity that still allows stopping at the target
+        goal = math.copysign(min(self.max_velocity, math.sqrt(2 * max(self.max_acceleration, 0) * abs(distance))), distance)
+        if self.max_acceleration <= 0:
+            goal = math.copysign(self.max_velocity, distance)
+        step = min(dt, self.STEP)
+        self._accelerate(goal, step)
+
+        remaining = self.target_position - self.position
+        if remaining == 0 or math.copysign(1, remaining) != math.copysign(1, distance) or abs(remaining) < 0.5 and abs(self.velocity) <= self.max_acceleration * self.STEP:
+            self.position = self.target_position
+            self.velocity = 0
+            return 0
+        return dt - step
+
+
+class TmclModuleEmulator:
+    """
+    Stateful emulation of a TMCL stepper module.
+
+    Requests are handled with handle_request() or, for raw datagrams,
+    handle_frame(). Time is taken from [clock], which can be replaced to
+    simulate the motion deterministically.
+    """
+
+    AP_TARGET_POSITION       = 0
+    AP_ACTUAL_POSITION       = 1
+    AP_TARGET_VELOCITY       = 2
+    AP_ACTUAL_VELOCITY       = 3
+    AP_MAX_VELOCITY          = 4
+    AP_MAX_ACCELERATION      = 5
+    AP_POSITION_REACHED_FLAG = 8
+
+    RAMDEBUG_MAX_CHANNELS       = 4
+    RAMDEBUG_BUFFER_ELEMENTS    = 8192
+    RAMDEBUG_SAMPLING_FREQUENCY = 10000
+
+    def __init__(self, module_id=1, host_id=2, axes=1, firmware_version="1240V310", clock=time.monotonic):
+        """
+        Parameters:
+            module_id:
+                The TMCL module address the emulator answers to.
+            host_id:
+                The reply address of the replies.
+            axes:
+                The number of motor axes.
+            firmware_version:
+                The 8 character version string, e.g. "1240V310" for a TMCM-1240
+                with firmware 3.10.
+            clock:
+                Function returning the current time in seconds.
+        """
+        if len(firmware_version) != 8:
+            raise ValueError("The firmware version must have 8 characters")
+
+        self.module_id = module_id
+        self.host_id = host_id
+        self.firmware_version = firmware_version
+        self.clock = clock
+
+        self.axes = [_Axis() for _ in range(axes)]
+        self.axis_parameters = [{} for _ in range(axes)]
+        self.stored_axis_parameters = [{} for _ in range(axes)]
+        # {bank: {parameter: value}}
+        self.global_parameters = {}
+        self.stored_global_parameters = {}
+        # {(channel, address): value}
+        self.mc_registers = {}
+        self.drv_registers = {}
+        self.digital_outputs = {}
+        self.digital_inputs = {}
+        self.analog_inputs = {}
+
+        self._timestamp = clock()
+        self._lock = threading.Lock()
+        self._handlers = {
+            TMCLCommand.ROR: self._rotate,
+            TMCLCommand.ROL: self._rotate,
+            TMCLCommand.MST: self._rotate,
+            TMCLCommand.MVP: self._move,
+            TMCLCommand.SAP: self._set_axis_parameter,
+            TMCLCommand.GAP: self._get_axis_parameter,
+            TMCLCommand.STAP: self._store_axis_parameter,
+            TMCLCommand.RSAP: self._restore_axis_parameter,
+            TMCLCommand.SGP: self._set_global_parameter,
+            TMCLCommand.GGP: self._get_global_parameter,
+            TMCLCommand.STGP: self._store_global_parameter,
+            TMCLCommand.RSGP: self._restore_global_parameter,
+            TMCLCommand.SIO: self._set_output,
+            TMCLCommand.GIO: self._get_io,
+            TMCLCommand.WRITE_MC: self._write_register,
+            TMCLCommand.READ_MC: self._read_register,
+            TMCLCommand.WRITE_DRV: self._write_register,
+            TMCLCommand.READ_DRV: self._read_register,
+            TMCLCommand.GET_FIRMWARE_VERSION: self._get_firmware_version,
+            TMCLCommand.RAMDEBUG: self._ramdebug,
+        }
+        self._ramdebug_init()
+
+    def handle_frame(self, data):
+        """
+        Handle the 9 byte TMCL datagram [data] and return the 9 byte reply, or
+        None if the datagram is not addressed to this module or is the boot
+        command, which is not answered.
+        """
+        request = TMCLRequest.from_buffer(data)
+        if request.moduleAddress != self.module_id or request.command == TMCLCommand.BOOT:
+            return None
+
+        if sum(data[:8]) & 0xFF != request.checksum:
+            return TMCLReply(self.host_id, self.module_id, TMCLStatus.WRONG_CHECKSUM, request.command, 0).to_buffer()
+
+        if request.command == TMCLCommand.GET_FIRMWARE_VERSION and request.commandType == 0:
+            # The ASCII version string replaces all bytes after the reply address
+            return bytes([self.host_id]) + self.firmware_version.encode("ascii")
+
+        return self.handle_request(request).to_buffer()
+
+    def handle_request(self, request):
+        """
+        Handle a TMCLRequest and return the TMCLReply.
+        """
+        handler = self._handlers.get(request.command)
+        if handler is None:
+            status, value = TMCLStatus.INVALID_COMMAND, 0
+        else:
+            with self._lock:
+                self._update()
+                status, value = handler(request)
+
+        return TMCLReply(self.host_id, self.module_id, status, request.command, value)
+
+    def _update(self):
+        now = self.clock()
+        if now > self._timestamp:
+            for axis in self.axes:
+                axis.advance(now - self._timestamp)
+        self._timestamp = now
+
+    def _axis(self, request):
+        if request.motorBank >= len(self.axes):
+            return None
+        return self.axes[request.motorBank]
+
+    # Motion
+    def _rotate(self, request):
+        axis = self._axis(request)
+        if axis is None:
+            return TMCLStatus.INVALID_VALUE, 0
+        velocity = to_signed_32(request.value)
+        axis.position_mode = False
+        axis.target_velocity = {TMCLCommand.ROR: velocity, TMCLCommand.ROL: -velocity}.get(request.command, 0)
+        return TMCLStatus.SUCCESS, request.value
+
+    def _move(self, request):
+        axis = self._axis(request)
+        if axis is None:
+            return TMCLStatus.INVALID_VALUE, 0
+        if request.commandType == 0:
+            target = to_signed_32(request.value)
+        elif request.commandType == 1:
+            target = axis.target_position + to_signed_32(request.value)
+        else:
+            return TMCLStatus.WRONG_TYPE, 0
+        axis.target_position = target
+        axis.position_mode = True
+        return TMCLStatus.SUCCESS, target
+
+    # Axis parameters
+    def _read_axis_parameter(self, axis_index, parameter):
+        axis = self.axes[axis_index]
+        if parameter == self.AP_TARGET_POSITION:
+            return axis.target_position
+        if parameter == self.AP_ACTUAL_POSITION:
+            return int(round(axis.position))
+        if parameter == self.AP_TARGET_VELOCITY:
+            return axis.target_velocity
+        if parameter == self.AP_ACTUAL_VELOCITY:
+            return int(axis.velocity)
+        if parameter == self.AP_MAX_VELOCITY:
+            return axis.max_velocity
+        if parameter == self.AP_MAX_ACCELERATION:
+            return axis.max_acceleration
+        if parameter == self.AP_POSITION_REACHED_FLAG:
+            return int(axis.position_reached())
+        return self.axis_parameters[axis_index].get(parameter, 0)
+
+    def _write_axis_parameter(self, axis_index, parameter, value):
+        axis = self.axes[axis_index]
+        value = to_signed_32(value)
+        if parameter == self.AP_TARGET_POSITION:
+            axis.target_position = value
+            axis.position_mode = True
+        elif parameter == self.AP_ACTUAL_POSITION:
+            axis.position = float(value)
+        elif parameter == self.AP_TARGET_VELOCITY:
+            axis.target_velocity = value
+            axis.position_mode = False
+        elif parameter == self.AP_MAX_VELOCITY:
+            axis.max_velocity = abs(value)
+        elif parameter == self.AP_MAX_ACCELERATION:
+            axis.max_acceleration = abs(value)
+        elif parameter not in (self.AP_ACTUAL_VELOCITY, self.AP_POSITION_REACHED_FLAG):
+            self.axis_parameters[axis_index][parameter] = value
+
+    def _set_axis_parameter(self, request):
+        if self._axis(request) is None:
+            return TMCLStatus.INVALID_VALUE, 0
+        self._write_axis_parameter(request.motorBank, request.commandType, request.value)
+        return TMCLStatus.SUCCESS, request.value
+
+    def _get_axis_parameter(self, request):
+        if self._axis(request) is None:
+            return TMCLStatus.INVALID_VALUE, 0
+        return TMCLStatus.SUCCESS, self._read_axis_parameter(request.motorBank, request.commandType)
+
+    def _store_axis_parameter(self, request):
+        if self._axis(request) is None:
+            return TMCLStatus.INVALID_VALUE, 0
+        value = self._read_axis_parameter(request.motorBank, request.commandType)
+        self.stored_axis_parameters[request.motorBank][request.commandType] = value
+        return TMCLStatus.SUCCESS, 0
+
+    def _restore_axis_parameter(self, request):
+        if self._axis(request) is None:
+            return TMCLStatus.INVALID_VALUE, 0
+        stored = self.stored_axis_parameters[request.motorBank]
+        if request.commandType in stored:
+            self._write_axis_parameter(request.motorBank, request.commandType, stored[request.commandType])
+        return TMCLStatus.SUCCESS, 0
+
+    # Global parameters
+    def _set_global_parameter(self, request):
+        self.global_parameters.setdefault(request.motorBank, {})[request.commandType] = request.value
+        return TMCLStatus.SUCCESS, request.value
+
+    def _get_global_parameter(self, request):
+        return TMCLStatus.SUCCESS, self.global_parameters.get(request.motorBank, {}).get(request.commandType, 0)
+
+    def _store_global_parameter(self, request):
+        value = self.global_parameters.get(request.motorBank, {}).get(request.commandType, 0)
+        self.stored_global_parameters.setdefault(request.motorBank, {})[request.commandType] = value
+        return TMCLStatus.SUCCESS, 0
+
+    def _restore_global_parameter(self, request):
+        stored = self.stored_global_parameters.get(request.motorBank, {})
+        if request.commandType in stored:
+            self.global_parameters.setdefault(request.motorBank, {})[request.commandType] = stored[request.commandType]
+        return TMCLStatus.SUCCESS, 0
+
+    # IOs
+    def _set_output(self, request):
+        self.digital_outputs[request.commandType] = request.value & 1
+        return TMCLStatus.SUCCESS, request.value
+
+    def _get_io(self, request):
+        # The bank selects digital inputs (0), analog inputs (1) or digital outputs (2)
+        bank = {0: self.digital_inputs, 1: self.analog_inputs, 2: self.digital_outputs}.get(request.motorBank)
+        if bank is None:
+            return TMCLStatus.INVALID_VALUE, 0
+        return TMCLStatus.SUCCESS, bank.get(request.commandType, 0)
+
+    # Registers
+    def _register_key(self, request):
+        # The upper nibble of the motor/bank byte extends the register address
+        return request.motorBank & 0x0F, request.commandType | ((request.motorBank & 0xF0) << 4)
+
+    def _registers(self, request):
+        if request.command in (TMCLCommand.WRITE_MC, TMCLCommand.READ_MC):
+            return self.mc_registers
+        return self.drv_registers
+
+    def _write_register(self, request):
+        self._registers(request)[self._register_key(request)] = request.value
+        return TMCLStatus.SUCCESS, request.value
+
+    def _read_register(self, request):
+        return TMCLStatus.SUCCESS, self._registers(request).get(self._register_key(request), 0)
+
+    def _get_firmware_version(self, request):
+        if request.commandType != 1:
+            return TMCLStatus.WRONG_TYPE, 0
+        # Binary format: module type, major and minor version
+        module, _, version = self.firmware_version.partition("V")
+        return TMCLStatus.SUCCESS, (int(module) << 16) | (int(version[0]) << 8) | int(version[1:])
+
+    # RAMDebug
+    def _ramdebug_init(self):
+        self._ramdebug_state = RAMDebug_State.IDLE
+        self._ramdebug_sample_count = self.RAMDEBUG_BUFFER_ELEMENTS
+        self._ramdebug_prescaler = 0
+        self._ramdebug_channels = []
+        self._ramdebug_samples = []
+        self._ramdebug_end = 0
+
+    def _ramdebug(self, request):
+        command = request.commandType
+        value = request.value
+        if command == RAMDebug_Command.INIT:
+            self._ramdebug_init()
+        elif command == RAMDebug_Command.SET_SAMPLE_COUNT:
+            if value > self.RAMDEBUG_BUFFER_ELEMENTS:
+                return TMCLStatus.INVALID_VALUE, 0
+            self._ramdebug_sample_count = value
+        elif command == RAMDebug_Command.SET_PRESCALER:
+            self._ramdebug_prescaler = value
+        elif command == RAMDebug_Command.SET_CHANNEL:
+            if len(self._ramdebug_channels) >= self.RAMDEBUG_MAX_CHANNELS:
+                return TMCLStatus.INVALID_VALUE, 0
+            self._ramdebug_channels.append((request.motorBank, value))
+        elif command in (RAMDebug_Command.SET_SHIFT_MASK, RAMDebug_Command.SET_PRETRIGGER_SAMPLE_COUNT,
+                         RAMDebug_Command.SET_TRIGGER_CHANNEL, RAMDebug_Command.SET_PROCESS_FREQUENCY):
+            # Accepted, but the emulated capture always triggers immediately
+            pass
+        elif command == RAMDebug_Command.ENABLE_TRIGGER:
+            self._ramdebug_capture()
+        elif command == RAMDebug_Command.GET_STATE:
+            if self._ramdebug_state == RAMDebug_State.CAPTURE and self.clock() >= self._ramdebug_end:
+                self._ramdebug_state = RAMDebug_State.COMPLETE
+            return TMCLStatus.SUCCESS, self._ramdebug_state
+        elif command == RAMDebug_Command.GET_SAMPLE:
+            if self._ramdebug_state != RAMDebug_State.COMPLETE or value >= len(self._ramdebug_samples):
+                return TMCLStatus.INVALID_VALUE, 0
+            return TMCLStatus.SUCCESS, self._ramdebug_samples[value]
+        elif command == RAMDebug_Command.GET_INFO:
+            info = {
+                RAMDebug_Info.INFO_MAX_CHANNELS: self.RAMDEBUG_MAX_CHANNELS,
+                RAMDebug_Info.INFO_BUFFER_ELEMENTS: self.RAMDEBUG_BUFFER_ELEMENTS,
+                RAMDebug_Info.INFO_SAMPLING_FREQUENCY: self.RAMDEBUG_SAMPLING_FREQUENCY,
+                RAMDebug_Info.INFO_CAPTURED_SAMPLES: len(self._ramdebug_samples),
+            }
+            if value not in info:
+                return TMCLStatus.INVALID_VALUE, 0
+            return TMCLStatus.SUCCESS, info[value]
+        elif command in (RAMDebug_Command.GET_CHANNEL_TYPE, RAMDebug_Command.GET_CHANNEL_ADDRESS):
+            if value >= len(self._ramdebug_channels):
+                return TMCLStatus.INVALID_VALUE, 0
+            return TMCLStatus.SUCCESS, self._ramdebug_channels[value][command == RAMDebug_Command.GET_CHANNEL_ADDRESS]
+        else:
+            return TMCLStatus.WRONG_TYPE, 0
+
+        return TMCLStatus.SUCCESS, 0
+
+    def _ramdebug_capture(self):
+        """
+        Capture all samples at once by simulating a copy of the axes forward.
+        The state changes to COMPLETE once the capture time has passed.
+        """
+        channel_count = len(self._ramdebug_channels)
+        period = (self._ramdebug_prescaler + 1) / self.RAMDEBUG_SAMPLING_FREQUENCY
+        samples_per_channel = self._ramdebug_sample_count // channel_count if channel_count else 0
+
+        axes = copy.deepcopy(self.axes)
+        self._ramdebug_samples = []
+        for i in range(samples_per_channel):
+            for channel_type, channel_value in self._ramdebug_channels:
+                self._ramdebug_samples.append(self._ramdebug_sample(axes, channel_type, channel_value, i * period) & 0xFFFFFFFF)
+            for axis in axes:
+                axis.advance(period)
+
+        self._ramdebug_state = RAMDebug_State.CAPTURE
+        self._ramdebug_end = self.clock() + samples_per_channel * period
+
+    def _ramdebug_sample(self, axes, channel_type, channel_value, time_offset):
+        motor = channel_value >> 24
+        if channel_type == RAMDebug_Channel.CHANNEL_AXIS_PARAMETER:
+            if motor >= len(axes):
+                return 0
+            live_axes, self.axes = self.axes, axes
+            try:
+                return self._read_axis_parameter(motor, channel_value & 0xFF)
+            finally:
+                self.axes = live_axes
+        if channel_type == RAMDebug_Channel.CHANNEL_REGISTER:
+            registers = self.drv_registers if channel_value & 0x0001_0000 else self.mc_registers
+            return registers.get((motor, channel_value & 0xFFFF), 0)
+        if channel_type == RAMDebug_Channel.CHANNEL_SYSTICK:
+            return int((self._timestamp + time_offset) * 1000)
+        if channel_type == RAMDebug_Channel.CHANNEL_ANALOG_INPUT:
+            return self.analog_inputs.get(channel_value, 0)
+        return 0
+
+
+class _EmulatorHandler(socketserver.BaseRequestHandler):
+    """
+    Serves one client connection. Replies are sent in request order, each
+    delayed by the latency of the server.
+    """
+
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._replies = deque()
+        self._condition = threading.Condition()
+
+    def handle(self):
+        server = self.server
+        writer = threading.Thread(target=self._write_replies, daemon=True)
+        writer.start()
+
+        frame = bytearray(9)
+        view = memoryview(frame)
+        try:
+            while True:
+                received = 0
+                while received < 9:
+                    count = self.request.recv_into(view[received:])
+                    if count == 0:
+                        return
+                    received += count
+
+                reply = server.handle_frame(frame)
+                if reply is None:
+                    # No module with this address, the client runs into its timeout
+                    continue
+                with self._condition:
+                    self._replies.append((time.perf_counter() + server.latency_s, reply))
+                    self._condition.notify()
+        except OSError:
+            pass
+        finally:
+            with self._condition:
+                self._replies.append(None)
+                self._condition.notify()
+            writer.join()
+
+    def _write_replies(self):
+        while True:
+            with self._condition:
+                while not self._replies:
+                    self._condition.wait()
+                entry = self._replies.popleft()
+            if entry is None:
+                return
+            due, reply = entry
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            try:
+                self.request.sendall(reply)
+            except OSError:
+                return
+
+
+class _EmulatorServerMixin:
+    """
+    Module table, background thread and bus access shared by the TCP and UDP
+    emulator servers.
+    """
+
+    def _init_emulator(self, modules, latency_s, service_time_s):
+        if isinstance(modules, TmclModuleEmulator):
+            modules = [modules]
+        self.modules = {module.module_id: module for module in modules}
+        self.latency_s = latency_s
+        self.service_time_s = service_time_s
+        self._bus_lock = threading.Lock()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        del exit_type, value, traceback
+        self.close()
+
+    @property
+    def address(self):
+        """
+        The "ip:port" string to pass to SocketTmclInterface or UdpTmclInterface.
+        """
+        return "{}:{}".format(*self.server_address[:2])
+
+    def start(self):
+        """
+        Serve clients in a background thread.
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name=self.__class__.__name__, daemon=True)
+        self._thread.start()
+
+    def close(self):
+        if self._thread:
+            self.shutdown()
+            self._thread = None
+        self.server_close()
+
+    def handle_frame(self, frame):
+        module = self.modules.get(frame[0])
+        if module is None:
+            return None
+        with self._bus_lock:
+            if self.service_time_s:
+                time.sleep(self.service_time_s)
+            return module.handle_frame(frame)
+
+
+class TmclEmulatorServer(_EmulatorServerMixin, socketserver.ThreadingTCPServer):
+    """
+    TCP server answering TMCL datagrams with one or more TmclModuleEmulators,
+    e.g. for connecting with SocketTmclInterface.
+
+    latency_s delays every reply without blocking other requests, like a
+    network round trip. service_time_s is the time the emulated bus is busy per
+    request, so requests of all clients are handled one after another.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, modules, address=("127.0.0.1", 0), latency_s=0, service_time_s=0):
+        self._init_emulator(modules, latency_s, service_time_s)
+        super().__init__(address, _EmulatorHandler)
+
+
+class _EmulatorUdpHandler(socketserver.BaseRequestHandler):
+    """
+    Answers the TMCL frames of one datagram with one datagram holding all
+    replies, like an Ethernet-to-serial converter in UDP mode.
+    """
+
+    def handle(self):
+        server = self.server
+        data, connection = self.request
+        if server.loss and server.rng.random() < server.loss:
+            return
+
+        replies = bytearray()
+        for offset in range(0, len(data) - 8, 9):
+            reply = server.handle_frame(data[offset:offset + 9])
+            # No module with this address, the client runs into its timeout
+            if reply is not None:
+                replies += reply
+        if not replies:
+            return
+
+        if server.latency_s:
+            time.sleep(server.latency_s)
+        if server.loss and server.rng.random() < server.loss:
+            return
+        connection.sendto(replies, self.client_address)
+
+
+class TmclEmulatorUdpServer(_EmulatorServerMixin, socketserver.UDPServer):
+    """
+    UDP server answering TMCL datagrams with one or more TmclModuleEmulators,
+    e.g. for connecting with UdpTmclInterface.
+
+    Datagrams are handled one after another. latency_s delays every reply
+    datagram. loss is the probability of dropping a request datagram and,
+    independently, its reply datagram, drawn from the random.Random [rng].
+    """
+    allow_reuse_address = True
+
+    def __init__(self, modules, address=("127.0.0.1", 0), latency_s=0, service_time_s=0, loss=0.0, rng=None):
+        self._init_emulator(modules, latency_s, service_time_s)
+        self.loss = loss
+        self.rng = rng or random.Random()
+        super().__init__(address, _EmulatorUdpHandler)
+
+
+def _parse_address(address):
+    host, _, port = address.rpartition(":")
+    try:
+        return host or "127.0.0.1", int(port)
+    except ValueError:
+        raise argparse.ArgumentTypeError("Expected host:port, got " + address)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--listen", type=_parse_address, default=("127.0.0.1", 2323), metavar="HOST:PORT",
+                        help="address to listen on (default: 127.0.0.1:2323)")
+    parser.add_argument("--udp", action="store_true", help="serve UdpTmclInterface instead of SocketTmclInterface")
+    parser.add_argument("--loss", type=float, default=0, help="UDP datagram loss probability (default: %(default)s)")
+    parser.add_argument("--modules", type=int, nargs="+", default=[1], metavar="ID",
+                        help="module IDs to emulate (default: 1)")
+    parser.add_argument("--axes", type=int, default=1, help="axes per module (default: %(default)s)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="reply delay (default: %(default)s)")
+    parser.add_argument("--service-time-ms", type=float, default=0, help="bus time per request (default: %(default)s)")
+    args = parser.parse_args()
+
+    modules = [TmclModuleEmulator(module_id, axes=args.axes) for module_id in args.modules]
+    if args.udp:
+        server = TmclEmulatorUdpServer(modules, args.listen, args.latency_ms / 1000, args.service_time_ms / 1000, args.loss)
+    else:
+        server = TmclEmulatorServer(modules, args.listen, args.latency_ms / 1000, args.service_time_ms / 1000)
+    with server:
+        print("Emulating modules {} on {} ({})".format(args.modules, server.address, "UDP" if args.udp else "TCP"))
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Binary capture of the TMCL traffic of an interface
+
+A capture file is a plain sequence of fixed size records of 26 bytes, without
+a header, so a file can be appended to, truncated after a crash and mapped
+into memory as an array:
+    request         9 bytes, the TMCL request frame as sent
+    reply           9 bytes, the TMCL reply frame as received
+    timestamp_ns    8 bytes, little endian, time.monotonic_ns() when the
+                    reply was received
+
+Recording a capture:
+    with TmclRecorder(interface, "capture.tmcl"):
+        ...
+
+Reading a capture with numpy:
+    records = read_capture("capture.tmcl")
+    polls = records[records["command"] == TMCLCommand.GAP]
+
+Replaying a capture, see pytrinamic.connections.ReplayTmclInterface:
+    interface = ReplayTmclInterface("capture.tmcl")
+"""
+
+import os
+import struct
+import time
+
+# Layout of one capture record
+RECORD = struct.Struct("<9s9sQ")
+RECORD_SIZE = RECORD.size
+
+# numpy dtype of the raw records, e.g. for numpy.memmap()
+RAW_DTYPE = [("request", "u1", 9), ("reply", "u1", 9), ("timestamp_ns", "<u8")]
+
+# numpy dtype of the records returned by read_capture()
+CAPTURE_DTYPE = [
+    ("timestamp_ns", "<u8"),
+    ("module_id", "u1"),
+    ("command", "u1"),
+    ("type", "u1"),
+    ("motor", "u1"),
+    ("value", "<i4"),
+    ("reply_address", "u1"),
+    ("status", "u1"),
+    ("reply_value", "<i4"),
+    ("checksum_ok", "?"),
+]
+
+
+class TmclRecorder:
+    """
+    Records every request/reply pair of a TmclInterface into a capture file,
+    see the module documentation for the format.
+
+    The recorder is attached as the tap of the interface (see
+    TmclInterface.set_tap()), which sees the raw frames of all checked
+    replies, including error replies. Requests without a reply (timeouts,
+    send_boot()) are not recorded.
+    """
+
+    def __init__(self, interface, path, buffer_size=65536):
+        """
+        Parameters:
+            interface:
+                Type: TmclInterface
+                The interface to record.
+            path:
+                Type: str
+                The capture file. Records are appended to an existing file.
+            buffer_size:
+                Type: int, optional, default value: 65536
+                The size of the write buffer in bytes. Records are written to
+                the file when the buffer is full, on flush() and on close().
+        """
+        self.records = 0
+        self._interface = interface
+        self._file = open(path, "ab", buffering=buffer_size)
+        self._pack = RECORD.pack
+        interface.set_tap(self._record)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exit_type, value, traceback):
+        del exit_type, value, traceback
+        self.close()
+
+    def _record(self, request, data):
+        self._file.write(self._pack(request.to_buffer(), bytes(data), time.monotonic_ns()))
+        self.records += 1
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        """
+        Detach from the interface and close the capture file.
+        """
+        if self._file.closed:
+            return
+        self._interface.set_tap(None)
+        self._file.close()
+
+
+def iter_capture(path):
+    """
+    Iterate over the records of a capture file as
+    (request, reply, timestamp_ns) tuples of two 9 byte bytes objects and an
+    int, without numpy. An incomplete last record is ignored.
+    """
+    with open(path, "rb") as capture:
+        while True:
+            record = capture.read(RECORD_SIZE)
+            if len(record) < RECORD_SIZE:
+                return
+            yield RECORD.unpack(record)
+
+
+def read_raw_capture(path):
+    """
+    Map a capture file into memory as a numpy structured array of RAW_DTYPE.
+    An incomplete last record is ignored.
+    """
+    import numpy as np
+
+    count = os.path.getsize(path) // RECORD_SIZE
+    if count == 0:
+        return np.zeros(0, dtype=RAW_DTYPE)
+    return np.memmap(path, dtype=RAW_DTYPE, mode="r", shape=(count,))
+
+
+def read_capture(path):
+    """
+    Read a capture file into a numpy structured array of CAPTURE_DTYPE with
+    the decoded fields of the requests and replies.
+    """
+    import numpy as np
+
+    raw = read_raw_capture(path)
+    records = np.zeros(len(raw), dtype=CAPTURE_DTYPE)
+    if len(raw) == 0:
+        return records
+
+    request = np.asarray(raw["request"])
+    reply = np.asarray(raw["reply"])
+    records["timestamp_ns"] = raw["timestamp_ns"]
+    records["module_id"] = request[:, 0]
+    records["command"] = request[:, 1]
+    records["type"] = request[:, 2]
+    records["motor"] = request[:, 3]
+    records["value"] = np.ascontiguousarray(request[:, 4:8]).view(">i4")[:, 0]
+    records["reply_address"] = reply[:, 0]
+    records["status"] = reply[:, 2]
+    records["reply_value"] = np.ascontiguousarray(reply[:, 4:8]).view(">i4")[:, 0]
+    records["checksum_ok"] = (reply[:, :8].sum(axis=1, dtype=np.uint32) & 0xFF) == reply[:, 8]
+    return records
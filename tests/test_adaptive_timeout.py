@@ -0,0 +1,246 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for the adaptive receive timeout and retries. No hardware needed."""
+
+import time
+
+import pytest
+
+from pytrinamic.connections import (AdaptiveTimeout, ConnectionManager, EmulatorTmclInterface, SharedTmclInterface,
+                                    SocketTmclInterface)
+from pytrinamic.tmcl import TMCLCommand, TMCLReplyChecksumError, TMCLRequest, TMCLTimeoutError
+from pytrinamic.tools import TmclEmulatorServer, TmclModuleEmulator
+
+
+class LossyInterface(EmulatorTmclInterface):
+    """
+    Emulated module losing or corrupting the replies of the next requests.
+    A lost reply takes the whole timeout, like on a real bus.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(timeout_s=0.2, **kwargs)
+        self.lose = 0
+        self.corrupt = 0
+        self.commands = []
+        self.timeouts_set = []
+
+    def _send(self, host_id, module_id, data):
+        self.commands.append(data[1])
+        super()._send(host_id, module_id, data)
+
+    def _recv(self, host_id, module_id):
+        reply = super()._recv(host_id, module_id)
+        if self.lose:
+            self.lose -= 1
+            time.sleep(self._timeout_s)
+            raise TMCLTimeoutError("TMCL datagram timed out")
+        if self.corrupt:
+            self.corrupt -= 1
+            reply = bytearray(reply)
+            reply[8] ^= 0xFF
+        return reply
+
+    def set_timeout(self, timeout):
+        self.timeouts_set.append(timeout)
+        super().set_timeout(timeout)
+
+
+class DelayingServer(TmclEmulatorServer):
+    """
+    Emulator server answering the next read of the axis parameters in
+    [delayed] late, after the other requests sent in the meantime.
+    """
+
+    def __init__(self, delay_s):
+        super().__init__(TmclModuleEmulator(1))
+        self.delay_s = delay_s
+        self.delayed = set()
+
+    def handle_frame(self, frame):
+        if frame[1] == TMCLCommand.GAP and frame[2] in self.delayed:
+            self.delayed.discard(frame[2])
+            time.sleep(self.delay_s)
+        return super().handle_frame(frame)
+
+
+@pytest.fixture
+def interface():
+    with LossyInterface(latency_s=0.002) as interface:
+        yield interface
+
+
+def test_estimator():
+    adaptive = AdaptiveTimeout(min_timeout_s=0.001, max_timeout_s=1)
+    assert adaptive.timeout_s == 1
+
+    adaptive.sample(0.010)
+    assert adaptive.srtt == 0.010
+    assert adaptive.timeout_s == pytest.approx(0.030)
+
+    for _ in range(100):
+        adaptive.sample(0.010)
+    assert adaptive.timeout_s == pytest.approx(0.010, rel=0.01)
+
+    # Every timeout doubles the timeout until the next sample
+    adaptive.timed_out()
+    adaptive.timed_out()
+    assert adaptive.timeout_s == pytest.approx(0.040, rel=0.01)
+    adaptive.sample(0.010)
+    assert adaptive.timeout_s < 0.02
+
+    # The backoff is limited to 64 times the estimate, and by max_timeout_s
+    for _ in range(10):
+        adaptive.timed_out()
+    assert adaptive.timeout_s == pytest.approx(0.64, rel=0.01)
+    adaptive.sample(0.100)
+    for _ in range(10):
+        adaptive.timed_out()
+    assert adaptive.timeout_s == 1
+    assert adaptive.timeouts == 22
+
+
+def test_lost_read_is_retried(interface):
+    adaptive = interface.enable_adaptive_timeout()
+    assert adaptive is interface.adaptive_timeout()
+    interface.set_axis_parameter(140, 0, 7)
+    for _ in range(20):
+        interface.get_axis_parameter(140, 0)
+    assert 0.002 < adaptive.timeout_s < 0.1
+
+    interface.lose = 1
+    start = time.perf_counter()
+    assert interface.get_axis_parameter(140, 0) == 7
+    assert time.perf_counter() - start < 0.2
+    assert (adaptive.timeouts, adaptive.retries, adaptive.failures) == (1, 1, 0)
+
+    # The retried round trip is not sampled
+    assert adaptive.samples == 21
+
+
+def test_reads_fail_after_all_retries(interface):
+    adaptive = interface.enable_adaptive_timeout(max_retries=2)
+    interface.lose = 3
+    with pytest.raises(TMCLTimeoutError):
+        interface.get_axis_parameter(140, 0)
+    assert (adaptive.timeouts, adaptive.retries, adaptive.failures) == (3, 2, 1)
+    assert interface.commands.count(TMCLCommand.GAP) == 3
+
+
+def test_writes_and_motion_are_not_retried(interface):
+    adaptive = interface.enable_adaptive_timeout()
+    for send in (lambda: interface.set_axis_parameter(140, 0, 1), lambda: interface.rotate(0, 1000)):
+        interface.lose = 1
+        with pytest.raises(TMCLTimeoutError):
+            send()
+    assert adaptive.retries == 0
+    assert adaptive.failures == 2
+
+    interface.enable_adaptive_timeout(retry_writes=True)
+    interface.lose = 1
+    interface.set_axis_parameter(140, 0, 1)
+    assert interface.commands.count(TMCLCommand.SAP) == 3
+    interface.lose = 1
+    with pytest.raises(TMCLTimeoutError):
+        interface.rotate(0, 1000)
+
+
+def test_checksum_errors(interface):
+    adaptive = interface.enable_adaptive_timeout()
+    interface.corrupt = 1
+    interface.get_axis_parameter(140, 0)
+    assert (adaptive.checksum_errors, adaptive.retries) == (1, 1)
+
+    interface.corrupt = 1
+    with pytest.raises(TMCLReplyChecksumError):
+        interface.set_axis_parameter(140, 0, 1)
+
+    # Batches: reads with a bad checksum are sent again one by one
+    interface.corrupt = 1
+    assert interface.get_axis_parameters([140, 140, 140], 0) == [1, 1, 1]
+    assert (adaptive.checksum_errors, adaptive.retries) == (3, 2)
+
+
+def test_batch_retry(interface):
+    adaptive = interface.enable_adaptive_timeout()
+    interface.set_axis_parameter(140, 0, 3)
+    interface.lose = 1
+    assert interface.get_axis_parameters([140, 140], 0) == [3, 3]
+    assert adaptive.retries == 1
+
+    interface.lose = 1
+    with pytest.raises(TMCLTimeoutError):
+        interface.send_many([(TMCLCommand.GAP, 140, 0, 0), (TMCLCommand.SAP, 140, 0, 4)])
+
+
+def test_late_reply_to_retried_read():
+    # The reply arrives after the timeout, but before the one to the retry
+    with DelayingServer(0.15) as server:
+        with SocketTmclInterface(server.address, timeout_s=2) as interface:
+            for parameter in (12, 13, 14):
+                interface.set_axis_parameter(parameter, 0, 10 * parameter)
+            adaptive = interface.enable_adaptive_timeout(min_timeout_s=0.1, max_timeout_s=0.1)
+
+            server.delayed = {12}
+            assert interface.get_axis_parameter(12, 0) == 120
+            assert adaptive.retries == 1
+            # The reply to the retry is not taken for the next replies
+            assert [interface.get_axis_parameter(parameter, 0) for parameter in (13, 14, 12)] == [130, 140, 120]
+            interface.set_axis_parameter(12, 0, 150)
+            assert interface.get_axis_parameter(12, 0) == 150
+
+            server.delayed = {13}
+            assert interface.get_axis_parameters([12, 13, 14], 0) == [150, 130, 140]
+            assert adaptive.retries == 2
+            assert interface.get_axis_parameters([14, 13, 12], 0) == [140, 130, 150]
+            assert interface._frames.discarded == 9 + 18
+
+
+def test_timeout_is_set_on_changes_only():
+    # Without latency, the estimate stays below the lower limit
+    with LossyInterface() as interface:
+        interface.enable_adaptive_timeout(min_timeout_s=0.01)
+        for _ in range(50):
+            interface.get_axis_parameter(140, 0)
+        assert interface.timeouts_set == [0.2, 0.01]
+
+        interface.disable_adaptive_timeout()
+        assert interface.adaptive_timeout() is None
+        assert interface.get_timeout() == 0.2
+
+
+def test_stats_and_shared_interface(interface):
+    interface.enable_stats()
+    interface.enable_adaptive_timeout()
+    interface.lose = 1
+    interface.get_axis_parameter(140, 0)
+    stats = interface.stats()
+    assert stats.requests == 2
+    assert stats.errors["timeout"] == 1
+
+    with SharedTmclInterface(interface) as bus:
+        adaptive = bus.enable_adaptive_timeout(max_retries=1)
+        assert bus.adaptive_timeout() is adaptive
+        interface.lose = 1
+        bus.get_axis_parameter(140, 0)
+        assert adaptive.retries == 1
+
+
+def test_firmware_version_is_not_retried():
+    adaptive = AdaptiveTimeout()
+    assert not adaptive.is_checksum_retryable(TMCLRequest(1, TMCLCommand.GET_FIRMWARE_VERSION, 0, 0, 0))
+    assert adaptive.is_checksum_retryable(TMCLRequest(1, TMCLCommand.GET_FIRMWARE_VERSION, 1, 0, 0))
+
+
+def test_connection_manager():
+    with ConnectionManager("--interface emulator_tmcl --timeout 2 --adaptive-timeout").connect() as interface:
+        adaptive = interface.adaptive_timeout()
+        assert adaptive.max_timeout_s == 2
+        interface.get_axis_parameter(140, 0)
+        assert adaptive.samples == 1
@@ -0,0 +1,87 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for applying axis parameters and registers as a desired state. No hardware needed."""
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface
+from pytrinamic.evalboards import TMC5160_eval
+from pytrinamic.ic import TMC5160
+from pytrinamic.modules import TMCM1240
+from pytrinamic.tmcl import TMCLCommand
+
+
+class CountingInterface(EmulatorTmclInterface):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.commands = []
+
+    def _send(self, host_id, module_id, data):
+        self.commands.append(data[1])
+        super()._send(host_id, module_id, data)
+
+
+@pytest.fixture
+def interface():
+    with CountingInterface() as interface:
+        yield interface
+
+
+def test_apply_axis_parameters(interface):
+    module = TMCM1240(interface)
+    ap = module.motors[0].AP
+    parameters = {ap.MaxVelocity: 1000, ap.MaxAcceleration: 2000, ap.MicrostepResolution: 8, ap.TargetPosition: -5}
+    interface.set_axis_parameter(ap.MicrostepResolution, 0, 8)
+    interface.commands.clear()
+
+    diff = module.apply_axis_parameters(0, parameters, store=True)
+    assert diff == {ap.MaxVelocity: (51200, 1000), ap.MaxAcceleration: (51200, 2000), ap.TargetPosition: (0, -5)}
+    assert interface.commands.count(TMCLCommand.SAP) == 3
+    assert interface.commands.count(TMCLCommand.STAP) == 3
+    assert interface.get_axis_parameters([ap.MaxVelocity, ap.MaxAcceleration], 0) == [1000, 2000]
+    assert interface.get_axis_parameter(ap.TargetPosition, 0, signed=True) == -5
+
+    # Nothing changed, nothing is written or stored again
+    interface.commands.clear()
+    assert module.apply_axis_parameters(0, parameters, store=True) == {}
+    assert interface.commands == [TMCLCommand.GAP] * 4
+
+    interface.set_axis_parameter(ap.MaxVelocity, 0, 500)
+    interface.commands.clear()
+    assert module.diff_axis_parameters(0, parameters) == {ap.MaxVelocity: (500, 1000)}
+    assert module.apply_axis_parameters(0, parameters) == {ap.MaxVelocity: (500, 1000)}
+    assert interface.commands.count(TMCLCommand.SAP) == 1
+    assert interface.commands.count(TMCLCommand.STAP) == 0
+
+
+def test_apply_registers(interface):
+    eval_board = TMC5160_eval(interface)
+    registers = {TMC5160.REG.VMAX: 1000, TMC5160.REG.AMAX: 500, TMC5160.REG.XTARGET: -10}
+    interface.write_mc(TMC5160.REG.AMAX, 500)
+    interface.commands.clear()
+
+    assert eval_board.apply_registers(registers) == {TMC5160.REG.VMAX: (0, 1000), TMC5160.REG.XTARGET: (0, -10)}
+    assert interface.commands == [TMCLCommand.READ_MC] * 3 + [TMCLCommand.WRITE_MC] * 2
+    assert interface.read_mc(TMC5160.REG.XTARGET, signed=True) == -10
+
+    interface.commands.clear()
+    assert eval_board.apply_registers(registers) == {}
+    assert interface.commands == [TMCLCommand.READ_MC] * 3
+
+
+def test_apply_registers_with_cache(interface):
+    eval_board = TMC5160_eval(interface)
+    eval_board.enable_register_cache()
+    registers = {TMC5160.REG.VMAX: 1000, TMC5160.REG.XACTUAL: 0}
+    eval_board.apply_registers(registers)
+
+    # Only the volatile register is read again
+    interface.commands.clear()
+    assert eval_board.apply_registers(registers) == {}
+    assert interface.commands == [TMCLCommand.READ_MC]
@@ -0,0 +1,173 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for the asyncio TMCL interfaces. No hardware needed."""
+
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from pytrinamic.connections import AsyncSerialTmclInterface, AsyncSocketTmclInterface
+from pytrinamic.tmcl import TMCLCommand, TMCLReplyStatusError, TMCLTimeoutError
+from pytrinamic.tools import TmclEmulatorServer, TmclModuleEmulator
+
+SLOW = 200
+GARBLED = 201
+
+
+class FaultyServer(TmclEmulatorServer):
+    """
+    Emulator server answering reads of the axis parameter SLOW late and
+    prefixing replies to reads of GARBLED with extra bytes.
+    """
+
+    def __init__(self, delay_s):
+        super().__init__(TmclModuleEmulator(1, axes=2))
+        self.delay_s = delay_s
+
+    def handle_frame(self, frame):
+        reply = super().handle_frame(frame)
+        if frame[1] == TMCLCommand.GAP and frame[2] == SLOW:
+            time.sleep(self.delay_s)
+        if frame[1] == TMCLCommand.GAP and frame[2] == GARBLED:
+            reply = b"\x02\x01" + reply
+        return reply
+
+
+@pytest.fixture
+def server():
+    with FaultyServer(0.2) as server:
+        yield server
+
+
+def test_socket(server):
+    async def run():
+        async with AsyncSocketTmclInterface(server.address, timeout_s=2) as interface:
+            await interface.set_axis_parameter(4, 1, 1000)
+            assert await interface.get_axis_parameter(4, 1) == 1000
+            assert await interface.get_axis_parameters([4, 5], 0) == [51200, 51200]
+            assert await interface.get_version_string() == "1240V310"
+            assert (await interface.send_prepared(interface.prepare(TMCLCommand.GAP, 4, 1))).value == 1000
+
+            replies = await interface.send_many([(TMCLCommand.GAP, 4, 0, 0), (TMCLCommand.GAP, 4, 5, 0)],
+                                                raise_on_error=False)
+            assert [reply.is_valid() for reply in replies] == [True, False]
+            with pytest.raises(TMCLReplyStatusError):
+                await interface.get_axis_parameter(4, 5)
+
+            # Concurrent tasks get their own replies
+            values = await asyncio.gather(*(interface.get_axis_parameter(4, axis) for axis in (0, 1, 0, 1)))
+            assert values == [51200, 1000, 51200, 1000]
+
+    asyncio.run(run())
+
+
+def test_socket_timeout(server):
+    async def run():
+        async with AsyncSocketTmclInterface(server.address, timeout_s=0.05) as interface:
+            await interface.set_axis_parameter(SLOW, 0, 1)
+            await interface.set_axis_parameter(202, 0, 2)
+            with pytest.raises(TMCLTimeoutError):
+                await interface.get_axis_parameter(SLOW, 0)
+
+            # The late reply is dropped instead of being taken for the next one
+            await asyncio.sleep(0.3)
+            assert await interface.get_axis_parameter(202, 0) == 2
+            assert await interface.get_axis_parameters([202, 4], 0) == [2, 51200]
+
+    asyncio.run(run())
+
+
+def test_socket_resync(server):
+    async def run():
+        async with AsyncSocketTmclInterface(server.address, timeout_s=2) as interface:
+            await interface.set_axis_parameter(GARBLED, 0, 7)
+            assert await interface.get_axis_parameter(GARBLED, 0) == 7
+            assert await interface.get_axis_parameters([GARBLED, 4, GARBLED], 0) == [7, 51200, 7]
+            assert interface._frames.resyncs == 3
+
+    asyncio.run(run())
+
+
+def test_socket_reconnect(server):
+    async def run():
+        interface = AsyncSocketTmclInterface(server.address, timeout_s=2)
+        assert await interface.get_axis_parameter(4, 0) == 51200
+        await interface.close()
+        assert await interface.get_axis_parameter(4, 0) == 51200
+        await interface.close()
+
+    asyncio.run(run())
+
+
+class PtyModule:
+    """
+    Emulated module behind a pseudo terminal, whose name can be opened like
+    a serial port. Answers reads of the axis parameter SLOW late.
+    """
+
+    def __init__(self, delay_s):
+        self.emulator = TmclModuleEmulator(1)
+        self.delay_s = delay_s
+        self._master, self._slave = os.openpty()
+        self.port = os.ttyname(self._slave)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        buffered = bytearray()
+        while True:
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            buffered += data
+            while len(buffered) >= 9:
+                frame = bytearray(buffered[:9])
+                del buffered[:9]
+                if frame[1] == TMCLCommand.GAP and frame[2] == SLOW:
+                    time.sleep(self.delay_s)
+                os.write(self._master, self.emulator.handle_frame(frame))
+
+    def close(self):
+        os.close(self._slave)
+        os.close(self._master)
+        self._thread.join(1)
+
+
+@pytest.fixture
+def pty_module():
+    if not hasattr(os, "openpty"):
+        pytest.skip("Needs pseudo terminals")
+    module = PtyModule(0.2)
+    yield module
+    module.close()
+
+
+def test_serial(pty_module):
+    async def run():
+        async with AsyncSerialTmclInterface(pty_module.port, timeout_s=0.05) as interface:
+            writers = []
+            write = interface._serial.write
+            interface._serial.write = lambda data: writers.append(threading.get_ident()) or write(data)
+
+            await interface.set_axis_parameter(SLOW, 0, 1)
+            await interface.set_axis_parameter(202, 0, 2)
+            assert await interface.get_axis_parameters([202, 4], 0) == [2, 51200]
+            # The event loop thread never blocks on a write
+            assert threading.get_ident() not in writers
+
+            with pytest.raises(TMCLTimeoutError):
+                await interface.get_axis_parameter(SLOW, 0)
+            await asyncio.sleep(0.3)
+            assert await interface.get_axis_parameter(202, 0) == 2
+
+    asyncio.run(run())
@@ -0,0 +1,182 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for axis parameter snapshots. No hardware needed."""
+
+import os
+import threading
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface, SerialTmclInterface
+from pytrinamic.evalboards import TMC5160_eval
+from pytrinamic.features import AxisParameterSnapshot
+from pytrinamic.features.axis_parameter_snapshot import axis_parameter_names
+from pytrinamic.modules import TMCM1240, TMCM1630
+from pytrinamic.tmcl import TMCLCommand, TMCLReplyStatusError, TMCLStatus
+from pytrinamic.tools import TmclModuleEmulator
+
+
+class PartialEmulator(TmclModuleEmulator):
+    """Emulated module rejecting the axis parameters in [unsupported]."""
+
+    unsupported = {212}
+
+    def _get_axis_parameter(self, request):
+        if request.commandType in self.unsupported:
+            return TMCLStatus.WRONG_TYPE, 0
+        return super()._get_axis_parameter(request)
+
+
+class CountingInterface(EmulatorTmclInterface):
+    def __init__(self, **kwargs):
+        super().__init__(modules=[PartialEmulator(1, axes=2)], **kwargs)
+        self.commands = []
+
+    def _send(self, host_id, module_id, data):
+        self.commands.append(data[1])
+        super()._send(host_id, module_id, data)
+
+
+class PtyModule:
+    """
+    Emulated module behind a pseudo terminal, whose name can be opened like
+    a serial port. Records the size of every write it receives.
+    """
+
+    def __init__(self):
+        self.emulator = TmclModuleEmulator(1, axes=2)
+        self.reads = []
+        self._master, self._slave = os.openpty()
+        self.port = os.ttyname(self._slave)
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        buffered = bytearray()
+        while True:
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            self.reads.append(len(data))
+            buffered += data
+            while len(buffered) >= 9:
+                reply = self.emulator.handle_frame(bytearray(buffered[:9]))
+                del buffered[:9]
+                os.write(self._master, reply)
+
+    def close(self):
+        os.close(self._slave)
+        os.close(self._master)
+        self._thread.join(1)
+
+
+@pytest.fixture
+def interface():
+    with CountingInterface() as interface:
+        yield interface
+
+
+def test_snapshot(interface):
+    module = TMCM1240(interface)
+    motor = module.motors[0]
+    interface.set_axis_parameter(motor.AP.TargetPosition, 0, -100)
+    interface.set_axis_parameter(motor.AP.MaxCurrent, 0, 128)
+    names = axis_parameter_names(motor.AP)
+    assert "ENUM" not in names
+    interface.commands.clear()
+
+    snapshot = motor.snapshot()
+    assert interface.commands == [TMCLCommand.GAP] * len(names)
+    assert snapshot.axis == 0
+    assert snapshot.TargetPosition == -100
+    assert snapshot["MaxCurrent"] == 128
+    assert snapshot.MaxVelocity == 51200
+    # Rejected parameters are left out
+    rejected = [name for name, ap_type in names.items() if ap_type in PartialEmulator.unsupported]
+    assert rejected and not any(name in snapshot for name in rejected)
+    assert len(snapshot) == len(names) - len(rejected)
+    with pytest.raises(AttributeError):
+        snapshot.NoSuchParameter
+
+
+def test_diff(interface):
+    motor = TMCM1240(interface).motors[0]
+    before = motor.snapshot()
+    assert motor.snapshot().diff(before) == {}
+
+    interface.set_axis_parameter(motor.AP.MaxVelocity, 0, 1000)
+    interface.set_axis_parameter(motor.AP.ActualPosition, 0, -3)
+    after = motor.snapshot()
+    assert after.diff(before) == {"ActualPosition": (0, -3), "MaxVelocity": (51200, 1000)}
+
+    partial = AxisParameterSnapshot(0, {"MaxVelocity": 1000, "Other": 1})
+    assert partial.diff(AxisParameterSnapshot(0, {"MaxVelocity": 1000, "ActualPosition": 2})) == {
+        "ActualPosition": (2, None), "Other": (None, 1)}
+
+
+def test_module_snapshot(interface):
+    # TMCM1630 motors have a PID feature, whose __str__ reads in one batch too
+    module = TMCM1630(interface)
+    snapshots = module.snapshot()
+    assert [snapshot.axis for snapshot in snapshots] == list(range(len(module.motors)))
+
+    interface.commands.clear()
+    str(module.motors[0])
+    str(module.motors[0].pid)
+    assert interface.commands == [TMCLCommand.GAP] * 9
+
+
+def test_to_array(interface):
+    np = pytest.importorskip("numpy")
+    motor = TMCM1240(interface).motors[0]
+    snapshots = []
+    for position in (10, 20, 30):
+        interface.set_axis_parameter(motor.AP.ActualPosition, 0, position)
+        snapshots.append(motor.snapshot())
+
+    records = AxisParameterSnapshot.to_array(snapshots)
+    assert len(records) == 3
+    assert list(records["ActualPosition"]) == [10, 20, 30]
+    assert records.dtype["MaxVelocity"] == np.int64
+    assert np.all(np.diff(records["timestamp"]) >= 0)
+
+
+def test_strict_read(interface):
+    module = TMCM1240(interface)
+    assert module.get_axis_parameters([4, 212], 0, raise_on_error=False) == [51200, None]
+    with pytest.raises(TMCLReplyStatusError):
+        module.get_axis_parameters([4, 212], 0)
+
+    eval_board = TMC5160_eval(interface)
+    assert eval_board.get_axis_parameters([4, 212], 0, raise_on_error=False) == [51200, None]
+    with pytest.raises(TMCLReplyStatusError):
+        eval_board.get_axis_parameters([4, 212], 0)
+
+
+def test_str_over_serial():
+    if not hasattr(os, "openpty"):
+        pytest.skip("Needs pseudo terminals")
+    pty_module = PtyModule()
+    try:
+        with SerialTmclInterface(pty_module.port, timeout_s=2) as interface:
+            motor = TMCM1630(interface).motors[0]
+            interface.set_axis_parameter(motor.AP.TargetPosition, 0, -5)
+            interface.set_axis_parameter(motor.AP.TorqueP, 0, 300)
+
+            # On a bus shared by several modules, the batches are sent
+            # request by request
+            pty_module.reads.clear()
+            assert "'target_position': -5" in str(motor)
+            assert "'torque_p': 300" in str(motor.pid)
+            assert pty_module.reads == [9] * 9
+    finally:
+        pty_module.close()
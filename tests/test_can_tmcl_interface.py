@@ -0,0 +1,234 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for CanTmclInterface on the python-can virtual bus. No hardware needed."""
+
+import heapq
+import itertools
+import threading
+import time
+
+import pytest
+
+can = pytest.importorskip("can")
+
+from pytrinamic.connections.can_tmcl_interface import CanTmclInterface, CanTmclTimeoutError
+from pytrinamic.tmcl import TMCLCommand
+from pytrinamic.tools import TmclModuleEmulator
+
+_channels = itertools.count()
+
+
+class VirtualCanTmclInterface(CanTmclInterface):
+    def __init__(self, port, datarate=1000000, host_id=2, module_id=1, timeout_s=5):
+        CanTmclInterface.__init__(self, port, datarate, host_id, module_id, timeout_s)
+        self._connection = can.interface.Bus(bustype="virtual", channel=port)
+
+
+class VirtualCanModules:
+    """
+    Emulated modules on a virtual CAN bus. Every module answers after
+    [latency_s], independently of the others. Tracks the largest number of
+    requests in flight to one module.
+    """
+
+    def __init__(self, module_ids, latency_s=0.0):
+        self.channel = "pytrinamic-test-{}".format(next(_channels))
+        self.modules = {module_id: TmclModuleEmulator(module_id) for module_id in module_ids}
+        self.latency_s = latency_s
+        self.extra_replies = []
+        self.in_flight = dict.fromkeys(module_ids, 0)
+        self.max_in_flight = 0
+        self._bus = can.interface.Bus(bustype="virtual", channel=self.channel)
+        self._due = []
+        self._condition = threading.Condition()
+        self._running = True
+        self._threads = [threading.Thread(target=target, daemon=True) for target in (self._receive, self._answer)]
+        for thread in self._threads:
+            thread.start()
+
+    def _receive(self):
+        sequence = itertools.count()
+        while self._running:
+            message = self._bus.recv(0.05)
+            if message is None or message.arbitration_id not in self.modules:
+                continue
+            reply = self.modules[message.arbitration_id].handle_frame(bytes([message.arbitration_id]) + bytes(message.data))
+            with self._condition:
+                for extra in self.extra_replies:
+                    heapq.heappush(self._due, (time.monotonic(), next(sequence), extra, None))
+                self.extra_replies = []
+                self.in_flight[message.arbitration_id] += 1
+                self.max_in_flight = max(self.max_in_flight, self.in_flight[message.arbitration_id])
+                heapq.heappush(self._due, (time.monotonic() + self.latency_s, next(sequence), reply, message.arbitration_id))
+                self._condition.notify()
+
+    def _answer(self):
+        while True:
+            with self._condition:
+                while self._running and not (self._due and self._due[0][0] <= time.monotonic()):
+                    self._condition.wait(self._due[0][0] - time.monotonic() if self._due else None)
+                if not self._running:
+                    return
+                _, _, reply, module_id = heapq.heappop(self._due)
+                if module_id is not None:
+                    self.in_flight[module_id] -= 1
+            self._bus.send(can.Message(arbitration_id=reply[0], data=reply[1:], is_extended_id=False))
+
+    def close(self):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        for thread in self._threads:
+            thread.join()
+        self._bus.shutdown()
+
+
+@pytest.fixture
+def modules():
+    modules = VirtualCanModules(range(1, 13), latency_s=0.02)
+    yield modules
+    modules.close()
+
+
+def test_concurrent_requests_to_different_modules(modules):
+    with VirtualCanTmclInterface(modules.channel, timeout_s=2) as interface:
+        errors = []
+
+        def poll(module_id):
+            try:
+                interface.set_axis_parameter(140, 0, module_id, module_id)
+                for _ in range(5):
+                    assert interface.get_axis_parameter(140, 0, module_id) == module_id
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=poll, args=(module_id,)) for module_id in modules.modules]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        assert errors == []
+        # 6 round trips per module, overlapping instead of 72 in a row
+        assert elapsed < 36 * modules.latency_s
+
+
+def test_requests_to_one_module_are_serialized(modules):
+    with VirtualCanTmclInterface(modules.channel, timeout_s=2) as interface:
+        results = []
+
+        def write_and_read(value):
+            interface.set_axis_parameter(140, 0, value)
+            results.append(interface.get_axis_parameter(140, 0))
+
+        threads = [threading.Thread(target=write_and_read, args=(value,)) for value in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(results) == 4
+        assert modules.max_in_flight == 1
+
+
+def test_batch_with_concurrent_requests(modules):
+    with VirtualCanTmclInterface(modules.channel, timeout_s=2) as interface:
+        for module_id in (1, 2, 3):
+            interface.set_axis_parameter(140, 0, 10 + module_id, module_id)
+
+        polled = []
+        thread = threading.Thread(target=lambda: polled.extend(interface.get_axis_parameter(140, 0, 4) for _ in range(3)))
+        thread.start()
+        requests = [interface.prepare(TMCLCommand.GAP, 140, 0, module_id=module_id).request for module_id in (1, 2, 3, 1)]
+        replies = interface.send_many(requests)
+        thread.join()
+        assert [reply.value for reply in replies] == [11, 12, 13, 11]
+        assert polled == [0, 0, 0]
+
+
+def test_unexpected_replies_are_dropped(modules):
+    with VirtualCanTmclInterface(modules.channel, timeout_s=2) as interface:
+        interface.set_axis_parameter(140, 0, 5, 1)
+        # A late reply of module 7, which has no request in flight
+        modules.extra_replies = [modules.modules[7].handle_frame(bytes([7, TMCLCommand.GAP, 140, 0, 0, 0, 0, 0, 0]))]
+        assert interface.get_axis_parameter(140, 0, 1) == 5
+
+
+def test_timeout():
+    modules = VirtualCanModules([1])
+    try:
+        with VirtualCanTmclInterface(modules.channel, timeout_s=0.1) as interface:
+            with pytest.raises(CanTmclTimeoutError):
+                interface.get_axis_parameter(140, 0, 2)
+            assert interface.get_axis_parameter(140, 0, 1) == 0
+    finally:
+        modules.close()
+
+
+@pytest.mark.parametrize("reader", [False, True])
+def test_reply_timestamps(modules, reader):
+    with VirtualCanTmclInterface(modules.channel, timeout_s=2) as interface:
+        if reader:
+            interface.start_reader()
+        before = time.time()
+        reply = interface.send(TMCLCommand.GAP, 140, 0, 0, 3)
+        assert before <= reply.timestamp <= time.time()
+
+
+def test_reader_concurrent_requests(modules):
+    with VirtualCanTmclInterface(modules.channel, timeout_s=2) as interface:
+        interface.start_reader()
+        results = {}
+
+        def poll(module_id):
+            interface.set_axis_parameter(140, 0, module_id, module_id)
+            results[module_id] = [interface.get_axis_parameter(140, 0, module_id) for _ in range(5)]
+
+        threads = [threading.Thread(target=poll, args=(module_id,)) for module_id in modules.modules]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert results == {module_id: [module_id] * 5 for module_id in modules.modules}
+
+        requests = [interface.prepare(TMCLCommand.GAP, 140, 0, module_id=module_id).request for module_id in (1, 2, 1)]
+        assert [reply.value for reply in interface.send_many(requests)] == [1, 2, 1]
+
+
+def test_reader_keeps_unsolicited_replies(modules):
+    with VirtualCanTmclInterface(modules.channel, timeout_s=2) as interface:
+        received = []
+        interface.start_reader(on_unsolicited=received.append)
+        modules.extra_replies = [modules.modules[7].handle_frame(bytes([7, TMCLCommand.GGP, 0, 0, 0, 0, 0, 0, 0]))]
+        interface.get_axis_parameter(140, 0, 1)
+
+        deadline = time.monotonic() + 1
+        while not received and time.monotonic() < deadline:
+            time.sleep(0.01)
+        unsolicited = interface.unsolicited_replies()
+        assert [(reply.module_address, reply.command) for reply in unsolicited] == [(7, TMCLCommand.GGP)]
+        assert received == unsolicited
+        assert unsolicited[0].timestamp is not None
+        assert interface.unsolicited_replies() == []
+
+
+def test_reader_timeout_and_stop():
+    modules = VirtualCanModules([1])
+    try:
+        with VirtualCanTmclInterface(modules.channel, timeout_s=0.1) as interface:
+            interface.start_reader()
+            with pytest.raises(CanTmclTimeoutError):
+                interface.get_axis_parameter(140, 0, 2)
+            assert interface.get_axis_parameter(140, 0, 1) == 0
+
+            interface.stop_reader()
+            assert interface.get_axis_parameter(140, 0, 1) == 0
+    finally:
+        modules.close()
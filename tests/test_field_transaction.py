@@ -0,0 +1,139 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for coalesced register field writes. No hardware needed."""
+
+import struct
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface
+from pytrinamic.evalboards import TMC5160_eval
+from pytrinamic.ic import TMC4671, TMC5160
+from pytrinamic.tmcl import TMCLCommand
+
+
+class CountingInterface(EmulatorTmclInterface):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.commands = []
+
+    def _send(self, host_id, module_id, data):
+        self.commands.append(data[1])
+        super()._send(host_id, module_id, data)
+
+
+class FakeUartIc:
+    """Register file answering the datagrams of the direct UART ICs."""
+
+    def __init__(self):
+        self.registers = dict()
+        self.datagrams = []
+
+    def send_datagram(self, data, recv_size):
+        address, value = struct.unpack(">BI", data)
+        self.datagrams.append(address)
+        if address & 0x80:
+            self.registers[address & 0x7F] = value
+            return None
+        return struct.pack(">BI", address, self.registers.get(address, 0))
+
+
+@pytest.fixture
+def interface():
+    with CountingInterface() as interface:
+        yield interface
+
+
+@pytest.fixture
+def eval_board(interface):
+    return TMC5160_eval(interface)
+
+
+def configure_chopper(eval_board):
+    eval_board.write_register_field(TMC5160.FIELD.TOFF, 3)
+    eval_board.write_register_field(TMC5160.FIELD.TFD_2__0_, 4)
+    eval_board.write_register_field(TMC5160.FIELD.OFFSET, 1)
+    eval_board.write_register_field(TMC5160.FIELD.TBL, 2)
+    eval_board.write_register_field(TMC5160.FIELD.MRES, 4)
+
+
+def test_chopconf_takes_one_read_modify_write(interface, eval_board):
+    interface.write_mc(TMC5160.REG.CHOPCONF, 0x10000000)
+    interface.commands.clear()
+    with eval_board.field_transaction() as transaction:
+        configure_chopper(eval_board)
+        assert len(transaction) == 1
+        assert interface.commands == []
+    assert interface.commands == [TMCLCommand.READ_MC, TMCLCommand.WRITE_MC]
+    assert interface.read_mc(TMC5160.REG.CHOPCONF) == 0x10000000 | 4 << 24 | 2 << 15 | 1 << 7 | 4 << 4 | 3
+
+    # Without a transaction, every field costs a read and a write
+    interface.commands.clear()
+    configure_chopper(eval_board)
+    assert len(interface.commands) == 10
+
+
+def test_grouped_by_register(interface, eval_board):
+    with eval_board.field_transaction():
+        eval_board.write_register_field(TMC5160.FIELD.IRUN, 20)
+        eval_board.write_axis_field(0, TMC5160.FIELD.VMAX, 1000)
+        eval_board.write_register_field(TMC5160.FIELD.IHOLD, 5)
+        # The last write to a field wins, reads see the pending writes
+        eval_board.write_register_field(TMC5160.FIELD.IHOLD, 6)
+        assert eval_board.read_register_field(TMC5160.FIELD.IHOLD) == 6
+        # Fields covering the whole register need no read
+        eval_board.write_register_field(TMC5160.FIELD.XTARGET, -100)
+        interface.commands.clear()
+    assert interface.commands.count(TMCLCommand.WRITE_MC) == 3
+    assert interface.commands.count(TMCLCommand.READ_MC) == 2
+    assert interface.read_mc(TMC5160.REG.IHOLD_IRUN) == 20 << 8 | 6
+    assert interface.read_mc(TMC5160.REG.VMAX) == 1000
+    assert interface.read_mc(TMC5160.REG.XTARGET, signed=True) == -100
+
+
+def test_nested_and_failing_blocks(interface, eval_board):
+    with pytest.raises(RuntimeError):
+        with eval_board.field_transaction():
+            eval_board.write_register_field(TMC5160.FIELD.VMAX, 1000)
+            raise RuntimeError
+    assert interface.read_mc(TMC5160.REG.VMAX) == 0
+
+    with eval_board.field_transaction() as outer:
+        eval_board.write_register_field(TMC5160.FIELD.TOFF, 3)
+        with eval_board.field_transaction() as inner:
+            assert inner is outer
+            eval_board.write_register_field(TMC5160.FIELD.TBL, 2)
+        assert interface.read_mc(TMC5160.REG.CHOPCONF) == 0
+    assert interface.read_mc(TMC5160.REG.CHOPCONF) == 2 << 15 | 3
+
+
+def test_with_register_cache(interface, eval_board):
+    eval_board.enable_register_cache()
+    with eval_board.field_transaction():
+        configure_chopper(eval_board)
+    interface.commands.clear()
+    with eval_board.field_transaction():
+        eval_board.write_register_field(TMC5160.FIELD.TOFF, 5)
+        eval_board.write_register_field(TMC5160.FIELD.MRES, 0)
+    assert interface.commands == [TMCLCommand.WRITE_MC]
+    assert eval_board.read_register_field(TMC5160.FIELD.TBL) == 2
+
+
+def test_direct_uart_ic():
+    connection = FakeUartIc()
+    ic = TMC4671(connection)
+    connection.registers[TMC4671.REG.PID_TORQUE_P_TORQUE_I] = 0x00010001
+    with ic.field_transaction():
+        ic.write_register_field(TMC4671.FIELD.PID_TORQUE_P, 300)
+        ic.write_register_field(TMC4671.FIELD.PID_TORQUE_I, 200)
+        ic.write_register_field(TMC4671.FIELD.PID_FLUX_P, 100)
+    # Both torque fields cover the whole register, no read needed
+    assert len(connection.datagrams) == 3
+    assert connection.registers[TMC4671.REG.PID_TORQUE_P_TORQUE_I] == 300 << 16 | 200
+    assert ic.read_register_field(TMC4671.FIELD.PID_FLUX_P) == 100
@@ -0,0 +1,113 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for the TMCL gateway server. No hardware needed."""
+
+import threading
+from collections import deque
+
+import pytest
+
+from pytrinamic.connections import SocketTmclInterface
+from pytrinamic.connections.tmcl_interface import TmclInterface
+from pytrinamic.gateway import TmclGateway
+from pytrinamic.tmcl import TMCLCommand, TMCLReply, TMCLRequest, TMCLReplyStatusError, TMCLStatus
+
+
+class CountingTmclInterface(TmclInterface):
+    """Answers GAP with the axis parameter number and counts the requests. SAP 255 fails."""
+
+    def __init__(self):
+        TmclInterface.__init__(self)
+        self._replies = deque()
+        self.requests = []
+
+    def _send(self, host_id, module_id, data):
+        request = TMCLRequest.from_buffer(data)
+        self.requests.append(request.command)
+        if request.command == TMCLCommand.SAP and request.commandType == 255:
+            raise RuntimeError("TMCL datagram timed out")
+        value = request.commandType if request.command == TMCLCommand.GAP else request.value
+        status = TMCLStatus.WRONG_TYPE if request.commandType == 254 else TMCLStatus.SUCCESS
+        self._replies.append(TMCLReply(host_id, module_id, status, request.command, value).to_buffer())
+
+    def _recv(self, host_id, module_id):
+        return self._replies.popleft()
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def gateway():
+    with TmclGateway(CountingTmclInterface(), ("127.0.0.1", 0)) as gateway:
+        yield gateway
+
+
+def hold_bus(bus):
+    """Keep the dispatcher busy until the returned event is set."""
+    started = threading.Event()
+    release = threading.Event()
+    bus.call(lambda _: started.set() or release.wait())
+    started.wait()
+    return release
+
+
+def connect(gateway):
+    host, port = gateway.addresses[0]
+    return SocketTmclInterface(f"{host}:{port}", timeout_s=2)
+
+
+def test_clients_share_the_bus(gateway):
+    with connect(gateway) as first, connect(gateway) as second:
+        assert first.get_axis_parameter(4, 0) == 4
+        assert second.send(TMCLCommand.SAP, 4, 0, 1234).value == 1234
+        assert [future.result().value for future in [first.submit(TMCLCommand.GAP, ap, 0, 0) for ap in range(20)]] == list(range(20))
+
+
+def test_status_errors_are_forwarded(gateway):
+    with connect(gateway) as client:
+        with pytest.raises(TMCLReplyStatusError):
+            client.get_axis_parameter(254, 0)
+        assert client.get_axis_parameter(1, 0) == 1
+
+
+def test_identical_reads_are_coalesced(gateway):
+    blocker = hold_bus(gateway.bus)
+    with connect(gateway) as first, connect(gateway) as second:
+        futures = [client.submit(TMCLCommand.GAP, 3, 0, 0) for client in [first, second, first]]
+        while gateway.bus.pending() + gateway.coalesced < 3:
+            pass
+        blocker.set()
+
+        assert [future.result().value for future in futures] == [3, 3, 3]
+        assert gateway.coalesced == 2
+        assert gateway.bus._interface.requests == [TMCLCommand.GAP]
+
+
+def test_reads_are_not_coalesced_across_own_writes(gateway):
+    blocker = hold_bus(gateway.bus)
+    with connect(gateway) as first, connect(gateway) as second:
+        futures = [second.submit(TMCLCommand.GAP, 3, 0, 0)]
+        while gateway.bus.pending() < 1:
+            pass
+        futures += [first.submit(TMCLCommand.SGP, 3, 0, 0), first.submit(TMCLCommand.GAP, 3, 0, 0)]
+        while gateway.bus.pending() < 3:
+            pass
+        blocker.set()
+
+        assert [future.result().value for future in futures] == [3, 0, 3]
+        assert gateway.coalesced == 0
+
+
+def test_failed_request_disconnects_client(gateway):
+    with connect(gateway) as client:
+        with pytest.raises(ConnectionError):
+            client.send(TMCLCommand.SAP, 255, 0, 0)
+    with connect(gateway) as client:
+        assert client.get_axis_parameter(2, 0) == 2
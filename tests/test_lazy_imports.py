@@ -0,0 +1,72 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Guard the startup time of scripts against eagerly imported dependencies.
+
+Each statement runs in a fresh interpreter. The test fails if a heavy optional
+dependency gets imported although the statement does not need it.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+HEAVY_MODULES = ["can", "canopen", "numpy"]
+
+
+def imported_heavy_modules(statement):
+    check = f"import sys\n{statement}\nprint(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    output = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True).stdout
+    return output.split()
+
+
+@pytest.mark.parametrize('statement', [
+    "import pytrinamic.connections",
+    "from pytrinamic.connections import SerialTmclInterface",
+    "from pytrinamic.connections import SocketTmclInterface",
+    "from pytrinamic.connections import ConnectionManager\n"
+    "ConnectionManager('--interface serial_tmcl --port COM4')",
+    "from pytrinamic.connections import ConnectionManager\n"
+    "ConnectionManager.INTERFACES[ConnectionManager.list_supported_interfaces().index('serial_tmcl')]",
+])
+def test_no_heavy_imports(statement):
+    assert imported_heavy_modules(statement) == []
+
+
+def test_interface_table():
+    from pytrinamic.connections import ConnectionManager, SerialTmclInterface, UdpTmclInterface
+
+    names = ConnectionManager.list_supported_interfaces()
+    assert len(ConnectionManager.INTERFACES) == len(names)
+    assert ConnectionManager.INTERFACES[names.index("serial_tmcl")] == ("serial_tmcl", SerialTmclInterface, 9600)
+    assert ConnectionManager.INTERFACES[-1][1] is UdpTmclInterface
+
+
+def test_can_interface_still_importable():
+    assert imported_heavy_modules("from pytrinamic.connections import KvaserTmclInterface") == ["can"]
+
+
+@pytest.mark.parametrize('statement,expected', [
+    ("from pytrinamic.modules import TMCM1240", ["pytrinamic.modules.TMCM1240"]),
+    ("from pytrinamic.modules import get_module_class; get_module_class('TMCM-1240')", ["pytrinamic.modules.TMCM1240"]),
+    ("from pytrinamic.evalboards import TMC5160_eval", ["pytrinamic.evalboards.TMC5160_eval", "pytrinamic.ic.TMC5160"]),
+    ("import pytrinamic.ic", []),
+])
+def test_registries_import_only_used_classes(statement, expected):
+    check = (f"import sys\n{statement}\n"
+             "print(' '.join(sorted(m for m in sys.modules if m.split('.')[-1].startswith(('TMC', 'MAX')))))")
+    output = subprocess.run([sys.executable, "-c", check], capture_output=True, text=True, check=True).stdout
+    assert output.split() == sorted(expected)
+
+
+def test_submodule_import_binds_class():
+    from pytrinamic.evalboards.TMC5160_shield import TMC5160_shield
+    import pytrinamic.evalboards
+
+    assert pytrinamic.evalboards.TMC5160_shield is TMC5160_shield
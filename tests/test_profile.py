@@ -0,0 +1,130 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for configuration profiles. No hardware needed."""
+
+import json
+import threading
+import time
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface
+from pytrinamic.evalboards import TMC5160_eval
+from pytrinamic.ic import TMC5160
+from pytrinamic.modules import TMCM1240
+from pytrinamic.tmcl import TMCLCommand
+from pytrinamic.tools import Profile, TmclModuleEmulator, apply_profile
+
+PROFILE = {
+    "TMCM-1240": {
+        "axis_parameters": {"0": {"MaxVelocity": 1000, "MaxAcceleration": 2000, "TargetPosition": -5}},
+        "global_parameters": {"0": {"AutoStartMode": 1}},
+        "store": True,
+    },
+    "TMC5160_eval": {
+        "registers": {"VMAX": 3000},
+        "fields": {"TOFF": 3, "TBL": 2, "MRES": 4},
+    },
+}
+
+
+class BusInterface(EmulatorTmclInterface):
+    """Emulated bus recording the requests and the threads sending them."""
+
+    def __init__(self, module_ids, latency_s=0):
+        super().__init__(modules=[TmclModuleEmulator(module_id) for module_id in module_ids], latency_s=latency_s)
+        self.commands = []
+        self.threads = set()
+
+    def _send(self, host_id, module_id, data):
+        self.commands.append(data[1])
+        self.threads.add(threading.get_ident())
+        super()._send(host_id, module_id, data)
+
+
+def test_apply(tmp_path):
+    path = tmp_path / "profile.json"
+    path.write_text(json.dumps(PROFILE))
+    profile = Profile.load(str(path))
+
+    with BusInterface([1, 2]) as interface:
+        module = TMCM1240(interface)
+        eval_board = TMC5160_eval(interface, module_id=2)
+        results = apply_profile([module, eval_board], profile)
+
+        assert results[0]["axis_parameters"][0] == {4: (51200, 1000), 5: (51200, 2000), 0: (0, -5)}
+        assert results[0]["global_parameters"][0] == {77: (0, 1)}
+        assert results[1]["registers"] == {TMC5160.REG.VMAX: (0, 3000), TMC5160.REG.CHOPCONF: (0, 4 << 24 | 2 << 15 | 3)}
+        assert interface.commands.count(TMCLCommand.STAP) == 3
+        assert interface.commands.count(TMCLCommand.STGP) == 1
+        assert interface.get_axis_parameter(0, 0, signed=True) == -5
+        assert interface.read_mc(TMC5160.REG.CHOPCONF, module_id=2) == 4 << 24 | 2 << 15 | 3
+
+        # A second run only reads
+        interface.commands.clear()
+        assert apply_profile([module, eval_board], profile) == [
+            {"axis_parameters": {0: {}}, "global_parameters": {0: {}}},
+            {"registers": {}},
+        ]
+        assert set(interface.commands) == {TMCLCommand.GAP, TMCLCommand.GGP, TMCLCommand.READ_MC}
+
+
+def test_toml(tmp_path):
+    path = tmp_path / "profile.toml"
+    path.write_text('[TMCM1240.axis_parameters.0]\nMaxVelocity = 1000\n')
+    profile = Profile.load(str(path))
+    with BusInterface([1]) as interface:
+        apply_profile([TMCM1240(interface)], profile)
+        assert interface.get_axis_parameter(4, 0) == 1000
+
+
+@pytest.mark.parametrize("entry, message", [
+    ({"axis_parameters": {"0": {"MaxSpeed": 1}}}, "unknown name MaxSpeed"),
+    ({"axis_parameters": {"1": {"MaxVelocity": 1}}}, "no axis 1"),
+    ({"axis_parameters": {"0": {"MaxVelocity": "fast"}}}, "has to be an integer"),
+    ({"axis_parameters": {"0": {"MaxVelocity": 1 << 32}}}, "32 bit"),
+    ({"global_parameters": {"7": {"AutoStartMode": 1}}}, "no global parameters of bank 7"),
+    ({"registers": {"VMAX": 1}}, "no register access"),
+    ({"axis_parameter": {}}, "Unknown sections"),
+])
+def test_validation(entry, message):
+    with BusInterface([1]) as interface:
+        with pytest.raises(ValueError, match=message):
+            apply_profile([TMCM1240(interface)], {"TMCM1240": entry})
+        # Nothing was written
+        assert TMCLCommand.SAP not in interface.commands
+
+
+def test_field_validation():
+    with BusInterface([1]) as interface:
+        eval_board = TMC5160_eval(interface)
+        with pytest.raises(ValueError, match="does not fit"):
+            apply_profile([eval_board], {"TMC5160_eval": {"fields": {"TOFF": 16}}})
+        with pytest.raises(ValueError, match="no entry"):
+            apply_profile([eval_board], {"TMCM1240": {}})
+
+
+def test_one_worker_per_bus():
+    interfaces = [BusInterface([1, 2, 3], latency_s=0.01) for _ in range(4)]
+    modules = [TMCM1240(interface, module_id) for interface in interfaces for module_id in (1, 2, 3)]
+    profile = {"TMCM1240": {"axis_parameters": {"0": {"MaxVelocity": 1000, "MaxAcceleration": 2000}}}}
+    try:
+        start = time.perf_counter()
+        results = apply_profile(modules, profile)
+        elapsed = time.perf_counter() - start
+
+        assert all(result["axis_parameters"][0] == {4: (51200, 1000), 5: (51200, 2000)} for result in results)
+        # Each bus is used by one thread, the buses in parallel
+        assert all(len(interface.threads) == 1 for interface in interfaces)
+        assert len(set.union(*(interface.threads for interface in interfaces))) == 4
+        # 12 modules with 4 round trips each, 48 in a row without parallel buses
+        assert elapsed < 30 * 0.01
+    finally:
+        for interface in interfaces:
+            interface.close()
@@ -0,0 +1,191 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for the register shadow cache of the evaluation boards. No hardware needed."""
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface
+from pytrinamic.evalboards import TMC5072_eval, TMC5160_eval
+from pytrinamic.evalboards.register_cache import RegisterCache
+from pytrinamic.features.motor_control_ic import MotorControlIc
+from pytrinamic.ic import TMC4361, TMC4671, TMC5072, TMC5160
+from pytrinamic.tmcl import TMCLCommand
+
+
+class CountingInterface(EmulatorTmclInterface):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.commands = []
+
+    def _send(self, host_id, module_id, data):
+        self.commands.append(data[1])
+        super()._send(host_id, module_id, data)
+
+    def count(self, command):
+        return self.commands.count(command)
+
+
+@pytest.fixture
+def interface():
+    with CountingInterface() as interface:
+        yield interface
+
+
+@pytest.fixture
+def eval_board(interface):
+    return TMC5160_eval(interface)
+
+
+def test_volatile_registers():
+    cache = RegisterCache.for_ics([TMC5160()], volatile=[TMC5160.REG.VMAX])
+    for name in ("XACTUAL", "VACTUAL", "DRV_STATUS", "RAMP_STAT", "GSTAT", "TSTEP", "XLATCH", "MSCNT", "VMAX"):
+        assert cache.is_volatile(getattr(TMC5160.REG, name)), name
+    for name in ("GCONF", "IHOLD_IRUN", "RAMPMODE", "XTARGET", "CHOPCONF", "AMAX"):
+        assert not cache.is_volatile(getattr(TMC5160.REG, name)), name
+
+    cache = RegisterCache.for_ics([TMC5072])
+    assert cache.is_volatile(TMC5072.REG.XACTUAL_M2)
+    assert not cache.is_volatile(TMC5072.REG.XTARGET_M2)
+
+    cache = RegisterCache.for_ics([TMC4671])
+    for name in ("PHI_E", "INTERIM_DATA", "PID_ERROR_DATA"):
+        assert cache.is_volatile(getattr(TMC4671.REG, name)), name
+    for name in ("PHI_E_EXT", "PHI_E_SELECTION", "PID_ERROR_ADDR", "MOTOR_TYPE_N_POLE_PAIRS"):
+        assert not cache.is_volatile(getattr(TMC4671.REG, name)), name
+
+    cache = RegisterCache.for_ics([TMC4361])
+    for name in ("X_HOME", "CURRENTA_B", "COVER_HIGH___POLLING_REG", "COVER_DRV_LOW",
+                 "PID_ISUM_RD___PID_I___CL_VMAX_CALC_I"):
+        assert cache.is_volatile(getattr(TMC4361.REG, name)), name
+    for name in ("COVER_LOW", "GENERAL_CONF", "VMAX"):
+        assert not cache.is_volatile(getattr(TMC4361.REG, name)), name
+
+
+def test_field_writes_take_one_write(interface, eval_board):
+    eval_board.enable_register_cache()
+    motor = MotorControlIc(eval_board, eval_board.ics[0], 0)
+
+    motor.move_to(1000, 5000)
+    assert (interface.count(TMCLCommand.READ_MC), interface.count(TMCLCommand.WRITE_MC)) == (3, 3)
+
+    interface.commands.clear()
+    motor.move_to(2000, 6000)
+    assert (interface.count(TMCLCommand.READ_MC), interface.count(TMCLCommand.WRITE_MC)) == (0, 3)
+    assert interface.read_mc(TMC5160.REG.XTARGET) == 2000
+    assert interface.read_mc(TMC5160.REG.VMAX) == 6000
+
+    # Fields sharing a register keep each other's values
+    eval_board.write_register_field(TMC5160.FIELD.IHOLD, 3)
+    eval_board.write_register_field(TMC5160.FIELD.IRUN, 20)
+    assert eval_board.read_register_field(TMC5160.FIELD.IHOLD) == 3
+    assert interface.read_mc(TMC5160.REG.IHOLD_IRUN) == (20 << 8) | 3
+
+
+def test_volatile_registers_are_read(interface, eval_board):
+    cache = eval_board.enable_register_cache()
+    motor = MotorControlIc(eval_board, eval_board.ics[0], 0)
+    interface.write_mc(TMC5160.REG.XACTUAL, 100)
+    assert motor.actual_position == 100
+    interface.write_mc(TMC5160.REG.XACTUAL, 200)
+    assert motor.actual_position == 200
+
+    motor.actual_position = 300
+    assert interface.read_mc(TMC5160.REG.XACTUAL) == 300
+    assert TMC5160.REG.XACTUAL not in cache.addresses()
+
+
+def test_invalidate_and_refresh(interface, eval_board):
+    cache = eval_board.enable_register_cache()
+    eval_board.write_register_field(TMC5160.FIELD.IRUN, 10)
+    eval_board.write_register_field(TMC5160.FIELD.VMAX, 1000)
+    assert cache.addresses() == [TMC5160.REG.IHOLD_IRUN, TMC5160.REG.VMAX]
+
+    # Changed behind the back of the cache
+    interface.write_mc(TMC5160.REG.IHOLD_IRUN, 5 << 8)
+    interface.write_mc(TMC5160.REG.VMAX, 2000)
+    assert eval_board.read_register_field(TMC5160.FIELD.IRUN) == 10
+
+    eval_board.invalidate_registers([TMC5160.REG.IHOLD_IRUN])
+    assert eval_board.read_register_field(TMC5160.FIELD.IRUN) == 5
+    assert eval_board.read_register_field(TMC5160.FIELD.VMAX) == 1000
+
+    eval_board.refresh_registers()
+    assert eval_board.read_register_field(TMC5160.FIELD.VMAX) == 2000
+
+    eval_board.invalidate_registers()
+    assert len(cache) == 0
+
+
+def test_register_writes_update_the_cache(interface, eval_board):
+    cache = eval_board.enable_register_cache()
+    eval_board.write_register_field(TMC5160.FIELD.TOFF, 3)
+    eval_board.write_register(TMC5160.REG.CHOPCONF, 0x10410150)
+    assert cache.addresses() == [TMC5160.REG.CHOPCONF]
+
+    interface.commands.clear()
+    eval_board.write_register_field(TMC5160.FIELD.TOFF, 5)
+    assert interface.commands == [TMCLCommand.WRITE_MC]
+    assert interface.read_mc(TMC5160.REG.CHOPCONF) == 0x10410155
+
+    # Writes to volatile registers are not cached
+    eval_board.write_register(TMC5160.REG.XACTUAL, 100)
+    assert TMC5160.REG.XACTUAL not in cache.addresses()
+
+
+def test_subclass_register_access(interface):
+    class LoggingBoard(TMC5160_eval):
+        def __init__(self, connection):
+            super().__init__(connection)
+            self.writes = []
+
+        def _write_register(self, register_address, value):
+            self.writes.append(register_address)
+            return super()._write_register(register_address, value)
+
+    eval_board = LoggingBoard(interface)
+    cache = eval_board.enable_register_cache()
+    eval_board.write_register(TMC5160.REG.CHOPCONF, 0x10410150)
+    eval_board.write_register_field(TMC5160.FIELD.TOFF, 5)
+    assert eval_board.writes == [TMC5160.REG.CHOPCONF] * 2
+    assert cache.get(TMC5160.REG.CHOPCONF) == 0x10410155
+    assert interface.count(TMCLCommand.READ_MC) == 0
+
+
+def test_failed_write_invalidates(interface, eval_board):
+    eval_board.enable_register_cache()
+    eval_board.write_register_field(TMC5160.FIELD.VMAX, 1000)
+
+    def fail(*args):
+        raise ConnectionError
+
+    interface.write_mc = fail
+    with pytest.raises(ConnectionError):
+        eval_board.write_register_field(TMC5160.FIELD.VMAX, 2000)
+    assert eval_board.register_cache().addresses() == []
+
+
+def test_multi_axis_ic(interface):
+    eval_board = TMC5072_eval(interface)
+    eval_board.enable_register_cache()
+    eval_board.write_axis_field(1, TMC5072.FIELD.VMAX, 300)
+    eval_board.write_axis_field(1, TMC5072.FIELD.VMAX, 400)
+    assert interface.count(TMCLCommand.READ_MC) == 1
+    assert interface.read_mc(TMC5072.REG.VMAX_M2) == 400
+
+
+def test_disabled_by_default(interface, eval_board):
+    assert eval_board.register_cache() is None
+    eval_board.write_register_field(TMC5160.FIELD.VMAX, 1000)
+    eval_board.write_register_field(TMC5160.FIELD.VMAX, 2000)
+    assert interface.count(TMCLCommand.READ_MC) == 2
+
+    eval_board.enable_register_cache()
+    eval_board.disable_register_cache()
+    eval_board.write_register_field(TMC5160.FIELD.VMAX, 3000)
+    assert interface.count(TMCLCommand.READ_MC) == 3
@@ -0,0 +1,134 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for batched requests with send_many(). No hardware needed."""
+
+import os
+import threading
+
+import pytest
+
+from pytrinamic.connections import ConnectionManager, EmulatorTmclInterface, SerialTmclInterface
+from pytrinamic.tmcl import TMCLCommand, TMCLReplyStatusError, TMCLRequest, TMCLStatus
+from pytrinamic.tools import TmclModuleEmulator
+
+
+class PtyModule:
+    """
+    Emulated module behind a pseudo terminal, whose name can be opened like
+    a serial port. Records the size of every write it receives.
+    """
+
+    def __init__(self):
+        self.emulator = TmclModuleEmulator(1, axes=2)
+        self.reads = []
+        self._master, slave = os.openpty()
+        self.port = os.ttyname(slave)
+        self._slave = slave
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        buffered = bytearray()
+        while True:
+            try:
+                data = os.read(self._master, 4096)
+            except OSError:
+                return
+            if not data:
+                return
+            self.reads.append(len(data))
+            buffered += data
+            while len(buffered) >= 9:
+                reply = self.emulator.handle_frame(bytearray(buffered[:9]))
+                del buffered[:9]
+                os.write(self._master, reply)
+
+    def close(self):
+        os.close(self._slave)
+        os.close(self._master)
+        self._thread.join(1)
+
+
+def mixed_batch():
+    # The second request addresses an axis the module does not have
+    return [
+        (TMCLCommand.GAP, 4, 0, 0),
+        (TMCLCommand.GAP, 4, 5, 0),
+        TMCLRequest(1, TMCLCommand.SAP, 4, 1, 1000),
+        (TMCLCommand.GAP, 4, 1, 0),
+    ]
+
+
+def check_mixed_batch(interface):
+    replies = interface.send_many(mixed_batch(), raise_on_error=False)
+    assert [reply.command for reply in replies] == [TMCLCommand.GAP, TMCLCommand.GAP, TMCLCommand.SAP, TMCLCommand.GAP]
+    assert [reply.is_valid() for reply in replies] == [True, False, True, True]
+    assert replies[1].status == TMCLStatus.INVALID_VALUE
+    assert replies[3].value == 1000
+
+    # The error is raised after all replies have been read, the writes are done
+    with pytest.raises(TMCLReplyStatusError):
+        interface.send_many(mixed_batch())
+    assert interface.get_axis_parameter(4, 1) == 1000
+
+
+def check_reply_order(interface):
+    for axis in range(2):
+        for parameter in range(200, 210):
+            interface.set_axis_parameter(parameter, axis, 10 * axis + parameter)
+    requests = [(TMCLCommand.GAP, parameter, axis, 0) for parameter in range(209, 199, -1) for axis in (1, 0)]
+    replies = interface.send_many(requests)
+    assert [reply.value for reply in replies] == [10 * axis + parameter for _, parameter, axis, _ in requests]
+    assert interface.get_axis_parameters(list(range(200, 210)), 1) == [10 + parameter for parameter in range(200, 210)]
+    assert interface.send_many([]) == []
+
+
+def test_emulator():
+    with EmulatorTmclInterface(modules=[TmclModuleEmulator(1, axes=2)]) as interface:
+        check_mixed_batch(interface)
+        check_reply_order(interface)
+        with pytest.raises(TypeError):
+            interface.send_many([(TMCLCommand.GAP, 4, 0)])
+
+
+@pytest.fixture
+def pty_module():
+    if not hasattr(os, "openpty"):
+        pytest.skip("Needs pseudo terminals")
+    module = PtyModule()
+    yield module
+    module.close()
+
+
+@pytest.mark.parametrize("pipeline", [False, True])
+def test_serial(pty_module, pipeline):
+    with SerialTmclInterface(pty_module.port, timeout_s=2, pipeline=pipeline) as interface:
+        check_mixed_batch(interface)
+        check_reply_order(interface)
+
+        pty_module.reads.clear()
+        interface.send_many([(TMCLCommand.GAP, 4, 0, 0)] * 4)
+        if pipeline:
+            # Written at once, the pseudo terminal may still split the data
+            assert sum(pty_module.reads) == 36 and len(pty_module.reads) < 4
+        else:
+            assert pty_module.reads == [9] * 4
+
+
+def test_connection_manager(pty_module):
+    # Batches are sent request by request unless pipelining is enabled
+    for options, pipeline in (([], False), (["--pipeline"], True)):
+        arguments = ["--interface", "serial_tmcl", "--port", pty_module.port, "--timeout", "2"] + options
+        with ConnectionManager(arguments).connect() as interface:
+            pty_module.reads.clear()
+            assert interface.get_axis_parameters([4, 5, 4, 5], 0) == [51200] * 4
+            assert (len(pty_module.reads) < 4) == pipeline
+
+    with pytest.raises(ValueError):
+        ConnectionManager("--interface emulator_tmcl --pipeline")
@@ -0,0 +1,208 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for sharing one TMCL interface between threads. No hardware needed."""
+
+import threading
+import time
+from collections import deque
+
+import pytest
+
+from pytrinamic.connections import SharedTmclInterface, TmclPriority
+from pytrinamic.connections.tmcl_interface import TmclInterface
+from pytrinamic.tmcl import TMCLCommand, TMCLReply, TMCLRequest, TMCLReplyStatusError, TMCLStatus, TMCLTimeoutError
+
+
+class LoopbackTmclInterface(TmclInterface):
+    """Answers every request with its own value. GAP of type 255 fails."""
+
+    def __init__(self):
+        TmclInterface.__init__(self)
+        self._replies = deque()
+        self.batches = []
+        self.failing_batches = 0
+        self.closed = False
+
+    def _send(self, host_id, module_id, data):
+        request = TMCLRequest.from_buffer(data)
+        status = TMCLStatus.WRONG_TYPE if request.commandType == 255 else TMCLStatus.SUCCESS
+        # Give other threads the chance to interleave their requests
+        time.sleep(0.0001)
+        self._replies.append(TMCLReply(host_id, module_id, status, request.command, request.value).to_buffer())
+
+    def _recv(self, host_id, module_id):
+        return self._replies.popleft()
+
+    def _send_recv_many(self, requests):
+        self.batches.append(len(requests))
+        if self.failing_batches:
+            self.failing_batches -= 1
+            raise TMCLTimeoutError("TMCL datagram timed out")
+        return TmclInterface._send_recv_many(self, requests)
+
+    def close(self):
+        self.closed = True
+
+
+def test_threads_get_matching_replies():
+    with SharedTmclInterface(LoopbackTmclInterface()) as bus:
+        errors = []
+
+        def worker(offset):
+            for value in range(offset, offset + 200):
+                if bus.get_axis_parameter(1, 0) != 0 or bus.send(TMCLCommand.SAP, 4, 0, value).value != value:
+                    errors.append(value)
+
+        threads = [threading.Thread(target=worker, args=(1000 * i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+
+
+def test_queued_requests_are_batched():
+    interface = LoopbackTmclInterface()
+    with SharedTmclInterface(interface, batch_requests=True) as bus:
+        # Keep the dispatcher busy while the requests are queued
+        blocker = threading.Event()
+        bus.call(lambda _: blocker.wait())
+        futures = [bus.submit(TMCLCommand.SAP, 4, 0, value) for value in range(10)]
+        blocker.set()
+
+        assert [future.result().value for future in futures] == list(range(10))
+        assert interface.batches == [10]
+
+
+def test_requests_are_not_batched_by_default():
+    interface = LoopbackTmclInterface()
+    with SharedTmclInterface(interface) as bus:
+        blocker = threading.Event()
+        bus.call(lambda _: blocker.wait())
+        futures = [bus.submit(TMCLCommand.SAP, 4, 0, value) for value in range(10)]
+        blocker.set()
+
+        assert [future.result().value for future in futures] == list(range(10))
+        assert interface.batches == []
+
+
+def test_failed_batch_is_retried_per_request():
+    interface = LoopbackTmclInterface()
+    with SharedTmclInterface(interface, batch_requests=True) as bus:
+        interface.failing_batches = 1
+        blocker = threading.Event()
+        bus.call(lambda _: blocker.wait())
+        with bus.priority(TmclPriority.CONTROL):
+            write = bus.submit(TMCLCommand.SAP, 4, 0, 5)
+            read = bus.submit(TMCLCommand.GAP, 1, 0, 6)
+            motion = bus.submit(TMCLCommand.MVP, 1, 0, 100)
+        blocker.set()
+
+        assert write.result().value == 5
+        assert read.result().value == 6
+        # A relative move may have been executed, so it is not repeated
+        with pytest.raises(TMCLTimeoutError):
+            motion.result()
+        assert interface.batches == [3]
+
+
+def test_error_is_raised_for_its_request_only():
+    with SharedTmclInterface(LoopbackTmclInterface()) as bus:
+        blocker = threading.Event()
+        bus.call(lambda _: blocker.wait())
+        good = bus.submit(TMCLCommand.GAP, 1, 0, 7)
+        bad = bus.submit(TMCLCommand.GAP, 255, 0, 0)
+        blocker.set()
+
+        assert good.result().value == 7
+        with pytest.raises(TMCLReplyStatusError):
+            bad.result()
+
+
+def test_send_many_and_prepared_requests():
+    with SharedTmclInterface(LoopbackTmclInterface()) as bus:
+        assert bus.get_axis_parameters([1, 2, 3], 0) == [0, 0, 0]
+        assert bus.send_prepared(bus.prepare(TMCLCommand.SAP, 4, 0, 42)).value == 42
+        with pytest.raises(TMCLReplyStatusError):
+            bus.send_many([(TMCLCommand.GAP, 1, 0, 0), (TMCLCommand.GAP, 255, 0, 0)])
+
+
+def test_callback_on_dispatcher_thread_does_not_deadlock():
+    with SharedTmclInterface(LoopbackTmclInterface()) as bus:
+        values = []
+        future = bus.submit(TMCLCommand.SAP, 4, 0, 1)
+        future.add_done_callback(lambda _: values.append(bus.send(TMCLCommand.SAP, 4, 0, 2).value))
+        future.result()
+        bus.call(lambda _: None).result()
+
+        assert values == [2]
+
+
+def test_stop_overtakes_bulk_requests():
+    with SharedTmclInterface(LoopbackTmclInterface(), max_batch=4) as bus:
+        order = []
+        blocker = threading.Event()
+        bus.call(lambda _: blocker.wait())
+        for i in range(100):
+            bus.submit(TMCLCommand.RAMDEBUG, 9, 0, i).add_done_callback(lambda _: order.append("sample"))
+        bus.submit(TMCLCommand.GAP, 1, 0, 0).add_done_callback(lambda _: order.append("poll"))
+        stop = bus.submit(TMCLCommand.MST, 0, 0, 0)
+        stop.add_done_callback(lambda _: order.append("stop"))
+        blocker.set()
+        stop.result()
+        bus.call(lambda _: None, priority=TmclPriority.BULK).result()
+
+        assert order[:2] == ["stop", "poll"]
+        assert order.count("sample") == 100
+
+
+def test_priority_context_manager():
+    with SharedTmclInterface(LoopbackTmclInterface()) as bus:
+        order = []
+        blocker = threading.Event()
+        bus.call(lambda _: blocker.wait())
+        bus.submit(TMCLCommand.GAP, 1, 0, 0).add_done_callback(lambda _: order.append("poll"))
+        with bus.priority(TmclPriority.EMERGENCY):
+            future = bus.submit(TMCLCommand.SAP, 6, 0, 0)
+        future.add_done_callback(lambda _: order.append("current"))
+        blocker.set()
+        bus.call(lambda _: None, priority=TmclPriority.BULK).result()
+
+        assert order == ["current", "poll"]
+        with pytest.raises(ValueError):
+            with bus.priority(42):
+                pass
+
+
+def test_rate_limit():
+    with SharedTmclInterface(LoopbackTmclInterface(), rate_limits={TmclPriority.BULK: 200}) as bus:
+        start = time.perf_counter()
+        futures = [bus.submit(TMCLCommand.RAMDEBUG, 9, 0, i) for i in range(60)]
+        poll = bus.submit(TMCLCommand.GAP, 1, 0, 0)
+        poll.result()
+        poll_time = time.perf_counter() - start
+        [future.result() for future in futures]
+        bulk_time = time.perf_counter() - start
+
+        # 32 requests are allowed as burst, the rest takes 28 / 200 Hz
+        assert bulk_time > 0.12
+        assert poll_time < 0.1
+
+
+def test_close():
+    interface = LoopbackTmclInterface()
+    bus = SharedTmclInterface(interface)
+    future = bus.submit(TMCLCommand.SAP, 4, 0, 5)
+    bus.close()
+
+    assert future.result().value == 5
+    assert interface.closed
+    with pytest.raises(RuntimeError):
+        bus.submit(TMCLCommand.SAP, 4, 0, 5)
@@ -0,0 +1,74 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for pipelined requests of SocketTmclInterface. No hardware needed."""
+
+import concurrent.futures
+import time
+
+import pytest
+
+from pytrinamic.connections import SocketTmclInterface
+from pytrinamic.tmcl import TMCLCommand
+from pytrinamic.tools import TmclEmulatorServer, TmclModuleEmulator
+
+
+@pytest.fixture
+def server():
+    with TmclEmulatorServer(TmclModuleEmulator(1), latency_s=0.001) as server:
+        yield server
+
+
+def test_reply_order(server):
+    with SocketTmclInterface(server.address, timeout_s=2) as interface:
+        for value in range(8):
+            interface.set_axis_parameter(200 + value, 0, 100 + value)
+
+        futures = [interface.submit(TMCLCommand.GAP, 200 + value, 0, 0) for value in range(8)]
+        assert interface.in_flight() == 8
+        # Waiting for a later reply receives the earlier ones too
+        assert futures[3].result().value == 103
+        assert all(future.done() for future in futures[:4])
+        assert [future.result().value for future in futures] == [100 + value for value in range(8)]
+        assert interface.in_flight() == 0
+
+
+def test_depth_limit(server):
+    with SocketTmclInterface(server.address, timeout_s=2, pipeline_depth=3) as interface:
+        futures = []
+        for _ in range(7):
+            futures.append(interface.submit(TMCLCommand.GAP, 4, 0, 0))
+            assert interface.in_flight() <= 3
+        assert sum(future.done() for future in futures) == 4
+        assert [future.result().value for future in futures] == [51200] * 7
+
+        # A blocking request completes the pipelined ones first
+        future = interface.submit(TMCLCommand.GAP, 5, 0, 0)
+        assert interface.get_axis_parameter(4, 0) == 51200
+        assert future.done()
+
+    with pytest.raises(ValueError):
+        SocketTmclInterface(server.address, pipeline_depth=0)
+
+
+def test_result_timeout():
+    with TmclEmulatorServer(TmclModuleEmulator(1), latency_s=0.3) as server:
+        with SocketTmclInterface(server.address, timeout_s=5) as interface:
+            future = interface.submit(TMCLCommand.GAP, 4, 0, 0)
+            start = time.perf_counter()
+            with pytest.raises(concurrent.futures.TimeoutError):
+                future.result(timeout=0.01)
+            with pytest.raises(concurrent.futures.TimeoutError):
+                future.exception(timeout=0.01)
+            assert time.perf_counter() - start < 0.2
+
+            # The request stays in flight and its reply is received later
+            assert interface.in_flight() == 1
+            assert future.result(timeout=2).value == 51200
+            assert interface.get_axis_parameter(5, 0) == 51200
+            assert interface.get_timeout() == 5
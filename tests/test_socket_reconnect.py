@@ -0,0 +1,155 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for reconnecting SocketTmclInterface. No hardware needed."""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from pytrinamic.connections import SocketTmclInterface
+from pytrinamic.tmcl import TMCLCommand, TMCLRequest, TMCLRetry
+from pytrinamic.tools import TmclModuleEmulator
+
+
+class DroppingServer:
+    """
+    TCP server answering with an emulated module. drop() makes it close the
+    connection after receiving the next request, without answering it.
+    """
+
+    def __init__(self):
+        self.emulator = TmclModuleEmulator(1)
+        self.connections = 0
+        self.commands = []
+        self._drop = threading.Event()
+        self._connection = None
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.bind(("127.0.0.1", 0))
+        self._server.listen(4)
+        self.address = "127.0.0.1:{}".format(self._server.getsockname()[1])
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def drop(self):
+        self._drop.set()
+
+    def _serve(self):
+        while True:
+            try:
+                connection, _ = self._server.accept()
+            except OSError:
+                return
+            self.connections += 1
+            self._connection = connection
+            with connection:
+                while True:
+                    data = connection.recv(9, socket.MSG_WAITALL)
+                    if len(data) < 9:
+                        break
+                    if self._drop.is_set():
+                        self._drop.clear()
+                        break
+                    self.commands.append(data[1])
+                    connection.sendall(self.emulator.handle_frame(data))
+
+    def close(self):
+        for open_socket in (self._server, self._connection):
+            try:
+                open_socket.shutdown(socket.SHUT_RDWR)
+            except (OSError, AttributeError):
+                pass
+        self._server.close()
+        self._thread.join()
+
+
+@pytest.fixture
+def server():
+    server = DroppingServer()
+    yield server
+    server.close()
+
+
+def test_reads_and_writes_are_retried(server):
+    with SocketTmclInterface(server.address, timeout_s=2) as interface:
+        interface.set_axis_parameter(140, 0, 5)
+
+        server.drop()
+        start = time.perf_counter()
+        assert interface.get_axis_parameter(140, 0) == 5
+        assert time.perf_counter() - start < 0.5
+
+        server.drop()
+        interface.set_axis_parameter(140, 0, 6)
+        assert interface.get_axis_parameter(140, 0) == 6
+
+        server.drop()
+        assert interface.get_axis_parameters([140, 140], 0) == [6, 6]
+
+        assert interface.reconnects == 3
+        assert server.connections == 4
+
+
+def test_motion_is_only_retried_on_request(server):
+    with SocketTmclInterface(server.address, timeout_s=2) as interface:
+        server.drop()
+        with pytest.raises(ConnectionError):
+            interface.rotate(0, 1000)
+        assert TMCLCommand.ROR not in server.commands
+
+        # The next request reconnects
+        assert interface.get_axis_parameter(140, 0) == 0
+
+    with SocketTmclInterface(server.address, timeout_s=2, retry_motion=True) as interface:
+        server.drop()
+        interface.rotate(0, 1000)
+        assert server.commands.count(TMCLCommand.ROR) == 1
+
+
+def test_reconnect_gives_up(server):
+    with SocketTmclInterface(server.address, timeout_s=2, reconnect_timeout_s=0.1) as interface:
+        server.close()
+        server.drop()
+        start = time.perf_counter()
+        with pytest.raises(ConnectionError):
+            interface.get_axis_parameter(140, 0)
+        assert time.perf_counter() - start < 1
+
+
+@pytest.mark.parametrize("request_args,retry", [
+    ((TMCLCommand.GAP, 1, 0, 0), TMCLRetry.READ),
+    ((TMCLCommand.SAP, 4, 0, 100), TMCLRetry.WRITE),
+    ((TMCLCommand.MST, 0, 0, 0), TMCLRetry.WRITE),
+    ((TMCLCommand.ROR, 0, 0, 100), TMCLRetry.MOTION),
+    ((TMCLCommand.MVP, 0, 0, 100), TMCLRetry.MOTION),
+    ((TMCLCommand.MVP, 1, 0, 100), TMCLRetry.NEVER),
+    ((TMCLCommand.RFS, 2, 0, 0), TMCLRetry.READ),
+    ((TMCLCommand.RAMDEBUG, 0, 0, 0), TMCLRetry.NEVER),
+])
+def test_retry_classes(request_args, retry):
+    request = TMCLRequest(1, *request_args)
+    assert TMCLRetry.classify(request) == retry
+    assert TMCLRetry.is_retryable(request) == (retry >= TMCLRetry.WRITE)
+    assert TMCLRetry.is_retryable(request, motion=True) == (retry >= TMCLRetry.MOTION)
+
+
+def test_no_reconnect_after_close(server):
+    interface = SocketTmclInterface(server.address, timeout_s=2)
+    assert interface.get_axis_parameter(140, 0) == 0
+    interface.close()
+
+    with pytest.raises(ConnectionError):
+        interface.get_axis_parameter(140, 0)
+    with pytest.raises(ConnectionError):
+        interface.get_axis_parameters([140, 140], 0)
+    with pytest.raises(ConnectionError):
+        interface.submit(TMCLCommand.GAP, 140, 0, 0)
+    assert server.connections == 1
+    assert interface.reconnects == 0
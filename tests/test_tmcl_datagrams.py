@@ -0,0 +1,66 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for encoding and decoding TMCL datagrams. No hardware needed."""
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface
+from pytrinamic.helpers import to_signed_32
+from pytrinamic.tmcl import TMCL, TMCLCommand, TMCLRequest, TMCLReply
+from pytrinamic.tools import TmclModuleEmulator
+
+
+@pytest.mark.parametrize('fields', [
+    (1, 6, 1, 0, 0),
+    (3, 5, 140, 2, 0xFFFFFFFF),
+    (255, 148, 0x21, 0x10, -1000),
+    (0, 0, 0, 0, 0x80000000),
+])
+def test_request_round_trip(fields):
+    request = TMCLRequest(*fields)
+    buffer = request.to_buffer()
+    assert request.checksum == TMCL.calculate_checksum(buffer[:8])
+
+    decoded = TMCLRequest.from_buffer(buffer)
+    assert decoded.to_buffer() == buffer
+
+    packed = bytearray(12)
+    request.pack_into(packed, 3)
+    assert bytes(packed[3:]) == buffer
+
+
+@pytest.mark.parametrize('fields', [
+    (2, 1, 100, 6, 123456),
+    (2, 3, 4, 5, 0xFFFFFFFF),
+])
+def test_reply_checksum(fields):
+    reply = TMCLReply(*fields)
+    buffer = bytearray(reply.to_buffer())
+    assert reply.is_checksum_correct()
+    assert TMCLReply.from_buffer(b"\x00" + bytes(buffer), 1).is_checksum_correct()
+
+    buffer[4] ^= 0x01
+    assert not TMCLReply.from_buffer(buffer).is_checksum_correct()
+
+
+@pytest.mark.parametrize('value', [0, 1, 0x12345678, 0xFFFFFFFF, -1, -51200])
+def test_prepared_request(value):
+    with EmulatorTmclInterface(modules=[TmclModuleEmulator(3, axes=2)], module_id=3) as interface:
+        prepared = interface.prepare(TMCLCommand.SAP, 140, 1, 1000)
+        assert prepared.frame == TMCLRequest(3, TMCLCommand.SAP, 140, 1, 1000).to_buffer()
+
+        prepared.set_value(value)
+        expected = TMCLRequest(3, TMCLCommand.SAP, 140, 1, value)
+        assert prepared.frame == expected.to_buffer()
+        assert prepared.frame[8] == TMCL.calculate_checksum(prepared.frame[:8])
+        assert (prepared.request.value, prepared.request.checksum) == (expected.value, expected.checksum)
+
+        # The patched frame is accepted by the module
+        interface.send_prepared(prepared)
+        assert interface.get_axis_parameter(140, 1, signed=True) == to_signed_32(value)
@@ -0,0 +1,148 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for the TMCL module emulator. No hardware needed."""
+
+import pytest
+
+from pytrinamic.connections import ConnectionManager, EmulatorTmclInterface, SocketTmclInterface
+from pytrinamic.modules import TMCM1240
+from pytrinamic.RAMDebug import RAMDebug, RAMDebug_Channel, Channel
+from pytrinamic.tmcl import TMCLCommand, TMCLReplyStatusError, TMCLRequest, TMCLStatus
+from pytrinamic.tools import TmclModuleEmulator, TmclEmulatorServer
+
+
+class FakeClock:
+    def __init__(self):
+        self.time = 0.0
+
+    def __call__(self):
+        return self.time
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def interface(clock):
+    with EmulatorTmclInterface(modules=[TmclModuleEmulator(1, clock=clock), TmclModuleEmulator(2, axes=2, clock=clock)]) as interface:
+        yield interface
+
+
+def test_parameters_and_registers(interface):
+    interface.set_axis_parameter(140, 0, 8)
+    interface.set_global_parameter(77, 2, -5)
+    interface.write_mc(0x2D, 0x12345678)
+    interface.write_drv(0x06C, 0xABCD)
+
+    assert interface.get_axis_parameter(140, 0) == 8
+    assert interface.get_global_parameter(77, 2, signed=True) == -5
+    assert interface.read_mc(0x2D) == 0x12345678
+    assert interface.read_drv(0x06C) == 0xABCD
+    assert interface.read_mc(0x12D) == 0
+    assert interface.get_axis_parameters([140, 4, 5], 0) == [8, 51200, 51200]
+
+
+def test_store_and_restore(interface):
+    interface.set_axis_parameter(6, 0, 100)
+    interface.store_axis_parameter(6, 0)
+    interface.set_axis_parameter(6, 0, 50)
+    interface.send(TMCLCommand.RSAP, 6, 0, 0)
+
+    assert interface.get_axis_parameter(6, 0) == 100
+
+
+def test_errors(interface):
+    with pytest.raises(TMCLReplyStatusError) as exc_info:
+        interface.get_axis_parameter(1, 1)
+    assert exc_info.value.status_code == TMCLStatus.INVALID_VALUE
+    with pytest.raises(TMCLReplyStatusError):
+        interface.send(TMCLCommand.CALC, 0, 0, 0)
+    with pytest.raises(RuntimeError):
+        interface.send(TMCLCommand.GAP, 1, 0, 0, module_id=3)
+
+    frame = bytearray(TMCLRequest(1, TMCLCommand.GAP, 1, 0, 0).to_buffer())
+    frame[8] ^= 0xFF
+    assert interface.modules[1].handle_frame(frame)[2] == TMCLStatus.WRONG_CHECKSUM
+
+
+def test_firmware_version(interface):
+    assert interface.get_version_string() == "1240V310"
+    assert interface.send(TMCLCommand.GET_FIRMWARE_VERSION, 1, 0, 0).value == (1240 << 16) | (3 << 8) | 10
+
+
+def test_position_ramp(interface, clock):
+    module = TMCM1240(interface)
+    motor = module.motors[0]
+    motor.set_axis_parameter(motor.AP.MaxVelocity, 1000)
+    motor.set_axis_parameter(motor.AP.MaxAcceleration, 1000)
+    motor.move_to(2000)
+
+    clock.time = 1.0
+    # Accelerating for 1 s covers 500 steps
+    assert motor.actual_velocity == pytest.approx(1000, abs=2)
+    assert motor.actual_position == pytest.approx(500, abs=2)
+    assert not motor.get_position_reached()
+
+    clock.time = 3.0
+    assert motor.actual_position == 2000
+    assert motor.actual_velocity == 0
+    assert motor.get_position_reached()
+
+
+def test_velocity_mode_and_stop(interface, clock):
+    interface.set_axis_parameter(5, 1, 10000, module_id=2)
+    interface.rotate(1, -500, module_id=2)
+    clock.time = 2.0
+    assert interface.get_axis_parameter(3, 1, module_id=2, signed=True) == -500
+    assert interface.get_axis_parameter(1, 1, module_id=2, signed=True) == pytest.approx(-988, abs=2)
+
+    interface.stop(1, module_id=2)
+    clock.time = 2.1
+    assert interface.get_axis_parameter(3, 1, module_id=2) == 0
+    assert interface.get_axis_parameter(1, 0, module_id=2) == 0
+
+
+def test_ramdebug_capture(interface, clock):
+    interface.set_axis_parameter(2, 0, 10000)
+    ramdebug = RAMDebug(interface)
+    ramdebug.set_channel(Channel.axis_parameter(0, 3))
+    ramdebug.set_channel(Channel(RAMDebug_Channel.CHANNEL_SYSTICK, 0))
+    ramdebug.set_sample_count(100)
+    ramdebug.set_divider(10)
+    ramdebug.start_measurement()
+    assert not ramdebug.is_measurement_done()
+
+    clock.time = 1.0
+    assert ramdebug.is_measurement_done()
+    velocity, systick = ramdebug.get_samples()
+    assert len(velocity) == 100
+    assert velocity[0] == 0
+    assert velocity[-1] == pytest.approx(51200 * 99 / 1000, abs=2)
+    assert systick[1] - systick[0] == 1
+
+
+def test_connection_manager():
+    with ConnectionManager("--interface emulator_tmcl --module-id 3").connect() as interface:
+        interface.set_axis_parameter(4, 0, 1234)
+        assert interface.get_axis_parameter(4, 0, module_id=3) == 1234
+
+
+def test_tcp_server():
+    with TmclEmulatorServer([TmclModuleEmulator(1), TmclModuleEmulator(2)], latency_s=0.001) as server:
+        with SocketTmclInterface(server.address, timeout_s=2) as interface:
+            interface.set_axis_parameter(140, 0, 6, module_id=2)
+            assert interface.get_axis_parameter(140, 0, module_id=2) == 6
+            assert interface.get_axis_parameter(140, 0) == 0
+            assert interface.get_version_string() == "1240V310"
+
+            futures = [interface.submit(TMCLCommand.GAP, 4, 0, 0) for _ in range(10)]
+            assert [future.result().value for future in futures] == [51200] * 10
+            assert interface.send_prepared(interface.prepare(TMCLCommand.GAP, 5, 0)).value == 51200
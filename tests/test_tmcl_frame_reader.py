@@ -0,0 +1,217 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for cutting a TMCL reply stream into frames. No hardware needed."""
+
+import socket
+import threading
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface, SocketTmclInterface
+from pytrinamic.connections.tmcl_frame_reader import TmclFrameReader
+from pytrinamic.tmcl import TMCLCommand, TMCLReply, TMCLRequest, TMCLTimeoutError
+from pytrinamic.tools import TmclEmulatorServer, TmclModuleEmulator
+
+
+class FakeStream:
+    """Returns the queued chunks, at most [chunk_size] bytes per read."""
+
+    def __init__(self, chunk_size=4):
+        self.data = bytearray()
+        self.chunk_size = chunk_size
+        self.discarded = 0
+
+    def read_into(self, view):
+        count = min(len(view), len(self.data), self.chunk_size)
+        view[:count] = self.data[:count]
+        del self.data[:count]
+        return count
+
+    def discard(self):
+        self.discarded += len(self.data)
+        self.data.clear()
+
+
+def request(module_id, value):
+    return TMCLRequest(module_id, TMCLCommand.GAP, 1, 0, value).to_buffer()
+
+
+def reply(module_id, value):
+    return TMCLReply(2, module_id, 100, TMCLCommand.GAP, value).to_buffer()
+
+
+@pytest.fixture
+def stream():
+    return FakeStream()
+
+
+@pytest.fixture
+def reader(stream):
+    return TmclFrameReader(stream.read_into, 2, stream.discard)
+
+
+def test_partial_reads(stream, reader):
+    for value in range(3):
+        reader.expect(request(1, value))
+        stream.data += reply(1, value)
+    stream.chunk_size = 1
+
+    assert reader.read_frames(3) == [reply(1, value) for value in range(3)]
+    assert reader.resyncs == 0
+
+
+@pytest.mark.parametrize("garbage", [b"\x00", b"\x02", b"\x02\x05\x07", reply(1, 7)[2:7]])
+def test_resync_after_extra_bytes(stream, reader, garbage):
+    reader.expect(request(1, 1))
+    reader.expect(request(1, 2))
+    stream.data += garbage + reply(1, 1) + reply(1, 2)
+
+    assert reader.read_frame() == reply(1, 1)
+    assert reader.read_frame() == reply(1, 2)
+    assert reader.resyncs == 1
+    assert reader.discarded == len(garbage)
+
+
+def test_resync_in_batch_with_checksum(stream, reader):
+    # A frame starting with the right addresses but a bad checksum is skipped
+    # if the real reply follows
+    for module_id in (1, 1):
+        reader.expect(request(module_id, 0))
+    stream.data += bytes([2, 1]) + reply(1, 5) + reply(1, 6)
+
+    assert reader.read_frames(2) == [reply(1, 5), reply(1, 6)]
+
+
+def test_bad_checksum_is_returned(stream, reader):
+    corrupted = bytearray(reply(1, 5))
+    corrupted[5] ^= 0x10
+    reader.expect(request(1, 0))
+    stream.data += corrupted
+
+    assert reader.read_frame() == corrupted
+    assert reader.resyncs == 0
+
+
+def test_lost_byte_times_out_and_recovers(stream, reader):
+    reader.expect(request(1, 1))
+    stream.data += reply(1, 1)[1:]
+    with pytest.raises(TMCLTimeoutError):
+        reader.read_frame()
+
+    # The late rest of the reply is dropped before the next request
+    stream.data += b"\x55"
+    reader.sync()
+    assert stream.discarded == 1
+    reader.expect(request(1, 2))
+    stream.data += reply(1, 2)
+    assert reader.read_frame() == reply(1, 2)
+
+
+def test_sync_drops_late_replies(stream, reader):
+    reader.expect(request(1, 1))
+    with pytest.raises(TMCLTimeoutError):
+        reader.read_frame()
+
+    # The first reply arrives late, before the reply to the retransmission
+    reader.sync()
+    reader.expect(request(1, 1))
+    stream.data += reply(1, 10) + reply(1, 11)
+    assert reader.read_frame() == reply(1, 10)
+    reader.expect_late(1)
+
+    reader.sync()
+    reader.expect(request(1, 2))
+    stream.data += reply(1, 20)
+    assert reader.read_frame() == reply(1, 20)
+    assert reader.discarded == 9
+
+    # A late reply that never arrives only costs one read timeout
+    reader.expect_late(2)
+    reader.sync()
+    reader.expect(request(1, 3))
+    stream.data += reply(1, 30)
+    assert reader.read_frame() == reply(1, 30)
+
+
+def test_firmware_version_reply(stream, reader):
+    reader.expect(TMCLRequest(1, TMCLCommand.GET_FIRMWARE_VERSION, 0, 0, 0).to_buffer())
+    stream.data += b"\x021240V310"
+
+    assert reader.read_frame() == b"\x021240V310"
+
+
+def test_socket_interface_recovers_from_extra_byte():
+    emulator = TmclModuleEmulator(1)
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+
+    def serve():
+        connection, _ = server.accept()
+        with connection:
+            requests = 0
+            while True:
+                data = connection.recv(9, socket.MSG_WAITALL)
+                if len(data) < 9:
+                    return
+                requests += 1
+                answer = emulator.handle_frame(data)
+                # Corrupt the stream with one extra byte before the second reply
+                connection.sendall(b"\xff" + answer if requests == 2 else answer)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        with SocketTmclInterface("127.0.0.1:{}".format(server.getsockname()[1]), timeout_s=2) as interface:
+            for value in range(5):
+                interface.set_axis_parameter(140, 0, value)
+                assert interface.get_axis_parameter(140, 0) == value
+            assert interface._frames.resyncs == 1
+    finally:
+        server.close()
+        thread.join()
+
+
+def test_prefetch_keeps_partial_reply(stream, reader):
+    reader.expect(request(1, 5))
+    stream.data += reply(1, 5)[:4]
+    assert not reader.prefetch(stream.read_into)
+    stream.data += reply(1, 5)[4:]
+    assert reader.prefetch(stream.read_into)
+    assert reader.read_frame() == reply(1, 5)
+
+
+def test_sync_forgets_unanswered_requests(stream, reader):
+    # The boot command is not answered
+    reader.expect(TMCLRequest(1, TMCLCommand.BOOT, 0x81, 0x92, 0xA3B4C5D6).to_buffer())
+    reader.sync()
+    reader.expect(request(1, 3))
+    stream.data += reply(1, 3)
+    assert reader.read_frame() == reply(1, 3)
+
+    # The replies of pipelined requests are still expected
+    reader.expect(TMCLRequest(1, TMCLCommand.SAP, 4, 0, 1).to_buffer())
+    reader.expect(request(1, 4))
+    reader.sync(in_flight=1)
+    reader.expect(request(1, 5))
+    stream.data += reply(1, 4) + reply(1, 5)
+    assert reader.read_frames(2) == [reply(1, 4), reply(1, 5)]
+    assert reader.resyncs == 0
+
+
+def test_request_after_send_boot():
+    with TmclEmulatorServer(TmclModuleEmulator(1)) as server:
+        with SocketTmclInterface(server.address, timeout_s=1) as interface:
+            interface.send_boot()
+            assert interface.get_axis_parameter(4, 0) == 51200
+            assert interface.get_axis_parameters([4, 5], 0) == [51200, 51200]
+
+    with EmulatorTmclInterface(timeout_s=1) as interface:
+        interface.send_boot()
+        assert interface.get_axis_parameter(4, 0) == 51200
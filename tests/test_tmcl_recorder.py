@@ -0,0 +1,84 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for recording and replaying TMCL traffic. No hardware needed."""
+
+import pytest
+
+from pytrinamic.connections import ConnectionManager, EmulatorTmclInterface, ReplayTmclInterface
+from pytrinamic.tmcl import TMCLCommand, TMCLReplyStatusError, TMCLTimeoutError
+from pytrinamic.tools import TmclRecorder
+from pytrinamic.tools.tmcl_recorder import RECORD_SIZE, iter_capture, read_capture
+
+
+@pytest.fixture
+def capture(tmp_path):
+    path = str(tmp_path / "capture.tmcl")
+    with EmulatorTmclInterface() as interface:
+        with TmclRecorder(interface, path) as recorder:
+            interface.set_axis_parameter(140, 0, -1000)
+            interface.get_axis_parameter(140, 0)
+            interface.set_axis_parameter(140, 0, 2000)
+            interface.get_axis_parameter(140, 0)
+            interface.send_many([(TMCLCommand.GAP, 140, 0, 0), (99, 0, 0, 0)], raise_on_error=False)
+            assert recorder.records == 6
+        # Detached from the interface on close
+        interface.get_axis_parameter(140, 0)
+    return path
+
+
+def test_capture_records(capture):
+    records = list(iter_capture(capture))
+
+    assert len(records) == 6
+    request, reply, timestamp = records[0]
+    assert request[:2] == bytes([1, TMCLCommand.SAP])
+    assert reply[2] == 100
+    assert [record[2] for record in records] == sorted(record[2] for record in records)
+
+    # An incomplete record at the end, e.g. after a crash, is ignored
+    with open(capture, "ab") as capture_file:
+        capture_file.write(bytes(RECORD_SIZE // 2))
+    assert len(list(iter_capture(capture))) == 6
+
+
+def test_read_capture(capture):
+    pytest.importorskip("numpy")
+
+    records = read_capture(capture)
+
+    assert len(records) == 6
+    assert list(records["command"]) == [5, 6, 5, 6, 6, 99]
+    assert list(records["value"][:3]) == [-1000, 0, 2000]
+    assert list(records["reply_value"][[1, 3, 4]]) == [-1000, 2000, 2000]
+    assert list(records["status"][4:]) == [100, 2]
+    assert records["checksum_ok"].all()
+
+
+def test_replay(capture):
+    with ReplayTmclInterface(capture) as interface:
+        # Every request gets its recorded replies in order
+        assert interface.get_axis_parameter(140, 0, signed=True) == -1000
+        assert interface.get_axis_parameter(140, 0) == 2000
+        with pytest.raises(TMCLReplyStatusError):
+            interface.send(99, 0, 0, 0)
+        assert interface.remaining() == 3
+        interface.get_axis_parameter(140, 0)
+        with pytest.raises(TMCLTimeoutError):
+            interface.get_axis_parameter(140, 0)
+        with pytest.raises(TMCLTimeoutError):
+            interface.get_axis_parameter(1, 0)
+
+
+def test_replay_repeat_with_connection_manager(capture):
+    with ConnectionManager(["--interface", "replay_tmcl", "--port", capture]).connect() as interface:
+        assert isinstance(interface, ReplayTmclInterface)
+
+    with ReplayTmclInterface(capture, repeat=True) as interface:
+        values = [interface.get_axis_parameter(140, 0) for _ in range(5)]
+        assert values == [2**32 - 1000, 2000, 2000, 2000, 2000]
@@ -0,0 +1,120 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for the request statistics of TmclInterface. No hardware needed."""
+
+import json
+import random
+
+import pytest
+
+from pytrinamic.connections import EmulatorTmclInterface, SharedTmclInterface
+from pytrinamic.connections.tmcl_stats import LatencyHistogram
+from pytrinamic.tmcl import TMCLCommand, TMCLReplyStatusError, TMCLTimeoutError
+from pytrinamic.tools import TmclModuleEmulator
+
+
+@pytest.fixture
+def interface():
+    with EmulatorTmclInterface(modules=[TmclModuleEmulator(1), TmclModuleEmulator(2)]) as interface:
+        yield interface
+
+
+def test_histogram_percentiles():
+    values = [random.randint(1, 10**7) for _ in range(10000)]
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+
+    values.sort()
+    assert histogram.count == len(values)
+    assert histogram.min == values[0]
+    assert histogram.max == values[-1]
+    for percentile in (50, 90, 99):
+        exact = values[len(values) * percentile // 100 - 1]
+        assert exact <= histogram.percentile(percentile) <= exact * 17 / 16 + 1
+    assert histogram.percentile(100) == values[-1]
+
+    other = LatencyHistogram()
+    other.record(0)
+    histogram.merge(other)
+    assert histogram.min == 0
+    assert histogram.count == len(values) + 1
+
+
+def test_stats_are_opt_in(interface):
+    assert interface.stats() is None
+    interface.get_axis_parameter(1, 0)
+    interface.enable_stats()
+    assert interface.stats().requests == 0
+
+
+def test_counts_by_command_and_module(interface):
+    interface.enable_stats()
+    for _ in range(3):
+        interface.get_axis_parameter(1, 0)
+    interface.set_axis_parameter(4, 0, 1000, module_id=2)
+    interface.send_prepared(interface.prepare(TMCLCommand.GAP, 1, 0))
+
+    stats = interface.stats()
+    assert stats.requests == 5
+    assert stats.commands[(TMCLCommand.GAP, 1)].requests == 4
+    assert stats.commands[(TMCLCommand.SAP, 4)].requests == 1
+    assert stats.modules[1].requests == 4
+    assert stats.modules[2].requests == 1
+    assert stats.top(1)[0][0] == (TMCLCommand.GAP, 1)
+    assert stats.latency.count == 5
+    assert all(mean > 0 for mean in stats.phase_means().values())
+    assert sum(stats.errors.values()) == 0
+
+
+def test_errors_by_kind(interface):
+    interface.enable_stats()
+    with pytest.raises(TMCLReplyStatusError):
+        interface.send(99, 0, 0, 0)
+    with pytest.raises(TMCLTimeoutError):
+        interface.get_axis_parameter(1, 0, module_id=5)
+
+    stats = interface.stats()
+    assert stats.errors == {"status": 1, "checksum": 0, "timeout": 1, "other": 0}
+    assert stats.modules[5].errors == 1
+
+
+def test_send_many_batch(interface):
+    interface.enable_stats()
+    replies = interface.send_many([(TMCLCommand.GAP, 1, 0, 0), (TMCLCommand.GAP, 2, 0, 0), (99, 0, 0, 0)],
+                                  raise_on_error=False)
+
+    stats = interface.stats()
+    assert len(replies) == 3
+    assert stats.requests == 3
+    assert stats.batches == 1
+    assert stats.errors["status"] == 1
+
+
+def test_reset_and_export(interface):
+    interface.enable_stats()
+    interface.get_axis_parameter(1, 0)
+
+    exported = json.loads(json.dumps(interface.stats().as_dict()))
+    assert exported["requests"] == 1
+    assert exported["commands"][0]["command"] == "GAP"
+    assert "GAP" in str(interface.stats())
+
+    interface.reset_stats()
+    assert interface.stats().requests == 0
+    interface.disable_stats()
+    assert interface.stats() is None
+
+
+def test_shared_interface_counts_all_threads():
+    with SharedTmclInterface(EmulatorTmclInterface()) as bus:
+        bus.enable_stats()
+        bus.get_axis_parameter(1, 0)
+        bus.get_axis_parameters([1, 2, 3], 0)
+        assert bus.stats().requests == 4
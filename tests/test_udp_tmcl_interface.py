@@ -0,0 +1,212 @@
+################################################################################
+# Copyright © 2019 TRINAMIC Motion Control GmbH & Co. KG
+# (now owned by Analog Devices Inc.),
+#
+# Copyright © 2023 Analog Devices Inc. All Rights Reserved. This software is
+# proprietary & confidential to Analog Devices, Inc. and its licensors.
+################################################################################
+
+"""Tests for UdpTmclInterface against the UDP emulator server. No hardware needed."""
+
+import random
+import socket
+import threading
+
+import pytest
+
+from pytrinamic.connections import ConnectionManager, UdpTmclInterface
+from pytrinamic.tmcl import TMCLCommand, TMCLReply, TMCLRequest, TMCLTimeoutError
+from pytrinamic.tools import TmclEmulatorUdpServer, TmclModuleEmulator
+
+
+class DroppingServer(TmclEmulatorUdpServer):
+    """Drops the replies to the next [drop] requests with the given commands."""
+
+    def __init__(self, modules, **kwargs):
+        super().__init__(modules, **kwargs)
+        self.drop = 0
+        self.drop_commands = None
+        self.requests = []
+
+    def handle_frame(self, frame):
+        self.requests.append(frame[1])
+        reply = super().handle_frame(frame)
+        if self.drop and (self.drop_commands is None or frame[1] in self.drop_commands):
+            self.drop -= 1
+            return None
+        return reply
+
+
+@pytest.fixture
+def server():
+    with DroppingServer([TmclModuleEmulator(module_id) for module_id in (1, 2)]) as server:
+        yield server
+
+
+def test_requests(server):
+    with UdpTmclInterface(server.address, timeout_s=2) as interface:
+        interface.set_axis_parameter(140, 0, 42)
+        assert interface.get_axis_parameter(140, 0) == 42
+        assert interface.get_axis_parameter(140, 0, module_id=2) == 0
+        assert interface.get_version_string() == "1240V310"
+        assert interface.retransmits == 0
+
+
+def test_batches_span_datagrams(server):
+    with UdpTmclInterface(server.address, timeout_s=2, frames_per_datagram=4) as interface:
+        interface.send_many([(TMCLCommand.SAP, 140, 0, value) for value in range(10)])
+        requests = [(TMCLCommand.GAP, 140, 0, 0), (TMCLCommand.GGP, 0, 0, 0)] * 5
+        replies = interface.send_many(requests, module_id=2)
+        assert [reply.command for reply in replies] == [request[0] for request in requests]
+        assert interface.get_axis_parameter(140, 0) == 9
+
+
+def test_lost_replies_are_retransmitted(server):
+    with UdpTmclInterface(server.address, timeout_s=2) as interface:
+        interface.set_axis_parameter(140, 0, 7)
+        server.drop = 1
+        assert interface.get_axis_parameter(140, 0) == 7
+        assert interface.retransmits == 1
+
+        # Only the unanswered requests of a batch are sent again
+        server.drop = 2
+        server.drop_commands = {TMCLCommand.GGP}
+        requests = [(TMCLCommand.GAP, 140, 0, 0), (TMCLCommand.GGP, 0, 0, 0), (TMCLCommand.GGP, 1, 0, 0)]
+        count = len(server.requests)
+        assert [reply.command for reply in interface.send_many(requests)] == [request[0] for request in requests]
+        assert server.requests[count:] == [TMCLCommand.GAP, TMCLCommand.GGP, TMCLCommand.GGP,
+                                           TMCLCommand.GGP, TMCLCommand.GGP]
+        assert interface.retransmits == 3
+
+
+def test_motion_is_not_retransmitted(server):
+    with UdpTmclInterface(server.address, timeout_s=0.2) as interface:
+        server.drop = 1
+        with pytest.raises(TMCLTimeoutError):
+            interface.move_by(0, 1000)
+        assert server.requests.count(TMCLCommand.MVP) == 1
+        assert interface.retransmits == 0
+
+
+def test_replies_out_of_order():
+    # A stand-in converter answering both requests of a datagram in reverse
+    # order, plus a stray reply from another module
+    emulator = TmclModuleEmulator(1)
+    device = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    device.bind(("127.0.0.1", 0))
+
+    def serve():
+        data, address = device.recvfrom(1024)
+        replies = [emulator.handle_frame(data[offset:offset + 9]) for offset in (0, 9)]
+        stray = TMCLReply(2, 5, 100, TMCLCommand.GAP, 0).to_buffer()
+        device.sendto(stray + replies[1], address)
+        device.sendto(replies[0], address)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        with UdpTmclInterface("127.0.0.1:{}".format(device.getsockname()[1]), timeout_s=2) as interface:
+            emulator.handle_frame(interface.prepare(TMCLCommand.SAP, 140, 0, 3).frame)
+            replies = interface.send_many([(TMCLCommand.GAP, 140, 0, 0), (TMCLCommand.GGP, 0, 0, 0)])
+            assert [reply.command for reply in replies] == [TMCLCommand.GAP, TMCLCommand.GGP]
+            assert replies[0].value == 3
+            assert interface.unexpected == 1
+    finally:
+        thread.join()
+        device.close()
+
+
+def test_lossy_link(server):
+    server.loss = 0.1
+    server.rng = random.Random(1)
+    with UdpTmclInterface(server.address, timeout_s=2) as interface:
+        for value in range(100):
+            interface.set_axis_parameter(140, 0, value)
+            assert interface.get_axis_parameter(140, 0) == value
+        assert interface.retransmits > 0
+
+
+def test_connection_manager(server):
+    with ConnectionManager("--interface udp_tmcl --port " + server.address).connect() as interface:
+        assert isinstance(interface, UdpTmclInterface)
+        interface.get_axis_parameter(140, 0)
+
+
+def test_lost_reply_of_a_group(server):
+    # Replies to requests with the same module and command could only be told
+    # apart by their order, so they are sent one by one
+    with UdpTmclInterface(server.address, timeout_s=2, min_retransmit_s=0.05) as interface:
+        interface.send_many([(TMCLCommand.SAP, parameter, 0, value) for parameter, value in ((10, 100), (11, 111), (12, 122))])
+        server.drop = 1
+        server.drop_commands = {TMCLCommand.GAP}
+        count = len(server.requests)
+        assert interface.get_axis_parameters([10, 11, 12], 0) == [100, 111, 122]
+        assert server.requests[count:] == [TMCLCommand.GAP] * 4
+        assert interface.retransmits == 1
+        assert interface.unexpected == 0
+
+
+def test_late_reply_of_a_group():
+    # A stand-in converter answering every request, but holding back the last
+    # reply to the first datagram until the requests are sent again
+    emulator = TmclModuleEmulator(1)
+    for parameter, value in ((10, 100), (11, 111)):
+        emulator.handle_frame(TMCLRequest(1, TMCLCommand.SAP, parameter, 0, value).to_buffer())
+    device = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    device.bind(("127.0.0.1", 0))
+    device.settimeout(0.5)
+
+    def serve():
+        held = None
+        while True:
+            try:
+                data, address = device.recvfrom(1024)
+            except OSError:
+                return
+            replies = [emulator.handle_frame(data[offset:offset + 9]) for offset in range(0, len(data), 9)]
+            if held is None:
+                held = replies[-1]
+                replies = replies[:-1]
+            elif held:
+                device.sendto(held, address)
+                held = b""
+            if replies:
+                device.sendto(b"".join(replies), address)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        with UdpTmclInterface("127.0.0.1:{}".format(device.getsockname()[1]), timeout_s=2) as interface:
+            # Retransmit after 150 ms instead of the initial 1 s
+            interface.retransmit_timeout().sample(0.05)
+            assert interface.get_axis_parameters([10, 11], 0) == [100, 111]
+            assert interface.retransmits == 1
+            # The reply to the retransmission is dropped as a late duplicate
+            assert interface.get_axis_parameters([11, 10], 0) == [111, 100]
+            assert interface.unexpected == 1
+    finally:
+        device.close()
+        thread.join()
+
+
+def test_version_reply_is_not_a_catch_all():
+    # A stand-in converter sending a stray reply from another module before
+    # the version string
+    emulator = TmclModuleEmulator(1)
+    device = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    device.bind(("127.0.0.1", 0))
+
+    def serve():
+        data, address = device.recvfrom(1024)
+        stray = TMCLReply(2, 5, 100, TMCLCommand.GAP, 0).to_buffer()
+        device.sendto(stray + emulator.handle_frame(data[:9]), address)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    try:
+        with UdpTmclInterface("127.0.0.1:{}".format(device.getsockname()[1]), timeout_s=2) as interface:
+            assert interface.get_version_string() == "1240V310"
+            assert interface.unexpected == 1
+    finally:
+        thread.join()
+        device.close()